@@ -9,12 +9,15 @@ import uuid
 import re
 import hashlib
 
-from src.main_app.database import get_db
+from src.shared.database import get_main_db as get_db
 from src.blog.models import BlogPost
 from src.blog.cloudinary_config import upload_image, delete_image
+from src.main_app.static_assets import asset_url
+from src.main_app.image_variants import responsive_image
 
 # Templates
 templates = Jinja2Templates(directory="src/blog/templates")
+templates.env.globals.update(asset_url=asset_url, responsive_image=responsive_image)
 
 router = APIRouter()
 
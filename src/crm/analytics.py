@@ -0,0 +1,248 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, case
+from sqlalchemy.orm import Session
+from src.shared.crm_models import Lead, Team, LeadDailyRollup, AssignmentDailyRollup
+
+# CRM analytics
+#
+# Every chart is fed by one grouped query over the daily rollup tables (see
+# src/crm/rollups.py), so the cost follows the number of days in range rather
+# than the number of leads. The time filter is applied as a half-open
+# [start, end) range on the rollup day, i.e. the day the lead was created.
+
+ACTIVE_STATUSES = ["assigned", "pd", "login", "login_query", "underwriter"]
+CONVERTED_STATUSES = ["approved", "disbursed"]
+LOST_STATUSES = ["rejected", "closed"]
+
+# Months shown on the trend chart when no time filter narrows the range
+DEFAULT_TREND_MONTHS = 6
+
+
+def get_date_range_for_filter(time_filter: str):
+    """Get the (start, end) range for a time filter; either bound may be None"""
+    now = datetime.now()
+    this_month = datetime(now.year, now.month, 1)
+
+    if time_filter == "this_month":
+        return this_month, None
+    elif time_filter == "last_month":
+        last_month = this_month - timedelta(days=1)
+        return datetime(last_month.year, last_month.month, 1), this_month
+    elif time_filter == "last_3_months":
+        return now - timedelta(days=90), None
+    elif time_filter == "last_6_months":
+        return now - timedelta(days=180), None
+    elif time_filter == "this_year":
+        return datetime(now.year, 1, 1), None
+    elif time_filter == "last_year":
+        return datetime(now.year - 1, 1, 1), datetime(now.year, 1, 1)
+    else:  # all
+        return None, None
+
+
+def _in_range(column, start=None, end=None):
+    """Half-open range predicate on a timestamp column"""
+    conditions = []
+    if start:
+        conditions.append(column >= start)
+    if end:
+        conditions.append(column < end)
+    return conditions
+
+
+def _in_day_range(column, start=None, end=None):
+    """Half-open range predicate on a rollup day column"""
+    return _in_range(column, start.date() if start else None, end.date() if end else None)
+
+
+def _month_bucket(db: Session, column):
+    """'YYYY-MM' bucket expression for the session's dialect"""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m", column)
+    return func.to_char(func.date_trunc("month", column), "YYYY-MM")
+
+
+def _month_starts(start: datetime, end: datetime):
+    """First day of every calendar month from start's month up to end"""
+    month = datetime(start.year, start.month, 1)
+    months = []
+    while month < end:
+        months.append(month)
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return months
+
+
+def get_monthly_trends(db: Session, start_date=None, end_date=None, months: int = 12):
+    """Website/social lead counts per calendar month from the daily rollup"""
+    now = datetime.now()
+    end = end_date or now
+    if not start_date:
+        # Last `months` calendar months including the current one
+        first = datetime(end.year, end.month, 1)
+        for _ in range(months - 1):
+            first = datetime(first.year, first.month, 1) - timedelta(days=1)
+        start_date = datetime(first.year, first.month, 1)
+    month_starts = _month_starts(start_date, end)
+
+    bucket = _month_bucket(db, LeadDailyRollup.day)
+    rows = db.query(bucket, LeadDailyRollup.source, func.sum(LeadDailyRollup.lead_count)).filter(
+        LeadDailyRollup.source.in_(["website", "social"]),
+        *_in_day_range(LeadDailyRollup.day, start_date, end_date)
+    ).group_by(bucket, LeadDailyRollup.source).all()
+
+    counts = {(month, source): count for month, source, count in rows}
+    keys = [month.strftime("%Y-%m") for month in month_starts]
+    return {
+        "labels": [month.strftime("%b %Y") for month in month_starts],
+        "website": [counts.get((key, "website"), 0) for key in keys],
+        "social": [counts.get((key, "social"), 0) for key in keys]
+    }
+
+
+def get_team_performance(db: Session, start_date=None, end_date=None):
+    """Assignment counts per team from the daily rollup"""
+    team_counts = select(
+        AssignmentDailyRollup.team_id, func.sum(AssignmentDailyRollup.assignment_count).label("lead_count")
+    ).where(
+        *_in_day_range(AssignmentDailyRollup.day, start_date, end_date)
+    ).group_by(AssignmentDailyRollup.team_id).subquery()
+
+    rows = db.query(
+        Team.name, func.coalesce(team_counts.c.lead_count, 0)
+    ).outerjoin(
+        team_counts, team_counts.c.team_id == Team.team_id
+    ).order_by(Team.team_id).all()
+
+    return {
+        "labels": [name for name, _ in rows],
+        "data": [count for _, count in rows]
+    }
+
+
+def get_assignment_summary(db: Session, start_date=None, end_date=None):
+    """Status bucket counts for assignments in one conditional-aggregate query over the rollup"""
+    rollup = AssignmentDailyRollup
+
+    def bucket(condition):
+        return func.coalesce(func.sum(case((condition, rollup.assignment_count), else_=0)), 0)
+
+    converted = rollup.status.in_(CONVERTED_STATUSES)
+    row = db.query(
+        bucket(rollup.status.in_(ACTIVE_STATUSES)),
+        bucket(converted),
+        bucket(rollup.status.in_(LOST_STATUSES)),
+        bucket(rollup.status == "assigned"),
+        bucket(converted & (rollup.source == "website")),
+        bucket(converted & (rollup.source == "social"))
+    ).filter(*_in_day_range(rollup.day, start_date, end_date)).one()
+
+    keys = ["active", "converted", "lost", "pending", "website_converted", "social_converted"]
+    return dict(zip(keys, (int(value) for value in row)))
+
+
+def get_analytics_data(db: Session, time_filter: str = "all"):
+    """Get comprehensive analytics data with optional time filtering using unified Lead model"""
+    try:
+        print(f"DEBUG: Starting analytics data collection (filter: {time_filter})")
+        start_date, end_date = get_date_range_for_filter(time_filter)
+        day_range = _in_day_range(LeadDailyRollup.day, start_date, end_date)
+
+        # Lead counts by source
+        source_counts = dict(db.query(LeadDailyRollup.source, func.sum(LeadDailyRollup.lead_count)).filter(
+            *day_range
+        ).group_by(LeadDailyRollup.source).all())
+        website_leads_count = source_counts.get("website", 0)
+        social_leads_count = source_counts.get("social", 0)
+        total_leads = sum(source_counts.values())
+
+        print(f"DEBUG: Lead counts - Website: {website_leads_count}, Social: {social_leads_count}, Total: {total_leads}")
+
+        # Assignment status buckets
+        summary = get_assignment_summary(db, start_date, end_date)
+        total_assigned = summary["active"] + summary["converted"] + summary["lost"]
+        conversion_rate = (summary["converted"] / total_assigned * 100) if total_assigned > 0 else 0
+
+        # Platform data
+        platform_counts = db.query(
+            LeadDailyRollup.platform_name,
+            func.sum(LeadDailyRollup.lead_count)
+        ).filter(
+            LeadDailyRollup.source == "social",
+            LeadDailyRollup.platform_name != "",
+            *day_range
+        ).group_by(LeadDailyRollup.platform_name).having(func.sum(LeadDailyRollup.lead_count) > 0).all()
+
+        platform_labels = [platform for platform, _ in platform_counts]
+        platform_data = [count for _, count in platform_counts]
+
+        # Monthly trends over the filtered range, or the last few months
+        monthly = get_monthly_trends(db, start_date, end_date, months=DEFAULT_TREND_MONTHS)
+
+        # Team data
+        team = get_team_performance(db, start_date, end_date)
+
+        # Recent activities
+        recent_activities = []
+        recent_leads = db.query(Lead).filter(
+            *_in_range(Lead.created_at, start_date, end_date)
+        ).order_by(Lead.created_at.desc()).limit(5).all()
+        for lead in recent_leads:
+            recent_activities.append({
+                "type": lead.source,
+                "title": f"New {lead.source.title()} Lead: {lead.name}",
+                "description": f"Contact: {lead.contact}",
+                "time": lead.created_at.strftime("%d %b %Y %H:%M")
+            })
+
+        print(f"DEBUG: Analytics data collected")
+
+        return {
+            "website_leads_count": website_leads_count,
+            "social_leads_count": social_leads_count,
+            "total_leads": total_leads,
+            "active_leads_count": summary["active"],
+            "converted_leads_count": summary["converted"],
+            "lost_leads_count": summary["lost"],
+            "pending_leads_count": summary["pending"],
+            "conversion_rate": round(conversion_rate, 1),
+            "website_converted_count": summary["website_converted"],
+            "social_converted_count": summary["social_converted"],
+            "platform_labels": platform_labels,
+            "platform_data": platform_data,
+            "monthly_labels": monthly["labels"],
+            "website_monthly_data": monthly["website"],
+            "social_monthly_data": monthly["social"],
+            "team_labels": team["labels"],
+            "team_data": team["data"],
+            "recent_activities": recent_activities
+        }
+    except Exception as e:
+        print(f"Analytics error: {e}")
+        import traceback
+        traceback.print_exc()
+        # Return empty data as fallback
+        return empty_analytics_data()
+
+
+def empty_analytics_data():
+    """Analytics context with every counter zeroed"""
+    return {
+        "website_leads_count": 0,
+        "social_leads_count": 0,
+        "total_leads": 0,
+        "active_leads_count": 0,
+        "converted_leads_count": 0,
+        "lost_leads_count": 0,
+        "pending_leads_count": 0,
+        "conversion_rate": 0,
+        "website_converted_count": 0,
+        "social_converted_count": 0,
+        "platform_labels": [],
+        "platform_data": [],
+        "monthly_labels": [],
+        "website_monthly_data": [],
+        "social_monthly_data": [],
+        "team_labels": [],
+        "team_data": [],
+        "recent_activities": []
+    }
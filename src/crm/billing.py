@@ -0,0 +1,61 @@
+from typing import Any, Callable, Dict
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from src.shared.crm_models import Employee, LeadAssignment, Billing
+
+# Monthly billing generation
+#
+# Runs as a background job (see src/crm/jobs.py). Conversion counts for every
+# employee come from one grouped query, and all billing rows are committed
+# together so a month is either fully generated or not at all.
+
+# Assumed loan value per conversion when computing commission
+COMMISSION_BASE_AMOUNT = 10000
+
+
+def billing_exists(db: Session, month: int, year: int) -> bool:
+    return db.query(Billing.billing_id).filter(Billing.month == month, Billing.year == year).first() is not None
+
+
+def generate_monthly_billing(db: Session, month: int, year: int,
+                             progress_callback: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+    """Create pending billing records for every active employee"""
+    if billing_exists(db, month, year):
+        raise ValueError(f"Billing for {month}/{year} already exists")
+
+    employees = db.query(Employee).filter(Employee.is_active == True).all()
+    conversions = dict(db.query(
+        LeadAssignment.employee_id, func.count(LeadAssignment.assignment_id)
+    ).filter(
+        LeadAssignment.status == "converted"
+    ).group_by(LeadAssignment.employee_id).all())
+
+    totals = {'employees': len(employees), 'processed': 0,
+              'total_basic_salary': 0.0, 'total_commission': 0.0, 'total_net_salary': 0.0}
+
+    for employee in employees:
+        commission_earned = conversions.get(employee.employee_id, 0) * (employee.commission_rate / 100) * COMMISSION_BASE_AMOUNT
+        net_salary = employee.salary + commission_earned
+
+        db.add(Billing(
+            employee_id=employee.employee_id,
+            month=month,
+            year=year,
+            basic_salary=employee.salary,
+            commission_earned=commission_earned,
+            deductions=0.0,  # No deductions for now
+            net_salary=net_salary,
+            payment_status="pending"
+        ))
+
+        totals['processed'] += 1
+        totals['total_basic_salary'] += employee.salary
+        totals['total_commission'] += commission_earned
+        totals['total_net_salary'] += net_salary
+        if progress_callback and totals['processed'] % 100 == 0:
+            progress_callback(dict(totals))
+
+    db.commit()
+    if progress_callback:
+        progress_callback(dict(totals))
+    return totals
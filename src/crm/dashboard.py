@@ -0,0 +1,344 @@
+import sys
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from src.shared.crm_models import Lead, LeadAssignment, Employee, User, Team, LeadDailyRollup, AssignmentDailyRollup
+
+# Dashboard aggregation
+#
+# Every persona's counters are computed with a fixed number of GROUP BY queries,
+# so the dashboard costs the same handful of queries however many teams,
+# members or leads there are. The organisation-wide admin counters read the
+# daily rollup tables (see src/crm/rollups.py) instead of scanning every lead.
+#
+# The per-persona query budget of the /crm/dashboard endpoint, and the counters
+# themselves, are checked against a small and a large organisation seeded into
+# a temporary SQLite database; --use-configured-db seeds CRM_DATABASE_URL instead
+# (e.g. a throwaway Postgres database, never a live one):
+#   python -m src.crm.dashboard check
+
+# Assignment statuses that still need work from the assignee
+PENDING_STATUSES = ['assigned', 'pd', 'login', 'login_query']
+
+RECENT_LEADS_LIMIT = 5
+
+# Queries per get_dashboard_stats() call; the endpoint adds the current user and employee lookups
+QUERY_BUDGET = {"admin": 5, "manager": 5, "employee": 4}
+
+
+@dataclass
+class DashboardStats:
+    """Counters and lists rendered by dashboard.html for one persona"""
+    persona: str
+    total_leads: int = 0
+    website_leads_count: int = 0
+    social_leads_count: int = 0
+    status_summary: Dict[str, int] = field(default_factory=dict)
+    recent_leads: List[Lead] = field(default_factory=list)
+
+    # Admin
+    unassigned_leads: int = 0
+    users_count: int = 0
+    employees_count: int = 0
+    teams_count: int = 0
+    team_performance: List[Dict[str, Any]] = field(default_factory=list)
+
+    # Manager
+    team: Optional[Team] = None
+    team_members: List[Employee] = field(default_factory=list)
+    member_performance: List[Dict[str, Any]] = field(default_factory=list)
+
+    # Employee
+    assigned_leads_count: int = 0
+    pending_leads_count: int = 0
+    team_info: Optional[Team] = None
+    employee: Optional[Employee] = None
+
+    def to_context(self) -> Dict[str, Any]:
+        """Template context; a shallow copy so ORM objects are passed through as-is"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+def _source_counts(query) -> Dict[str, int]:
+    """Run a (source, count) GROUP BY query and return it as a dict"""
+    return {source: count for source, count in query.all()}
+
+
+def _status_summary(query) -> Dict[str, int]:
+    """Run a (status, count) GROUP BY query and return it as a dict"""
+    return {status: count for status, count in query.all()}
+
+
+def _recent_leads(db: Session, lead_ids) -> List[Lead]:
+    """Newest leads among a lead_id subquery; IN instead of SELECT DISTINCT, which Postgres can't do over the json column"""
+    return db.query(Lead).filter(Lead.lead_id.in_(lead_ids)).order_by(
+        Lead.created_at.desc()
+    ).limit(RECENT_LEADS_LIMIT).all()
+
+
+def _apply_lead_counts(stats: DashboardStats, source_counts: Dict[str, int]):
+    stats.total_leads = sum(source_counts.values())
+    stats.website_leads_count = source_counts.get("website", 0)
+    stats.social_leads_count = source_counts.get("social", 0)
+
+
+def get_admin_dashboard(db: Session) -> DashboardStats:
+    """Organisation-wide counters: 5 queries"""
+    stats = DashboardStats(persona="admin")
+
+    _apply_lead_counts(stats, _source_counts(
+        db.query(LeadDailyRollup.source, func.sum(LeadDailyRollup.lead_count)).group_by(LeadDailyRollup.source)
+    ))
+
+    stats.status_summary = _status_summary(
+        db.query(AssignmentDailyRollup.status, func.sum(AssignmentDailyRollup.assignment_count)).group_by(
+            AssignmentDailyRollup.status
+        ).having(func.sum(AssignmentDailyRollup.assignment_count) > 0)
+    )
+    stats.unassigned_leads = stats.total_leads - sum(stats.status_summary.values())
+
+    stats.users_count, stats.employees_count, stats.teams_count = db.execute(select(
+        select(func.count(User.user_id)).scalar_subquery(),
+        select(func.count(Employee.employee_id)).scalar_subquery(),
+        select(func.count(Team.team_id)).scalar_subquery()
+    )).one()
+
+    # Member and lead counts per team in one pass
+    member_counts = select(
+        Employee.team_id, func.count(Employee.employee_id).label("member_count")
+    ).group_by(Employee.team_id).subquery()
+    lead_counts = select(
+        AssignmentDailyRollup.team_id, func.sum(AssignmentDailyRollup.assignment_count).label("lead_count")
+    ).group_by(AssignmentDailyRollup.team_id).subquery()
+
+    teams = db.query(
+        Team,
+        func.coalesce(member_counts.c.member_count, 0),
+        func.coalesce(lead_counts.c.lead_count, 0)
+    ).outerjoin(
+        member_counts, member_counts.c.team_id == Team.team_id
+    ).outerjoin(
+        lead_counts, lead_counts.c.team_id == Team.team_id
+    ).order_by(Team.team_id).all()
+
+    stats.team_performance = [
+        {"team": team, "member_count": member_count, "lead_count": lead_count}
+        for team, member_count, lead_count in teams
+    ]
+
+    stats.recent_leads = db.query(Lead).order_by(Lead.created_at.desc()).limit(RECENT_LEADS_LIMIT).all()
+    return stats
+
+
+def get_manager_dashboard(db: Session, current_employee: Optional[Employee]) -> DashboardStats:
+    """Counters for the manager's team: 5 queries"""
+    stats = DashboardStats(persona="manager")
+    if not current_employee or not current_employee.team_id:
+        return stats
+
+    team_id = current_employee.team_id
+
+    # Members with their users and lead counts; only the team's assignments are counted
+    member_leads = select(
+        LeadAssignment.employee_id, func.count(LeadAssignment.assignment_id).label("lead_count")
+    ).join(
+        Employee, Employee.employee_id == LeadAssignment.employee_id
+    ).where(Employee.team_id == team_id).group_by(LeadAssignment.employee_id).subquery()
+
+    members = db.query(
+        Employee, User, func.coalesce(member_leads.c.lead_count, 0)
+    ).outerjoin(
+        User, User.user_id == Employee.user_id
+    ).outerjoin(
+        member_leads, member_leads.c.employee_id == Employee.employee_id
+    ).filter(Employee.team_id == team_id).order_by(Employee.employee_id).all()
+
+    stats.team_members = [employee for employee, _, _ in members]
+    stats.member_performance = [
+        {"employee": employee, "lead_count": lead_count, "user": user}
+        for employee, user, lead_count in members
+    ]
+
+    team_leads = db.query(Lead).join(
+        LeadAssignment, LeadAssignment.lead_id == Lead.lead_id
+    ).join(
+        Employee, Employee.employee_id == LeadAssignment.employee_id
+    ).filter(Employee.team_id == team_id)
+
+    _apply_lead_counts(stats, _source_counts(
+        team_leads.with_entities(Lead.source, func.count(func.distinct(Lead.lead_id))).group_by(Lead.source)
+    ))
+    stats.recent_leads = _recent_leads(db, select(LeadAssignment.lead_id).join(
+        Employee, Employee.employee_id == LeadAssignment.employee_id
+    ).where(Employee.team_id == team_id))
+
+    stats.status_summary = _status_summary(
+        db.query(LeadAssignment.status, func.count(LeadAssignment.assignment_id)).join(
+            Employee, Employee.employee_id == LeadAssignment.employee_id
+        ).filter(Employee.team_id == team_id).group_by(LeadAssignment.status)
+    )
+
+    stats.team = db.query(Team).filter(Team.team_id == team_id).first()
+    return stats
+
+
+def get_employee_dashboard(db: Session, employee_id: Optional[int],
+                           current_employee: Optional[Employee] = None) -> DashboardStats:
+    """Counters for the employee's own leads: at most 4 queries"""
+    stats = DashboardStats(persona="employee")
+    if not employee_id:
+        return stats
+
+    stats.employee = current_employee
+
+    stats.status_summary = _status_summary(
+        db.query(LeadAssignment.status, func.count(LeadAssignment.assignment_id)).filter(
+            LeadAssignment.employee_id == employee_id
+        ).group_by(LeadAssignment.status)
+    )
+    stats.assigned_leads_count = sum(stats.status_summary.values())
+    stats.pending_leads_count = sum(stats.status_summary.get(s, 0) for s in PENDING_STATUSES)
+
+    employee_leads = db.query(Lead).join(
+        LeadAssignment, LeadAssignment.lead_id == Lead.lead_id
+    ).filter(LeadAssignment.employee_id == employee_id)
+
+    _apply_lead_counts(stats, _source_counts(
+        employee_leads.with_entities(Lead.source, func.count(func.distinct(Lead.lead_id))).group_by(Lead.source)
+    ))
+    stats.recent_leads = _recent_leads(db, select(LeadAssignment.lead_id).where(
+        LeadAssignment.employee_id == employee_id
+    ))
+
+    if current_employee and current_employee.team_id:
+        stats.team_info = db.query(Team).filter(Team.team_id == current_employee.team_id).first()
+    return stats
+
+
+def get_dashboard_stats(db: Session, user_role: str, employee_id: Optional[int] = None,
+                        current_employee: Optional[Employee] = None) -> DashboardStats:
+    """Compute the dashboard for the given persona"""
+    if user_role == "admin":
+        return get_admin_dashboard(db)
+    if user_role == "manager":
+        return get_manager_dashboard(db, current_employee)
+    return get_employee_dashboard(db, employee_id, current_employee)
+
+
+def _count_queries(engine, func, *args):
+    """(result, statements executed) for one call"""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        result = func(*args)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return result, len(statements)
+
+
+def check(sizes=((2, 3, 200), (20, 10, 20000))):
+    """Query budget and counters of every persona, for a small and a large organisation"""
+    from starlette.requests import Request
+    from src.shared.crm_models import CRMBase
+    from src.shared.database import get_engine, get_sessionmaker
+    from src.crm.sample_data import seed_sample_crm
+    from src.crm.routes import dashboard
+
+    engine = get_engine("crm")
+    CRMBase.metadata.create_all(bind=engine)
+    SessionLocal = get_sessionmaker("crm")
+    counts = {}
+    failures = []
+
+    def fail(message):
+        failures.append(message)
+        print(f"❌ {message}")
+
+    for seed, (teams, members, leads) in enumerate(sizes):
+        db = SessionLocal()
+        sample = seed_sample_crm(db, teams, members, leads, seed=seed)
+        label = f"{teams} teams x {members} members, {leads} leads"
+        personas = {
+            "admin": (sample["manager"].user_id, None),
+            "manager": (sample["manager"].user_id, sample["manager"].employee_id),
+            "employee": (sample["employee"].user_id, sample["employee"].employee_id),
+        }
+        for persona, (user_id, employee_id) in personas.items():
+            db.expire_all()
+            current_employee = db.get(Employee, employee_id) if employee_id else None
+            stats, queries = _count_queries(engine, get_dashboard_stats, db, persona, employee_id, current_employee)
+            request = Request({
+                "type": "http", "method": "GET", "path": "/crm/dashboard", "query_string": b"", "headers": [],
+                "server": ("check", 80), "scheme": "http",
+                "session": {"user_id": user_id, "user_role": persona, "employee_id": employee_id}
+            })
+            db.expire_all()
+            response, endpoint_queries = _count_queries(engine, dashboard, request, db)
+            counts.setdefault(persona, []).append((queries, endpoint_queries))
+            print(f"   {persona:>8} ({label}): {queries} queries for the counters, "
+                  f"{endpoint_queries} for the endpoint ({response.status_code})")
+            if queries > QUERY_BUDGET[persona] or endpoint_queries > QUERY_BUDGET[persona] + 2:
+                fail(f"{persona} dashboard exceeds its budget of {QUERY_BUDGET[persona]} (+2 for the endpoint)")
+            if response.status_code != 200:
+                fail(f"{persona} dashboard returned {response.status_code}")
+            _check_counters(db, persona, stats, current_employee, fail)
+        db.close()
+
+    for persona, runs in counts.items():
+        if len(set(runs)) != 1:
+            fail(f"{persona} dashboard query count depends on the data size: {runs}")
+    if failures:
+        print(f"❌ {len(failures)} dashboard checks failed")
+        return False
+    print("✅ Dashboard query counts are within budget and independent of team and lead counts")
+    return True
+
+
+def _check_counters(db: Session, persona: str, stats: DashboardStats, current_employee, fail):
+    """Compare the aggregated counters with plain per-row counts"""
+    assignments = db.query(LeadAssignment.employee_id, LeadAssignment.status, Lead.source, Employee.team_id).join(
+        Lead, Lead.lead_id == LeadAssignment.lead_id
+    ).join(Employee, Employee.employee_id == LeadAssignment.employee_id).all()
+    if persona == "admin":
+        expected_status = {}
+        for _, status, _, _ in assignments:
+            expected_status[status] = expected_status.get(status, 0) + 1
+        expected_teams = {}
+        for _, _, _, team_id in assignments:
+            expected_teams[team_id] = expected_teams.get(team_id, 0) + 1
+        actual_teams = {row["team"].team_id: row["lead_count"] for row in stats.team_performance if row["lead_count"]}
+        expected = (db.query(Lead).count(), expected_status, expected_teams)
+        actual = (stats.total_leads, stats.status_summary, actual_teams)
+    elif persona == "manager":
+        team_rows = [row for row in assignments if row[3] == current_employee.team_id]
+        expected_members = {}
+        for employee_id, _, _, _ in team_rows:
+            expected_members[employee_id] = expected_members.get(employee_id, 0) + 1
+        actual_members = {row["employee"].employee_id: row["lead_count"]
+                          for row in stats.member_performance if row["lead_count"]}
+        expected = (len(team_rows), expected_members)
+        actual = (stats.total_leads, actual_members)
+    else:
+        own = [row for row in assignments if row[0] == current_employee.employee_id]
+        expected = (len(own), sum(1 for row in own if row[1] in PENDING_STATUSES),
+                    sum(1 for row in own if row[2] == "website"))
+        actual = (stats.assigned_leads_count, stats.pending_leads_count, stats.website_leads_count)
+    if expected != actual:
+        fail(f"{persona} dashboard counters differ from per-row counts: {actual} != {expected}")
+
+
+if __name__ == "__main__":
+    # python -m src.crm.dashboard check [--use-configured-db]
+    args = sys.argv[1:]
+    if not args or args[0] != "check" or not set(args[1:]) <= {"--use-configured-db"}:
+        print("Usage: python -m src.crm.dashboard check [--use-configured-db]")
+        sys.exit(1)
+    if "--use-configured-db" not in args:
+        from src.shared.database import use_scratch_database
+        use_scratch_database("crm")
+    sys.exit(0 if check() else 1)
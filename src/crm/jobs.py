@@ -0,0 +1,266 @@
+import os
+import tempfile
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.shared.crm_models import Job, JobLock
+from src.shared.database import get_sessionmaker
+from src.crm.lead_import import import_leads, ImportProgress
+from src.crm.lead_service import LeadService
+from src.crm.billing import generate_monthly_billing
+
+# Background jobs
+#
+# Long CRM operations (bulk import, lead migration, billing generation) are
+# recorded in the jobs table and executed by a small per-worker thread pool,
+# so the request that starts one returns a job id straight away and the client
+# polls /crm/jobs/{id}. A job is claimed with a conditional UPDATE, so only one
+# gunicorn worker ever runs it. Handlers report progress through a checkpoint
+# callback that is committed from its own session, independently of the
+# handler's work. On startup, queued jobs and running jobs whose heartbeat has
+# gone stale (their worker died) are picked up again; handlers are written to
+# be safe to re-run and checkpoint at least every few seconds of work. Jobs
+# that must not run twice at once (billing for a month, lead migration) are
+# enqueued with a lock_key: a job_locks row, held until the job finishes,
+# makes a second enqueue return the job already queued or running.
+
+JOB_WORKERS = int(os.getenv("CRM_JOB_WORKERS", "2"))
+
+# A running job whose last checkpoint is older than this is presumed dead
+JOB_STALE_AFTER = timedelta(seconds=int(os.getenv("CRM_JOB_STALE_SECONDS", "900")))
+
+# Where uploaded files wait for their job
+JOB_UPLOAD_DIR = os.getenv("CRM_JOB_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "advance-credit-jobs"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# job_type -> handler(db, params, checkpoint, progress) returning the job result
+JOB_HANDLERS: Dict[str, Callable] = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def job_handler(job_type: str):
+    """Register a function as the handler for a job type"""
+    def register(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return register
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="crm-job")
+    return _executor
+
+
+def enqueue_job(db: Session, job_type: str, params: Dict[str, Any] = None, created_by: Optional[int] = None,
+                lock_key: Optional[str] = None) -> Job:
+    """Persist a job and hand it to the worker pool; with a lock_key, return the active job holding it instead"""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type '{job_type}'")
+    lock_key = f"{job_type}:{lock_key}" if lock_key else None
+    if lock_key:
+        active = _locked_job(db, lock_key)
+        if active is not None:
+            return active
+    job = Job(job_type=job_type, status=QUEUED, params=params or {}, progress={},
+              created_by=created_by, created_at=datetime.utcnow())
+    db.add(job)
+    try:
+        if lock_key:
+            db.flush()
+            db.add(JobLock(lock_key=lock_key, job_id=job.job_id))
+        db.commit()
+    except IntegrityError:
+        # Another request took the lock between the check and the insert
+        db.rollback()
+        active = _locked_job(db, lock_key) if lock_key else None
+        if active is None:
+            raise
+        return active
+    print(f"📋 Queued {job_type} job #{job.job_id}")
+    _get_executor().submit(run_job, job.job_id)
+    return job
+
+
+def _locked_job(db: Session, lock_key: str) -> Optional[Job]:
+    lock = db.get(JobLock, lock_key)
+    if lock is None:
+        return None
+    job = db.get(Job, lock.job_id)
+    print(f"📋 {job.job_type} job #{job.job_id} is already {job.status}; not queueing another")
+    return job
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Atomically move a queued job to running; False if another worker got it"""
+    now = datetime.utcnow()
+    claimed = db.query(Job).filter(Job.job_id == job_id, Job.status == QUEUED).update({
+        Job.status: RUNNING,
+        Job.started_at: now,
+        Job.heartbeat_at: now,
+        Job.attempts: Job.attempts + 1
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def _finish(job_db: Session, job_id: int, status: str, result=None, error: str = None):
+    job = job_db.get(Job, job_id)
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    job_db.query(JobLock).filter(JobLock.job_id == job_id).delete(synchronize_session=False)
+    job_db.commit()
+
+
+def run_job(job_id: int):
+    """Execute one job; runs on a pool thread"""
+    SessionLocal = get_sessionmaker("crm")
+    job_db = SessionLocal()
+    work_db = SessionLocal()
+    try:
+        if not _claim(job_db, job_id):
+            return
+        job = job_db.get(Job, job_id)
+        handler = JOB_HANDLERS.get(job.job_type)
+        print(f"⚙️ Running {job.job_type} job #{job_id} (attempt {job.attempts})")
+
+        def checkpoint(progress: Dict[str, Any]):
+            job.progress = dict(progress)
+            job.heartbeat_at = datetime.utcnow()
+            job_db.commit()
+
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job type '{job.job_type}'")
+            result = handler(work_db, dict(job.params or {}), checkpoint, dict(job.progress or {}))
+        except Exception as e:
+            work_db.rollback()
+            traceback.print_exc()
+            _finish(job_db, job_id, FAILED, error=str(e))
+            print(f"❌ {job.job_type} job #{job_id} failed: {e}")
+            return
+
+        _finish(job_db, job_id, SUCCEEDED, result=result)
+        print(f"✅ {job.job_type} job #{job_id} finished")
+    except Exception as e:
+        print(f"❌ Job runner error for job #{job_id}: {e}")
+        traceback.print_exc()
+    finally:
+        work_db.close()
+        job_db.close()
+
+
+def resume_jobs():
+    """Requeue jobs orphaned by a dead worker and dispatch everything queued"""
+    db = get_sessionmaker("crm")()
+    try:
+        stale = db.query(Job).filter(
+            Job.status == RUNNING,
+            Job.heartbeat_at < datetime.utcnow() - JOB_STALE_AFTER
+        ).update({Job.status: QUEUED}, synchronize_session=False)
+        db.commit()
+        if stale:
+            print(f"🔁 Requeued {stale} stale jobs")
+
+        queued = [job_id for (job_id,) in db.query(Job.job_id).filter(Job.status == QUEUED).order_by(Job.job_id)]
+    finally:
+        db.close()
+
+    for job_id in queued:
+        _get_executor().submit(run_job, job_id)
+    return len(queued)
+
+
+def shutdown_jobs():
+    """Stop the pool without waiting; unstarted jobs stay queued in the database"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def job_to_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "progress": job.progress or {},
+        "result": job.result,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+def save_upload(fileobj):
+    """Copy an uploaded file to the job upload directory; returns (path, line count)"""
+    os.makedirs(JOB_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(JOB_UPLOAD_DIR, f"{uuid.uuid4().hex}.csv")
+    lines = 0
+    last = b"\n"
+    with open(path, "wb") as out:
+        while True:
+            block = fileobj.read(1024 * 1024)
+            if not block:
+                break
+            lines += block.count(b"\n")
+            last = block[-1:]
+            out.write(block)
+    if last != b"\n":
+        lines += 1
+    return path, lines
+
+
+# Job handlers
+
+@job_handler("bulk_import")
+def bulk_import_job(db: Session, params, checkpoint, progress):
+    path = params["path"]
+    total_rows = params.get("total_rows")
+    resumed = ImportProgress(**{k: v for k, v in progress.items() if k != "total_rows"}) if progress else None
+    try:
+        with open(path, "rb") as source:
+            result = import_leads(
+                db, source, params["created_by_employee_id"],
+                skip_duplicates=params.get("skip_duplicates", True),
+                progress_callback=lambda p: checkpoint({**p.to_dict(), "total_rows": total_rows}),
+                progress=resumed
+            )
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return result.to_dict()
+
+
+@job_handler("migrate_leads")
+def migrate_leads_job(db: Session, params, checkpoint, progress):
+    # Commits and checkpoints every batch, so the heartbeat stays fresh and a rerun skips what is done
+    migrated = LeadService.migrate_existing_leads(db, progress_callback=checkpoint)
+    return {"migrated": migrated}
+
+
+@job_handler("generate_billing")
+def generate_billing_job(db: Session, params, checkpoint, progress):
+    month, year = params["month"], params["year"]
+    totals = generate_monthly_billing(db, month, year, progress_callback=checkpoint)
+    totals["invoice_url"] = f"/crm/billing/invoice/{month}/{year}"
+    return totals
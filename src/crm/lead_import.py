@@ -0,0 +1,185 @@
+import csv
+import io
+import os
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional, Set
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from src.shared.crm_models import Lead, LeadActivity
+from src.crm.rollups import record_leads
+
+# Bulk CSV import engine
+#
+# The upload is read as a stream and written in chunks. Each chunk is parsed,
+# deduplicated against an in-memory set of known contacts, inserted with one
+# multi-row INSERT ... RETURNING for the leads and one executemany for their
+# 'created' activities, then committed. Memory stays bounded by the chunk size
+# (plus the contact set), and progress is reported after every chunk.
+
+IMPORT_CHUNK_SIZE = int(os.getenv("LEAD_IMPORT_CHUNK_SIZE", "1000"))
+
+# Row errors kept for the response; error_count still counts every one
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class ImportProgress:
+    """Running counters for one import"""
+    rows_processed: int = 0
+    success_count: int = 0
+    skipped_count: int = 0
+    error_count: int = 0
+    chunks_processed: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def add_error(self, message: str, rows: int = 1):
+        self.error_count += rows
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def open_csv_stream(source):
+    """Text stream over CSV content given as str, bytes, or a text/binary file object"""
+    if isinstance(source, str):
+        return io.StringIO(source)
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if isinstance(source, io.TextIOBase):
+        return source
+    # utf-8-sig also strips the BOM spreadsheet exports put before the header
+    return io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+
+def load_existing_contacts(db: Session) -> Set[str]:
+    """All lead contacts, for O(1) duplicate checks during an import"""
+    return {contact for (contact,) in db.query(Lead.contact).yield_per(10000)}
+
+
+def _clean(row: Dict[str, str], key: str) -> Optional[str]:
+    value = row.get(key)
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+def parse_lead_row(row: Dict[str, str], created_by_employee_id: int) -> Dict[str, Any]:
+    """Map one CSV row to Lead column values, raising ValueError if it is invalid"""
+    name = _clean(row, 'name')
+    contact = _clean(row, 'contact')
+    if not name or not contact:
+        raise ValueError("Name and contact are required")
+
+    additional_data = {'created_by_employee_id': created_by_employee_id}
+    date_of_birth = _clean(row, 'date_of_birth')
+    if date_of_birth:
+        additional_data['date_of_birth'] = date_of_birth
+
+    loan_amount = _clean(row, 'loan_amount')
+    try:
+        loan_amount = float(loan_amount) if loan_amount else None
+    except ValueError:
+        raise ValueError(f"Invalid loan_amount '{loan_amount}'")
+
+    return {
+        'source': 'manual',  # All bulk imported leads are tagged as manual
+        'name': name,
+        'contact': contact,
+        'email': _clean(row, 'email'),
+        'city': _clean(row, 'city'),
+        'loan_amount': loan_amount,
+        'loan_type': _clean(row, 'loan_type'),
+        'occupation': _clean(row, 'occupation'),
+        'message': _clean(row, 'message'),
+        'status': 'new',
+        'additional_data': additional_data
+    }
+
+
+def write_chunk(db: Session, lead_rows: List[Dict[str, Any]], created_by_employee_id: int) -> List[int]:
+    """Insert a chunk of leads with their 'created' activities and commit it"""
+    lead_ids = db.execute(
+        insert(Lead).returning(Lead.lead_id, sort_by_parameter_order=True),
+        lead_rows
+    ).scalars().all()
+
+    db.execute(insert(LeadActivity), [
+        {
+            'lead_id': lead_id,
+            'employee_id': created_by_employee_id,
+            'activity_type': 'created',
+            'description': 'Lead created via bulk import',
+            'activity_data': {'source': 'bulk_import', 'created_by': created_by_employee_id}
+        }
+        for lead_id in lead_ids
+    ])
+    record_leads(db, lead_ids)
+    db.commit()
+    return lead_ids
+
+
+def import_leads(db: Session, source, created_by_employee_id: int, skip_duplicates: bool = True,
+                 chunk_size: int = None,
+                 progress_callback: Callable[[ImportProgress], None] = None,
+                 progress: ImportProgress = None) -> ImportProgress:
+    """Stream a CSV of leads into the database in committed chunks
+
+    Passing the progress of an interrupted import resumes it: the rows it had
+    already processed are skipped and its counters carry on.
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    progress = progress or ImportProgress()
+    resume_after = progress.rows_processed
+    known_contacts = load_existing_contacts(db) if skip_duplicates else set()
+    reader = csv.DictReader(open_csv_stream(source))
+
+    chunk = []
+    chunk_first_row = 2
+
+    def flush_chunk():
+        try:
+            write_chunk(db, chunk, created_by_employee_id)
+            progress.success_count += len(chunk)
+        except Exception as e:
+            # A failed chunk is rolled back as a whole; earlier chunks stay committed.
+            # Its contacts were never inserted, so later rows carrying them are not duplicates
+            db.rollback()
+            known_contacts.difference_update(lead_row['contact'] for lead_row in chunk)
+            progress.add_error(f"Rows {chunk_first_row}-{row_num}: {str(e)}", rows=len(chunk))
+        progress.chunks_processed += 1
+        print(f"📥 Lead import: {progress.rows_processed} rows, {progress.success_count} imported, "
+              f"{progress.skipped_count} skipped, {progress.error_count} errors")
+        if progress_callback:
+            progress_callback(progress)
+
+    row_num = 1
+    for row_num, row in enumerate(reader, start=2):  # Start at 2 because header is row 1
+        if row_num - 1 <= resume_after:
+            chunk_first_row = row_num + 1
+            continue
+        progress.rows_processed += 1
+        try:
+            lead_row = parse_lead_row(row, created_by_employee_id)
+        except ValueError as e:
+            progress.add_error(f"Row {row_num}: {str(e)}")
+            continue
+
+        if skip_duplicates:
+            if lead_row['contact'] in known_contacts:
+                progress.skipped_count += 1
+                continue
+            known_contacts.add(lead_row['contact'])
+
+        chunk.append(lead_row)
+        if len(chunk) >= chunk_size:
+            flush_chunk()
+            chunk = []
+            chunk_first_row = row_num + 1
+
+    if chunk:
+        flush_chunk()
+
+    return progress
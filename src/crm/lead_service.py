@@ -1,8 +1,14 @@
+import base64
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from src.shared.crm_models import Lead, LeadActivity, LeadAssignment, Employee, WebsiteLead, SocialMediaLead, Disbursement, LeadComment
+from sqlalchemy import func, or_, and_, type_coerce, String, insert
+from src.shared.crm_models import Lead, LeadActivity, LeadAssignment, Employee, User, WebsiteLead, SocialMediaLead, Disbursement, LeadComment
+from src.crm.rollups import record_leads, record_assignments, record_status_change
+from src.crm.lead_import import import_leads
+
+# Legacy leads migrated per commit (and job checkpoint) by migrate_existing_leads
+MIGRATION_BATCH_SIZE = 500
 
 class LeadService:
     """Service for managing unified lead workflow and activity logging"""
@@ -99,8 +105,8 @@ class LeadService:
             additional_data={'original_message': message}
         )
         db.add(lead)
-        db.commit()
-        db.refresh(lead)
+        db.flush()
+        record_leads(db, [lead.lead_id])
         
         # Log activity
         LeadService.log_activity(
@@ -108,11 +114,72 @@ class LeadService:
             lead_id=lead.lead_id,
             activity_type='created',
             description=f'Lead created from website contact form',
-            activity_data={'source': 'website', 'form_type': 'contact'}
+            activity_data={'source': 'website', 'form_type': 'contact'},
+            commit=False
         )
         
+        db.commit()
+        db.refresh(lead)
+        
         return lead
     
+    @staticmethod
+    def website_lead_entry(name: str, contact: str, email: str, message: str, created_at: datetime = None) -> Dict[str, Any]:
+        """Lead and 'created' activity values for a website form lead, for create_leads()"""
+        lead = {
+            'source': 'website',
+            'name': name,
+            'contact': contact,
+            'email': email,
+            'message': message,
+            'status': 'new',
+            'additional_data': {'original_message': message}
+        }
+        if created_at:
+            lead['created_at'] = created_at
+        return {
+            'lead': lead,
+            'activity': {
+                'activity_type': 'created',
+                'description': 'Lead created from website contact form',
+                'activity_data': {'source': 'website', 'form_type': 'contact'}
+            }
+        }
+    
+    @staticmethod
+    def create_leads(db: Session, entries: List[Dict[str, Any]], commit: bool = True) -> List[int]:
+        """Create many leads with one multi-row insert each for leads and their activities
+
+        Entries come from website_lead_entry(). Returns the lead ids in entry
+        order.
+        """
+        if not entries:
+            return []
+        lead_ids = db.execute(
+            insert(Lead).returning(Lead.lead_id, sort_by_parameter_order=True),
+            [entry['lead'] for entry in entries]
+        ).scalars().all()
+        
+        db.execute(insert(LeadActivity), [
+            {**entry['activity'], 'lead_id': lead_id}
+            for entry, lead_id in zip(entries, lead_ids)
+        ])
+        record_leads(db, lead_ids)
+        
+        if commit:
+            db.commit()
+        return lead_ids
+    
+    @staticmethod
+    def create_leads_from_website(db: Session, entries: List[Dict[str, Any]], commit: bool = True) -> List[int]:
+        """Create many website form leads; each entry holds name, contact, email, message and optionally created_at"""
+        return LeadService.create_leads(db, [
+            LeadService.website_lead_entry(
+                entry['name'], entry['contact'], entry.get('email'), entry.get('message'), entry.get('created_at')
+            )
+            for entry in entries
+        ], commit=commit)
+    
     @staticmethod
     def create_lead_from_social(db: Session, name: str, contact: str, city: str, 
                                loan_amount: float, platform: str, ongoing_loan: str = None) -> Lead:
@@ -129,8 +196,8 @@ class LeadService:
             additional_data={'platform': platform, 'ongoing_loan': ongoing_loan}
         )
         db.add(lead)
-        db.commit()
-        db.refresh(lead)
+        db.flush()
+        record_leads(db, [lead.lead_id])
         
         # Log activity
         LeadService.log_activity(
@@ -138,9 +205,13 @@ class LeadService:
             lead_id=lead.lead_id,
             activity_type='created',
             description=f'Lead created from {platform}',
-            activity_data={'source': 'social', 'platform': platform}
+            activity_data={'source': 'social', 'platform': platform},
+            commit=False
         )
         
+        db.commit()
+        db.refresh(lead)
+        
         return lead
     
     @staticmethod
@@ -169,8 +240,8 @@ class LeadService:
             additional_data=additional_data
         )
         db.add(lead)
-        db.commit()
-        db.refresh(lead)
+        db.flush()
+        record_leads(db, [lead.lead_id])
         
         # Log activity
         LeadService.log_activity(
@@ -179,9 +250,13 @@ class LeadService:
             employee_id=created_by_employee_id,
             activity_type='created',
             description=f'Manual lead created',
-            activity_data={'source': 'manual', 'created_by': created_by_employee_id}
+            activity_data={'source': 'manual', 'created_by': created_by_employee_id},
+            commit=False
         )
         
+        db.commit()
+        db.refresh(lead)
+        
         return lead
     
     @staticmethod
@@ -207,8 +282,8 @@ class LeadService:
         if lead:
             lead.status = 'assigned'
         
-        db.commit()
-        db.refresh(assignment)
+        db.flush()
+        record_assignments(db, [assignment.assignment_id])
         
         # Log activity
         LeadService.log_activity(
@@ -217,9 +292,13 @@ class LeadService:
             employee_id=assigned_by,
             activity_type='assigned',
             description=f'Lead assigned to employee',
-            activity_data={'assigned_to': employee_id, 'notes': notes}
+            activity_data={'assigned_to': employee_id, 'notes': notes},
+            commit=False
         )
         
+        db.commit()
+        db.refresh(assignment)
+        
         return assignment
     
     @staticmethod
@@ -271,7 +350,7 @@ class LeadService:
             if new_status == 'closed':
                 lead.state = 'closed'
         
-        db.commit()
+        record_status_change(db, assignment_id, current_status, new_status)
         
         # Log activity
         activity_type = 'status_undone' if undo_old_status else 'status_changed'
@@ -299,18 +378,21 @@ class LeadService:
             employee_id=employee_id,
             activity_type=activity_type,
             description=description,
-            activity_data=activity_data
+            activity_data=activity_data,
+            commit=False
         )
         
         # Add comment if provided
         if comment:
-            LeadService.add_comment(db, assignment.lead_id, employee_id, comment)
+            LeadService.add_comment(db, assignment.lead_id, employee_id, comment, commit=False)
         
+        # Status change, activity and comment land in one transaction
+        db.commit()
         return True
     
     @staticmethod
-    def add_comment(db: Session, lead_id: int, employee_id: int, comment: str) -> LeadComment:
-        """Add a comment to a lead"""
+    def add_comment(db: Session, lead_id: int, employee_id: int, comment: str, commit: bool = True) -> LeadComment:
+        """Add a comment to a lead; with commit=False it joins the caller's transaction"""
         try:
             # Get the assignment for this lead
             assignment = db.query(LeadAssignment).filter(LeadAssignment.lead_id == lead_id).first()
@@ -324,8 +406,6 @@ class LeadService:
             )
             
             db.add(lead_comment)
-            db.commit()
-            db.refresh(lead_comment)
             
             # Log activity
             LeadService.log_activity(
@@ -334,9 +414,14 @@ class LeadService:
                 employee_id=employee_id,
                 activity_type='comment_added',
                 description=f'Comment added: {comment[:50]}{"..." if len(comment) > 50 else ""}',
-                activity_data={'comment': comment}
+                activity_data={'comment': comment},
+                commit=False
             )
             
+            if commit:
+                db.commit()
+                db.refresh(lead_comment)
+            
             return lead_comment
         except Exception as e:
             raise
@@ -359,7 +444,8 @@ class LeadService:
             employee_id=employee_id,
             activity_type='comment_deleted',
             description=f'Comment deleted: {comment.comment[:50]}{"..." if len(comment.comment) > 50 else ""}',
-            activity_data={'deleted_comment': comment.comment}
+            activity_data={'deleted_comment': comment.comment},
+            commit=False
         )
         
         db.delete(comment)
@@ -388,7 +474,6 @@ class LeadService:
         
         if changes:
             lead.updated_at = datetime.now()
-            db.commit()
             
             # Log activity
             LeadService.log_activity(
@@ -397,15 +482,24 @@ class LeadService:
                 employee_id=employee_id,
                 activity_type='lead_updated',
                 description=f'Lead information updated',
-                activity_data={'changes': changes}
+                activity_data={'changes': changes},
+                commit=False
             )
+            
+            db.commit()
         
         return True
     
     @staticmethod
     def log_activity(db: Session, lead_id: int, activity_type: str, description: str,
-                    activity_data: Dict[str, Any] = None, employee_id: int = None) -> LeadActivity:
-        """Log an activity for a lead"""
+                    activity_data: Dict[str, Any] = None, employee_id: int = None,
+                    commit: bool = True) -> LeadActivity:
+        """Log an activity for a lead.
+
+        With commit=False the activity is only staged on the session (unit of work), so
+        it is written in the same transaction as the caller's change when the caller
+        commits. Service methods all stage their activity this way.
+        """
         activity = LeadActivity(
             lead_id=lead_id,
             employee_id=employee_id,
@@ -414,95 +508,28 @@ class LeadService:
             activity_data=activity_data or {}
         )
         db.add(activity)
-        db.commit()
-        db.refresh(activity)
+        if commit:
+            db.commit()
+            db.refresh(activity)
         return activity
     
     @staticmethod
-    def bulk_import_leads(db: Session, csv_content: str, created_by_employee_id: int, skip_duplicates: bool = True) -> Dict[str, Any]:
-        """Bulk import leads from CSV content"""
-        import csv
-        import io
-        from datetime import datetime
-        
-        success_count = 0
-        skipped_count = 0
-        error_count = 0
-        errors = []
-        
+    def bulk_import_leads(db: Session, csv_content, created_by_employee_id: int, skip_duplicates: bool = True,
+                          progress_callback=None) -> Dict[str, Any]:
+        """Bulk import leads from CSV content (str, bytes or a file object), streamed in chunks"""
         try:
-            # Parse CSV content
-            csv_reader = csv.DictReader(io.StringIO(csv_content))
-            
-            for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because header is row 1
-                try:
-                    # Validate required fields
-                    if not row.get('name') or not row.get('contact'):
-                        errors.append(f"Row {row_num}: Name and contact are required")
-                        error_count += 1
-                        continue
-                    
-                    # Check for duplicates if skip_duplicates is True
-                    if skip_duplicates:
-                        existing_lead = db.query(Lead).filter(
-                            Lead.contact == row['contact'].strip()
-                        ).first()
-                        if existing_lead:
-                            skipped_count += 1
-                            continue
-                    
-                    # Prepare additional data
-                    additional_data = {'created_by_employee_id': created_by_employee_id}
-                    if row.get('date_of_birth'):
-                        additional_data['date_of_birth'] = row['date_of_birth']
-                    
-                    # Create lead
-                    lead = Lead(
-                        source='manual',  # All bulk imported leads are tagged as manual
-                        name=row['name'].strip(),
-                        contact=row['contact'].strip(),
-                        email=row.get('email', '').strip() if row.get('email') else None,
-                        city=row.get('city', '').strip() if row.get('city') else None,
-                        loan_amount=float(row['loan_amount']) if row.get('loan_amount') and row['loan_amount'].strip() else None,
-                        loan_type=row.get('loan_type', '').strip() if row.get('loan_type') else None,
-                        occupation=row.get('occupation', '').strip() if row.get('occupation') else None,
-                        message=row.get('message', '').strip() if row.get('message') else None,
-                        status='new',
-                        additional_data=additional_data
-                    )
-                    
-                    db.add(lead)
-                    db.flush()  # Get the lead_id
-                    
-                    # Log activity
-                    LeadService.log_activity(
-                        db=db,
-                        lead_id=lead.lead_id,
-                        employee_id=created_by_employee_id,
-                        activity_type='created',
-                        description='Lead created via bulk import',
-                        activity_data={'source': 'bulk_import', 'created_by': created_by_employee_id}
-                    )
-                    
-                    success_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
-                    error_count += 1
-                    continue
-            
-            db.commit()
-            
+            progress = import_leads(
+                db,
+                csv_content,
+                created_by_employee_id,
+                skip_duplicates=skip_duplicates,
+                progress_callback=progress_callback
+            )
         except Exception as e:
             db.rollback()
             raise Exception(f"Error processing CSV: {str(e)}")
         
-        return {
-            "success_count": success_count,
-            "skipped_count": skipped_count,
-            "error_count": error_count,
-            "errors": errors
-        }
+        return progress.to_dict()
     
     @staticmethod
     def get_lead_activities(db: Session, lead_id: int) -> List[LeadActivity]:
@@ -512,28 +539,50 @@ class LeadService:
         ).order_by(LeadActivity.created_at.desc()).all()
     
     @staticmethod
-    def get_lead_timeline(db: Session, lead_id: int) -> List[Dict[str, Any]]:
-        """Get formatted timeline for a lead"""
-        activities = LeadService.get_lead_activities(db, lead_id)
-        timeline = []
+    def get_lead_timeline(db: Session, lead_id: int, limit: int = None, cursor: str = None) -> List[Dict[str, Any]]:
+        """Get formatted timeline for a lead, optionally one page older than cursor"""
+        return LeadService.get_lead_timeline_page(db, lead_id, limit, cursor)['timeline']
+    
+    @staticmethod
+    def get_lead_timeline_page(db: Session, lead_id: int, limit: int = None,
+                               cursor: str = None) -> Dict[str, Any]:
+        """Get one page of a lead's timeline, newest first.
+
+        Activities, their employee and the employee's user name come from a single
+        joined query, and pages resume strictly after the (created_at, activity_id)
+        cursor so older activity can be fetched on demand.
+        """
+        query = db.query(LeadActivity, User.name, LeadService.keyset_column(db, LeadActivity.created_at)).outerjoin(
+            Employee, Employee.employee_id == LeadActivity.employee_id
+        ).outerjoin(
+            User, User.user_id == Employee.user_id
+        ).filter(LeadActivity.lead_id == lead_id)
+        
+        if cursor:
+            query = query.filter(LeadService.keyset_before(
+                db, LeadActivity.created_at, LeadActivity.activity_id, cursor
+            ))
+        
+        query = query.order_by(LeadActivity.created_at.desc(), LeadActivity.activity_id.desc())
+        # Fetch one extra row to know whether older activity exists
+        rows = query.limit(limit + 1).all() if limit else query.all()
         
-        for activity in activities:
-            employee_name = "System"
-            if activity.employee_id:
-                employee = db.query(Employee).filter(Employee.employee_id == activity.employee_id).first()
-                if employee and employee.user:
-                    employee_name = employee.user.name
-            
+        timeline = []
+        for activity, employee_name, _ in rows[:limit]:
             timeline.append({
                 'activity_id': activity.activity_id,
                 'activity_type': activity.activity_type,
                 'description': activity.description,
                 'created_at': activity.created_at,  # Keep as datetime object for template
-                'employee_name': employee_name,
+                'employee_name': employee_name or "System",
                 'activity_data': activity.activity_data
             })
         
-        return timeline
+        next_cursor = None
+        if limit and len(rows) > limit:
+            last_activity, _, last_created_at = rows[limit - 1]
+            next_cursor = LeadService.encode_cursor(last_created_at, last_activity.activity_id)
+        return {'timeline': timeline, 'next_cursor': next_cursor}
     
     @staticmethod
     def get_all_leads(db: Session, filters: Dict[str, Any] = None) -> List[Lead]:
@@ -550,14 +599,115 @@ class LeadService:
                 query = query.join(LeadAssignment).filter(LeadAssignment.employee_id == filters['employee_id'])
         
         return query.order_by(Lead.created_at.desc()).all()
-    
+
     @staticmethod
-    def migrate_existing_leads(db: Session) -> Dict[str, int]:
-        """Migrate existing website and social media leads to unified system"""
-        migrated = {'website': 0, 'social': 0}
-        
+    def keyset_column(db: Session, created_column):
+        """The created_at value pages are ordered by, as selected for a cursor
+
+        SQLite keeps DateTime as text in two forms - server_default rows without
+        fractional seconds, rows written by SQLAlchemy with '.%f' - and ORDER BY
+        compares that text, so cursors carry the stored text itself there.
+        """
+        if db.get_bind().dialect.name == 'sqlite':
+            return type_coerce(created_column, String)
+        return created_column
+
+    @staticmethod
+    def encode_cursor(created_at, row_id: int) -> str:
+        """Encode a (created_at, id) keyset position, as selected by keyset_column, as an opaque cursor"""
+        if isinstance(created_at, datetime):
+            created_at = created_at.strftime('%Y-%m-%d %H:%M:%S.%f')
+        position = f"{created_at}|{row_id}"
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """Decode a cursor produced by encode_cursor into (created_at text, id), raising ValueError if malformed"""
+        try:
+            created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            datetime.fromisoformat(created_at)
+            return created_at, int(row_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    @staticmethod
+    def keyset_before(db: Session, created_column, id_column, cursor: str):
+        """Filter for rows strictly after cursor in (created_at, id) descending order"""
+        cursor_created_at, cursor_id = LeadService.decode_cursor(cursor)
+        created_at = LeadService.keyset_column(db, created_column)
+        if db.get_bind().dialect.name != 'sqlite':
+            cursor_created_at = datetime.fromisoformat(cursor_created_at)
+        return or_(
+            created_at < cursor_created_at,
+            and_(created_at == cursor_created_at, id_column < cursor_id)
+        )
+
+    @staticmethod
+    def get_leads_page(db: Session, filters: Dict[str, Any] = None, limit: int = 50,
+                       cursor: str = None) -> Dict[str, Any]:
+        """Get one keyset page of leads, newest first, with assignment and assignee name.
+
+        Pages are ordered by (created_at, lead_id) descending and resume strictly after
+        the cursor, so cost stays flat however deep the caller scrolls. The assignment
+        and assignee name come from the same joined query instead of per-lead lookups.
+        """
+        query = db.query(Lead, LeadAssignment, User.name, LeadService.keyset_column(db, Lead.created_at)).outerjoin(
+            LeadAssignment, LeadAssignment.lead_id == Lead.lead_id
+        ).outerjoin(
+            Employee, Employee.employee_id == LeadAssignment.employee_id
+        ).outerjoin(
+            User, User.user_id == Employee.user_id
+        )
+
+        if filters:
+            if filters.get('status'):
+                query = query.filter(Lead.status == filters['status'])
+            if filters.get('source'):
+                query = query.filter(Lead.source == filters['source'])
+            if filters.get('employee_id'):
+                query = query.filter(LeadAssignment.employee_id == filters['employee_id'])
+
+        if cursor:
+            query = query.filter(LeadService.keyset_before(db, Lead.created_at, Lead.lead_id, cursor))
+
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(
+            Lead.created_at.desc(), Lead.lead_id.desc()
+        ).limit(limit + 1).all()
+
+        leads = []
+        for lead, assignment, assignee_name, _ in rows[:limit]:
+            lead.assignment = assignment
+            lead.assignee_name = (assignee_name or "Unknown") if assignment else None
+            leads.append(lead)
+
+        next_cursor = None
+        if len(rows) > limit:
+            last_lead, _, _, last_created_at = rows[limit - 1]
+            next_cursor = LeadService.encode_cursor(last_created_at, last_lead.lead_id)
+        return {'leads': leads, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def migrate_existing_leads(db: Session, progress_callback: Callable[[Dict[str, int]], None] = None,
+                               batch_size: int = MIGRATION_BATCH_SIZE) -> Dict[str, int]:
+        """Migrate existing website and social media leads to unified system
+
+        Commits every batch_size legacy leads and reports the running counts to
+        progress_callback; leads migrated by an earlier, interrupted run are skipped.
+        """
+        migrated = {'website': 0, 'social': 0, 'scanned': 0}
+        migrated_leads = []
+
+        def commit_batch():
+            db.flush()
+            record_leads(db, [lead.lead_id for lead in migrated_leads])
+            db.commit()
+            migrated_leads.clear()
+            if progress_callback:
+                progress_callback(dict(migrated))
+
         # Migrate website leads
-        website_leads = db.query(WebsiteLead).all()
+        website_leads = db.query(WebsiteLead).order_by(WebsiteLead.lead_id).all()
         for old_lead in website_leads:
             # Check if already migrated
             existing = db.query(Lead).filter(
@@ -578,10 +728,14 @@ class LeadService:
                     }
                 )
                 db.add(lead)
+                migrated_leads.append(lead)
                 migrated['website'] += 1
+            migrated['scanned'] += 1
+            if migrated['scanned'] % batch_size == 0:
+                commit_batch()
         
         # Migrate social media leads
-        social_leads = db.query(SocialMediaLead).all()
+        social_leads = db.query(SocialMediaLead).order_by(SocialMediaLead.lead_id).all()
         for old_lead in social_leads:
             # Check if already migrated
             existing = db.query(Lead).filter(
@@ -604,9 +758,13 @@ class LeadService:
                     }
                 )
                 db.add(lead)
+                migrated_leads.append(lead)
                 migrated['social'] += 1
+            migrated['scanned'] += 1
+            if migrated['scanned'] % batch_size == 0:
+                commit_batch()
         
-        db.commit()
+        commit_batch()
         return migrated
     
     @staticmethod
@@ -618,7 +776,6 @@ class LeadService:
         
         assignment.pd_loan_amount = amount
         assignment.last_updated = datetime.now()
-        db.commit()
         
         # Log activity
         LeadService.log_activity(
@@ -627,9 +784,12 @@ class LeadService:
             employee_id=employee_id,
             activity_type='pd_amount_updated',
             description=f'PD loan amount updated to ₹{amount:,.0f}',
-            activity_data={'pd_amount': amount}
+            activity_data={'pd_amount': amount},
+            commit=False
         )
         
+        db.commit()
+        
         return True
     
     @staticmethod
@@ -641,7 +801,6 @@ class LeadService:
         
         assignment.approved_loan_amount = amount
         assignment.last_updated = datetime.now()
-        db.commit()
         
         # Log activity
         LeadService.log_activity(
@@ -650,9 +809,12 @@ class LeadService:
             employee_id=employee_id,
             activity_type='approved_amount_updated',
             description=f'Approved loan amount updated to ₹{amount:,.0f}',
-            activity_data={'approved_amount': amount}
+            activity_data={'approved_amount': amount},
+            commit=False
         )
         
+        db.commit()
+        
         return True
     
     @staticmethod
@@ -675,6 +837,7 @@ class LeadService:
         if assignment:
             total_disbursed = LeadService.get_total_disbursed_amount(db, assignment_id)
             if total_disbursed >= (assignment.approved_loan_amount or 0):
+                record_status_change(db, assignment_id, assignment.status, 'disbursed')
                 assignment.status = 'disbursed'
                 assignment.last_updated = datetime.now()
                 
@@ -683,9 +846,6 @@ class LeadService:
                 if lead:
                     lead.status = 'disbursed'
         
-        db.commit()
-        db.refresh(disbursement)
-        
         # Log activity
         LeadService.log_activity(
             db=db,
@@ -698,9 +858,13 @@ class LeadService:
                 'type': disbursement_type,
                 'tranche': tranche_number,
                 'notes': notes
-            }
+            },
+            commit=False
         )
         
+        db.commit()
+        db.refresh(disbursement)
+        
         return disbursement
     
     @staticmethod
@@ -765,14 +929,12 @@ class LeadService:
             
             # Update assignment status if exists
             if assignment:
+                record_status_change(db, assignment.assignment_id, assignment.status, 'closed')
                 assignment.status = 'closed'
                 assignment.last_updated = datetime.now()
                 print(f"DEBUG: Updated assignment status to closed")
             
-            db.commit()
-            print(f"DEBUG: Database committed successfully")
-            
-            # Log activity
+            # Log activity in the same transaction
             LeadService.log_activity(
                 db=db,
                 lead_id=lead_id,
@@ -783,8 +945,12 @@ class LeadService:
                     'close_type': close_type,
                     'close_message': close_message,
                     'close_reason': close_reason
-                }
+                },
+                commit=False
             )
+            
+            db.commit()
+            print(f"DEBUG: Database committed successfully")
             print(f"DEBUG: Activity logged successfully")
             
             return True
@@ -796,8 +962,8 @@ class LeadService:
             raise
     
     @staticmethod
-    def update_lead_details(db: Session, lead_id: int, **kwargs) -> bool:
-        """Update lead details with validation"""
+    def update_lead_details(db: Session, lead_id: int, commit: bool = True, **kwargs) -> bool:
+        """Update lead details with validation; with commit=False it joins the caller's transaction"""
         lead = db.query(Lead).filter(Lead.lead_id == lead_id).first()
         if not lead:
             return False
@@ -831,7 +997,8 @@ class LeadService:
         lead.additional_data = new_additional_data
         
         lead.updated_at = datetime.now()
-        db.commit()
+        if commit:
+            db.commit()
         
         return True
     
@@ -0,0 +1,291 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from src.shared.crm_models import LeadIntake
+from src.shared.database import get_sessionmaker
+from src.crm.lead_service import LeadService
+
+# Durable lead intake spool
+#
+# Public form submissions are appended to a local SQLite file (WAL, one small
+# autocommitted INSERT) instead of being written to the CRM database in the
+# request, so the form response never waits on CRM write latency and a lead is
+# not lost while the CRM database is slow, locked or restarting. A drainer
+# thread in every worker claims batches with a lease, writes them through
+# LeadService in one transaction together with their intake keys, and deletes
+# them from the spool. Failed rows are retried with exponential backoff: the
+# whole batch when the database is unreachable, otherwise row by row so one bad
+# submission cannot hold back the rest. Intake keys already present in
+# lead_intakes are skipped, so a batch replayed after a crash is written once.
+#
+# The drainer is also what batches CRM writes: each claim becomes one
+# multi-row insert for the leads, one for their activities and one rollup
+# update. The benchmark runs on a temporary SQLite database; with
+# --use-configured-db it runs on CRM_DATABASE_URL (e.g. a throwaway Postgres
+# database) and deletes exactly the leads it created afterwards:
+#   python -m src.crm.lead_spool benchmark [rows] [--use-configured-db]
+
+LEAD_SPOOL_PATH = os.getenv("LEAD_SPOOL_PATH", "./lead_spool.db")
+LEAD_SPOOL_BATCH_SIZE = int(os.getenv("LEAD_SPOOL_BATCH_SIZE", "200"))
+LEAD_SPOOL_POLL_SECONDS = float(os.getenv("LEAD_SPOOL_POLL_SECONDS", "1"))
+
+# A claimed row returns to the queue if its drainer has not finished it by then
+LEASE_SECONDS = 60
+MAX_RETRY_DELAY = 300
+
+SPOOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spooled_leads (
+    spool_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    intake_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    received_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+)
+"""
+
+_local = threading.local()
+_wakeup = threading.Event()
+_stop = threading.Event()
+_drainer = None
+
+
+def _connection() -> sqlite3.Connection:
+    """Per-thread autocommit connection to the spool file"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(LEAD_SPOOL_PATH, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA journal_mode = WAL")
+        # NORMAL survives a process crash; only an OS crash can lose the last commits
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(SPOOL_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def spool_lead(name, contact, email, message, source="website") -> str:
+    """Append a form submission to the spool and return its intake key"""
+    intake_key = str(uuid.uuid4())
+    payload = {"name": name, "contact": contact, "email": email, "message": message, "source": source}
+    _connection().execute(
+        "INSERT INTO spooled_leads (intake_key, payload, received_at) VALUES (?, ?, ?)",
+        (intake_key, json.dumps(payload), datetime.utcnow().isoformat(sep=" "))
+    )
+    _wakeup.set()
+    return intake_key
+
+
+def _claim(batch_size: int) -> List[sqlite3.Row]:
+    """Lease up to batch_size available rows to this drainer"""
+    now = time.time()
+    return _connection().execute(
+        """
+        UPDATE spooled_leads SET available_at = ?
+        WHERE spool_id IN (
+            SELECT spool_id FROM spooled_leads WHERE available_at <= ? ORDER BY spool_id LIMIT ?
+        )
+        RETURNING spool_id, intake_key, payload, received_at, attempts
+        """,
+        (now + LEASE_SECONDS, now, batch_size)
+    ).fetchall()
+
+
+def _delete(spool_ids: List[int]):
+    _connection().execute(
+        f"DELETE FROM spooled_leads WHERE spool_id IN ({','.join('?' * len(spool_ids))})", spool_ids
+    )
+
+
+def _retry_later(rows, error: Exception):
+    """Put failed rows back with exponential backoff"""
+    now = time.time()
+    conn = _connection()
+    conn.execute("BEGIN")
+    for spool_id, _, _, _, attempts in rows:
+        conn.execute(
+            "UPDATE spooled_leads SET attempts = attempts + 1, available_at = ?, last_error = ? WHERE spool_id = ?",
+            (now + min(2 ** attempts, MAX_RETRY_DELAY), str(error)[:500], spool_id)
+        )
+    conn.execute("COMMIT")
+    print(f"⚠️ {len(rows)} spooled leads failed, retrying with backoff: {str(error).splitlines()[0]}")
+
+
+def _write(db: Session, rows) -> int:
+    """Write spooled rows to the CRM in one transaction, skipping intake keys already written"""
+    keys = [row[1] for row in rows]
+    written = {key for (key,) in db.query(LeadIntake.intake_key).filter(LeadIntake.intake_key.in_(keys))}
+    rows = [row for row in rows if row[1] not in written]
+    if not rows:
+        return 0
+
+    entries = []
+    for _, _, payload, received_at, _ in rows:
+        entry = json.loads(payload)
+        entry["created_at"] = datetime.fromisoformat(received_at)
+        entries.append(entry)
+
+    lead_ids = LeadService.create_leads_from_website(db, entries, commit=False)
+    db.execute(insert(LeadIntake), [
+        {"intake_key": row[1], "lead_id": lead_id} for row, lead_id in zip(rows, lead_ids)
+    ])
+    db.commit()
+    return len(rows)
+
+
+def drain_once(batch_size: int = None) -> int:
+    """Move one batch from the spool into the CRM; returns the number of rows claimed"""
+    rows = _claim(batch_size or LEAD_SPOOL_BATCH_SIZE)
+    if not rows:
+        return 0
+
+    db = get_sessionmaker("crm")()
+    try:
+        try:
+            written = _write(db, rows)
+            _delete([row[0] for row in rows])
+            if written:
+                print(f"✅ Drained {written} spooled leads into the CRM")
+        except OperationalError as e:
+            # Database unreachable or locked: back off the whole batch
+            db.rollback()
+            _retry_later(rows, e)
+        except Exception as e:
+            db.rollback()
+            if len(rows) == 1:
+                _retry_later(rows, e)
+                return 1
+            # Isolate the failing rows so one bad submission cannot hold back the rest
+            for row in rows:
+                try:
+                    _write(db, [row])
+                    _delete([row[0]])
+                except Exception as row_error:
+                    db.rollback()
+                    _retry_later([row], row_error)
+    finally:
+        db.close()
+    return len(rows)
+
+
+def _drain_forever():
+    while not _stop.is_set():
+        try:
+            claimed = drain_once()
+        except Exception as e:
+            print(f"❌ Lead spool drainer error: {e}")
+            traceback.print_exc()
+            claimed = 0
+        if claimed < LEAD_SPOOL_BATCH_SIZE:
+            _wakeup.wait(LEAD_SPOOL_POLL_SECONDS)
+            _wakeup.clear()
+
+
+def start_spool_drainer():
+    """Start this worker's drainer thread"""
+    global _drainer
+    if _drainer is not None and _drainer.is_alive():
+        return
+    _stop.clear()
+    _connection()  # Create the spool file before the first request
+    _drainer = threading.Thread(target=_drain_forever, name="lead-spool-drainer", daemon=True)
+    _drainer.start()
+
+
+def stop_spool_drainer(timeout: float = 5):
+    """Stop the drainer; anything still spooled is drained after the next start"""
+    global _drainer
+    _stop.set()
+    _wakeup.set()
+    if _drainer is not None:
+        _drainer.join(timeout)
+        _drainer = None
+
+
+def spool_stats() -> Dict[str, Any]:
+    """Spool depth for health checks"""
+    pending, retrying, oldest = _connection().execute(
+        "SELECT COUNT(*), COALESCE(SUM(attempts > 0), 0), MIN(received_at) FROM spooled_leads"
+    ).fetchone()
+    oldest_age = (datetime.utcnow() - datetime.fromisoformat(oldest)).total_seconds() if oldest else 0
+    return {"pending": pending, "retrying": retrying, "oldest_age_seconds": round(oldest_age, 1)}
+
+
+def benchmark(rows: int = 2000):
+    """Rows/s into the CRM: one transaction per lead vs draining the spool in batches"""
+    global LEAD_SPOOL_PATH
+    from src.shared.crm_models import CRMBase, Lead, LeadActivity
+    from src.shared.database import get_engine, get_database_url
+    from src.crm.rollups import record_leads
+
+    CRMBase.metadata.create_all(bind=get_engine("crm"))
+    SessionLocal = get_sessionmaker("crm")
+    spool_dir = tempfile.mkdtemp()
+    LEAD_SPOOL_PATH = os.path.join(spool_dir, "bench_spool.db")
+
+    def cleanup(lead_ids):
+        """Remove exactly the leads this benchmark created, and take them out of the rollups"""
+        db = SessionLocal()
+        record_leads(db, lead_ids, -1)
+        db.query(LeadIntake).filter(LeadIntake.lead_id.in_(lead_ids)).delete(synchronize_session=False)
+        db.query(LeadActivity).filter(LeadActivity.lead_id.in_(lead_ids)).delete(synchronize_session=False)
+        db.query(Lead).filter(Lead.lead_id.in_(lead_ids)).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+        return len(lead_ids)
+
+    print(f"Benchmarking {rows} leads on {get_engine('crm').dialect.name} "
+          f"({get_database_url('crm').split('@')[-1]})")
+
+    lead_ids = []
+    started = time.perf_counter()
+    for i in range(rows):
+        db = SessionLocal()
+        try:
+            lead_ids.append(LeadService.create_lead_from_website(db, f"bench-{i}", f"9{i:09d}", None,
+                                                                 "benchmark").lead_id)
+        finally:
+            db.close()
+    elapsed = time.perf_counter() - started
+    print(f"  per-lead: {cleanup(lead_ids)} leads in {elapsed:.2f}s = {rows / elapsed:,.0f} rows/s")
+
+    started = time.perf_counter()
+    intake_keys = [spool_lead(f"bench-{i}", f"9{i:09d}", None, "benchmark") for i in range(rows)]
+    spooled = time.perf_counter() - started
+    started = time.perf_counter()
+    batches = 0
+    while drain_once():
+        batches += 1
+    drained = time.perf_counter() - started
+    db = SessionLocal()
+    lead_ids = [lead_id for (lead_id,) in db.query(LeadIntake.lead_id).filter(LeadIntake.intake_key.in_(intake_keys))]
+    db.close()
+    print(f"   spooled: {rows} form submissions in {spooled:.2f}s = {rows / spooled:,.0f} rows/s")
+    print(f"   drained: {cleanup(lead_ids)} leads in {drained:.2f}s = {rows / drained:,.0f} rows/s "
+          f"({batches} batches of up to {LEAD_SPOOL_BATCH_SIZE})")
+    shutil.rmtree(spool_dir)
+
+
+if __name__ == "__main__":
+    # python -m src.crm.lead_spool benchmark [rows] [--use-configured-db]
+    args = [arg for arg in sys.argv[1:] if arg != "--use-configured-db"]
+    if not args or args[0] != "benchmark":
+        print("Usage: python -m src.crm.lead_spool benchmark [rows] [--use-configured-db]")
+        sys.exit(1)
+    if "--use-configured-db" not in sys.argv:
+        from src.shared.database import use_scratch_database
+        use_scratch_database("crm")
+    benchmark(*(int(arg) for arg in args[1:2]))
@@ -2,11 +2,13 @@ from fastapi import APIRouter, Request, Form, Depends, status, HTTPException
 from fastapi.responses import RedirectResponse, HTMLResponse
 from sqlalchemy.orm import Session
 from src.shared.crm_models import WebsiteLead, SocialMediaLead, LeadAssignment, Employee, User
-from src.crm.routes import get_db
+from src.shared.database import get_crm_db as get_db
+from src.main_app.static_assets import asset_url
 from fastapi.templating import Jinja2Templates
 
 router = APIRouter()
 templates = Jinja2Templates(directory="src/crm/templates")
+templates.env.globals["asset_url"] = asset_url
 
 # Manual Lead Creation Routes
 @router.get("/leads/add-website", response_class=HTMLResponse)
@@ -0,0 +1,155 @@
+import sys
+from typing import Iterable, Optional
+from sqlalchemy import func, select, literal
+from sqlalchemy.orm import Session
+from src.shared.crm_models import Lead, LeadAssignment, Employee, LeadDailyRollup, AssignmentDailyRollup
+
+# Daily analytics rollups
+#
+# lead_daily_rollups counts leads per day x source x platform and
+# assignment_daily_rollups counts assignments per lead-creation day x team x
+# status x source. Write paths bump them inside their own transaction with an
+# INSERT ... SELECT ... ON CONFLICT DO UPDATE, so analytics cost scales with the
+# number of days rather than the number of leads. Assignments are bucketed by
+# their employee's current team, so anything that moves an assignment to
+# another employee, or an employee to another team, takes the affected rows
+# out (delta=-1), flushes the change and counts them back in. Writes that
+# bypass these helpers are reconciled by rebuild_rollups():
+#   python -m src.crm.rollups rebuild
+
+LEAD_KEYS = ["day", "source", "platform_name"]
+ASSIGNMENT_KEYS = ["day", "team_id", "status", "source"]
+
+
+def _insert(db: Session):
+    """Dialect-specific insert() that supports ON CONFLICT"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _upsert(db: Session, model, keys, count_column, rows_select):
+    """Add the counts selected by rows_select onto the rollup rows they key into"""
+    table = model.__table__
+    stmt = _insert(db)(table).from_select(keys + [count_column], rows_select)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={count_column: table.c[count_column] + stmt.excluded[count_column]}
+    )
+    db.execute(stmt)
+
+
+def _lead_rows(delta: int = 1):
+    """(day, source, platform, count) per group of leads"""
+    return select(
+        func.date(Lead.created_at),
+        Lead.source,
+        func.coalesce(Lead.platform_name, ""),
+        func.count(Lead.lead_id) * delta
+    ).where(Lead.created_at.isnot(None))
+
+
+def _assignment_rows(delta: int = 1, status: Optional[str] = None):
+    """(day, team, status, source, count) per group of assignments"""
+    status_column = literal(status) if status else LeadAssignment.status
+    return select(
+        func.date(Lead.created_at),
+        func.coalesce(Employee.team_id, 0),
+        status_column,
+        Lead.source,
+        func.count(LeadAssignment.assignment_id) * delta
+    ).join(
+        Lead, LeadAssignment.lead_id == Lead.lead_id
+    ).outerjoin(
+        Employee, LeadAssignment.employee_id == Employee.employee_id
+    ).where(Lead.created_at.isnot(None))
+
+
+def record_leads(db: Session, lead_ids: Iterable[int], delta: int = 1):
+    """Count flushed leads into the daily rollup (delta=-1 before deleting them)"""
+    lead_ids = list(lead_ids)
+    if not lead_ids:
+        return
+    rows = _lead_rows(delta).where(Lead.lead_id.in_(lead_ids)).group_by(
+        func.date(Lead.created_at), Lead.source, func.coalesce(Lead.platform_name, "")
+    )
+    _upsert(db, LeadDailyRollup, LEAD_KEYS, "lead_count", rows)
+
+
+def record_assignments(db: Session, assignment_ids: Iterable[int], delta: int = 1, status: Optional[str] = None):
+    """Count flushed assignments into the daily rollup, optionally under an explicit status"""
+    assignment_ids = list(assignment_ids)
+    if not assignment_ids:
+        return
+    status_column = literal(status) if status else LeadAssignment.status
+    rows = _assignment_rows(delta, status).where(LeadAssignment.assignment_id.in_(assignment_ids)).group_by(
+        func.date(Lead.created_at), func.coalesce(Employee.team_id, 0), status_column, Lead.source
+    )
+    _upsert(db, AssignmentDailyRollup, ASSIGNMENT_KEYS, "assignment_count", rows)
+
+
+def record_employee_assignments(db: Session, employee_ids: Iterable[int], delta: int = 1):
+    """Count every assignment of these employees into the rollup, around a team change"""
+    employee_ids = list(employee_ids)
+    if not employee_ids:
+        return
+    rows = _assignment_rows(delta).where(LeadAssignment.employee_id.in_(employee_ids)).group_by(
+        func.date(Lead.created_at), func.coalesce(Employee.team_id, 0), LeadAssignment.status, Lead.source
+    )
+    _upsert(db, AssignmentDailyRollup, ASSIGNMENT_KEYS, "assignment_count", rows)
+
+
+def record_status_change(db: Session, assignment_id: int, old_status: str, new_status: str):
+    """Move one assignment between status buckets"""
+    if old_status == new_status:
+        return
+    record_assignments(db, [assignment_id], -1, status=old_status)
+    record_assignments(db, [assignment_id], 1, status=new_status)
+
+
+def rebuild_rollups(db: Session):
+    """Recompute both rollup tables from the leads and lead_assignments tables"""
+    insert = _insert(db)
+    db.query(LeadDailyRollup).delete(synchronize_session=False)
+    db.query(AssignmentDailyRollup).delete(synchronize_session=False)
+
+    db.execute(insert(LeadDailyRollup.__table__).from_select(
+        LEAD_KEYS + ["lead_count"],
+        _lead_rows().group_by(func.date(Lead.created_at), Lead.source, func.coalesce(Lead.platform_name, ""))
+    ))
+    db.execute(insert(AssignmentDailyRollup.__table__).from_select(
+        ASSIGNMENT_KEYS + ["assignment_count"],
+        _assignment_rows().group_by(
+            func.date(Lead.created_at), func.coalesce(Employee.team_id, 0), LeadAssignment.status, Lead.source
+        )
+    ))
+    db.commit()
+
+    lead_days = db.query(func.count(func.distinct(LeadDailyRollup.day))).scalar()
+    print(f"✅ Rebuilt analytics rollups ({lead_days} days)")
+
+
+def backfill_rollups_if_empty(db: Session):
+    """Build the rollups on first start against a database that already has leads"""
+    if db.query(LeadDailyRollup.day).first() or not db.query(Lead.lead_id).first():
+        return False
+    print("🔧 Backfilling analytics rollups...")
+    rebuild_rollups(db)
+    return True
+
+
+if __name__ == "__main__":
+    # python -m src.crm.rollups rebuild
+    from src.shared.database import get_sessionmaker
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m src.crm.rollups rebuild")
+        sys.exit(1)
+
+    db = get_sessionmaker("crm")()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
@@ -4,10 +4,17 @@ from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse,
 from sqlalchemy.orm import Session
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import Response
-from src.shared.crm_models import CRMBase, User, Team, Employee, LeadAssignment, Billing, Commission, LeadComment, Lead, LeadActivity, Disbursement, CloseLead
+from starlette.concurrency import run_in_threadpool
+from src.shared.crm_models import CRMBase, User, Team, Employee, LeadAssignment, Billing, Commission, LeadComment, Lead, LeadActivity, Disbursement, CloseLead, Job
 from src.crm.lead_service import LeadService
-from sqlalchemy import create_engine, func, or_
-from sqlalchemy.orm import sessionmaker
+from src.crm.dashboard import get_dashboard_stats
+from src.crm.analytics import get_analytics_data, empty_analytics_data
+from src.crm.rollups import record_leads, record_assignments, record_status_change, record_employee_assignments
+from src.crm.billing import billing_exists
+from src.crm.jobs import enqueue_job, job_to_dict, save_upload
+from src.shared.database import get_database_url, get_engine, get_sessionmaker, get_crm_db
+from src.main_app.static_assets import asset_url
+from sqlalchemy import func, or_
 import bcrypt
 from fastapi.templating import Jinja2Templates
 from typing import Optional
@@ -19,22 +26,13 @@ from datetime import datetime, timedelta
 router = APIRouter()
 
 templates = Jinja2Templates(directory="src/crm/templates")
+templates.env.globals["asset_url"] = asset_url
 
-DATABASE_URL = os.getenv("CRM_DATABASE_URL", "sqlite:///./crm.db")
-
-# Handle PostgreSQL URL conversion
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Shared per-worker CRM engine (see src/shared/database.py)
+DATABASE_URL = get_database_url("crm")
+engine = get_engine("crm")
+SessionLocal = get_sessionmaker("crm")
+get_db = get_crm_db
 
 # Enhanced Role-Based Access Control
 def require_admin(request: Request, db: Session = Depends(get_db)):
@@ -220,6 +218,8 @@ def add_website_lead_post(
         db.add(lead)
         db.flush()  # Get the lead_id
         
+        record_leads(db, [lead.lead_id])
+        
         # Assign to employee if specified
         if assigned_employee_id:
             assignment = LeadAssignment(
@@ -228,6 +228,8 @@ def add_website_lead_post(
                 status="assigned"
             )
             db.add(assignment)
+            db.flush()
+            record_assignments(db, [assignment.assignment_id])
         
         db.commit()
         return RedirectResponse("/crm/unified-leads", status_code=status.HTTP_302_FOUND)
@@ -304,6 +306,8 @@ def add_social_lead_post(
         db.add(lead)
         db.flush()  # Get the lead_id
         
+        record_leads(db, [lead.lead_id])
+        
         # Assign to employee if specified
         if assigned_employee_id:
             assignment = LeadAssignment(
@@ -312,6 +316,8 @@ def add_social_lead_post(
                 status="assigned"
             )
             db.add(assignment)
+            db.flush()
+            record_assignments(db, [assignment.assignment_id])
         
         db.commit()
         return RedirectResponse("/crm/unified-leads", status_code=status.HTTP_302_FOUND)
@@ -337,188 +343,13 @@ def dashboard(request: Request, db: Session = Depends(get_db)):
     
     # Get current employee details
     current_employee = None
-    if employee_id:
+    if user_role == "manager":
+        current_employee = db.query(Employee).filter(Employee.user_id == request.session.get("user_id")).first()
+    elif employee_id:
         current_employee = db.query(Employee).filter(Employee.employee_id == employee_id).first()
     
-    if user_role == "admin":
-        # Admin sees all data and has full access
-        website_leads_count = db.query(Lead).filter(Lead.source == "website").count()
-        social_leads_count = db.query(Lead).filter(Lead.source == "social").count()
-        total_leads = db.query(Lead).count()
-        users_count = db.query(User).count()
-        employees_count = db.query(Employee).count()
-        teams_count = db.query(Team).count()
-        
-        # Get recent leads (unified)
-        recent_leads = db.query(Lead).order_by(Lead.created_at.desc()).limit(5).all()
-        
-        # Get unassigned leads count (unified)
-        assigned_leads = db.query(LeadAssignment).count()
-        unassigned_leads = total_leads - assigned_leads
-        
-        # Get team performance
-        teams = db.query(Team).all()
-        team_performance = []
-        for team in teams:
-            team_members = db.query(Employee).filter(Employee.team_id == team.team_id).all()
-            team_lead_count = 0
-            for member in team_members:
-                member_leads = db.query(LeadAssignment).filter(LeadAssignment.employee_id == member.employee_id).count()
-                team_lead_count += member_leads
-            team_performance.append({
-                "team": team,
-                "member_count": len(team_members),
-                "lead_count": team_lead_count
-            })
-        
-        # Get status summary for all leads
-        status_summary = {}
-        for assignment in db.query(LeadAssignment).all():
-            status = assignment.status
-            status_summary[status] = status_summary.get(status, 0) + 1
-        
-        dashboard_data = {
-            "persona": "admin",
-            "total_leads": total_leads,
-            "website_leads_count": website_leads_count,
-            "social_leads_count": social_leads_count,
-            "unassigned_leads": unassigned_leads,
-            "users_count": users_count,
-            "employees_count": employees_count,
-            "teams_count": teams_count,
-            "recent_leads": recent_leads,
-            "team_performance": team_performance,
-            "status_summary": status_summary
-        }
-        
-    elif user_role == "manager":
-        # Manager sees team data and manages their team
-        current_employee = db.query(Employee).filter(Employee.user_id == request.session.get("user_id")).first()
-        
-        if current_employee and current_employee.team_id:
-            # Get team members
-            team_members = db.query(Employee).filter(Employee.team_id == current_employee.team_id).all()
-            team_member_ids = [member.employee_id for member in team_members]
-            
-            # Get team's assigned leads
-            team_assignments = db.query(LeadAssignment).filter(
-                LeadAssignment.employee_id.in_(team_member_ids)
-            ).all()
-            
-            # Get unified leads for team
-            team_lead_ids = [assignment.lead_id for assignment in team_assignments]
-            team_leads = db.query(Lead).filter(Lead.lead_id.in_(team_lead_ids)).all()
-            
-            website_leads_count = sum(1 for lead in team_leads if lead.source == "website")
-            social_leads_count = sum(1 for lead in team_leads if lead.source == "social")
-            total_leads = len(team_leads)
-            
-            # Get team's recent leads (unified)
-            recent_leads = db.query(Lead).filter(
-                Lead.lead_id.in_(team_lead_ids)
-            ).order_by(Lead.created_at.desc()).limit(5).all()
-            
-            # Get team member performance
-            member_performance = []
-            for member in team_members:
-                member_leads = db.query(LeadAssignment).filter(LeadAssignment.employee_id == member.employee_id).count()
-                member_performance.append({
-                    "employee": member,
-                    "lead_count": member_leads,
-                    "user": db.query(User).filter(User.user_id == member.user_id).first()
-                })
-            
-            # Get status summary for team leads
-            status_summary = {}
-            for assignment in team_assignments:
-                status = assignment.status
-                status_summary[status] = status_summary.get(status, 0) + 1
-            
-            dashboard_data = {
-                "persona": "manager",
-                "total_leads": total_leads,
-                "website_leads_count": website_leads_count,
-                "social_leads_count": social_leads_count,
-                "team_members": team_members,
-                "member_performance": member_performance,
-                "recent_leads": recent_leads,
-                "team": db.query(Team).filter(Team.team_id == current_employee.team_id).first(),
-                "status_summary": status_summary
-            }
-        else:
-            # Manager without team
-            dashboard_data = {
-                "persona": "manager",
-                "total_leads": 0,
-                "website_leads_count": 0,
-                "social_leads_count": 0,
-                "team_members": [],
-                "member_performance": [],
-                "recent_leads": [],
-                "team": None,
-                "status_summary": {}
-            }
-            
-    else:
-        # Employee sees only their data
-        if employee_id:
-            # Get assigned leads count (unified)
-            employee_assignments = db.query(LeadAssignment).filter(
-                LeadAssignment.employee_id == employee_id
-            ).all()
-            
-            employee_lead_ids = [assignment.lead_id for assignment in employee_assignments]
-            employee_leads = db.query(Lead).filter(Lead.lead_id.in_(employee_lead_ids)).all()
-            
-            website_leads_count = sum(1 for lead in employee_leads if lead.source == "website")
-            social_leads_count = sum(1 for lead in employee_leads if lead.source == "social")
-            total_leads = len(employee_leads)
-            
-            # Get employee's recent assigned leads (unified)
-            recent_leads = db.query(Lead).filter(
-                Lead.lead_id.in_(employee_lead_ids)
-            ).order_by(Lead.created_at.desc()).limit(5).all()
-            
-            # Calculate assigned and pending leads count
-            assigned_leads_count = len(employee_assignments)
-            pending_leads_count = len([a for a in employee_assignments if a.status in ['assigned', 'pd', 'login', 'login_query']])
-                
-            # Get employee's team info
-            team_info = None
-            if current_employee and current_employee.team_id:
-                team_info = db.query(Team).filter(Team.team_id == current_employee.team_id).first()
-            
-            # Get status summary for employee's leads
-            status_summary = {}
-            for assignment in employee_assignments:
-                status = assignment.status
-                status_summary[status] = status_summary.get(status, 0) + 1
-            
-            dashboard_data = {
-                "persona": "employee",
-                "total_leads": total_leads,
-                "website_leads_count": website_leads_count,
-                "social_leads_count": social_leads_count,
-                "assigned_leads_count": assigned_leads_count,
-                "pending_leads_count": pending_leads_count,
-                "recent_leads": recent_leads,
-                "team_info": team_info,
-                "employee": current_employee,
-                "status_summary": status_summary
-            }
-        else:
-            dashboard_data = {
-                "persona": "employee",
-                "total_leads": 0,
-                "website_leads_count": 0,
-                "social_leads_count": 0,
-                "assigned_leads_count": 0,
-                "pending_leads_count": 0,
-                "recent_leads": [],
-                "team_info": None,
-                "employee": None,
-                "status_summary": {}
-            }
+    # Counters are aggregated set-wise in src/crm/dashboard.py
+    dashboard_data = get_dashboard_stats(db, user_role, employee_id, current_employee).to_context()
     
     # Add common data
     dashboard_data.update({
@@ -888,316 +719,9 @@ def analytics_dashboard(request: Request, db: Session = Depends(get_db)):
         # Return empty analytics data as fallback
         return templates.TemplateResponse("analytics.html", {
             "request": request,
-            "website_leads_count": 0,
-            "social_leads_count": 0,
-            "total_leads": 0,
-            "active_leads_count": 0,
-            "converted_leads_count": 0,
-            "lost_leads_count": 0,
-            "pending_leads_count": 0,
-            "conversion_rate": 0,
-            "website_converted_count": 0,
-            "social_converted_count": 0,
-            "platform_labels": [],
-            "platform_data": [],
-            "monthly_labels": [],
-            "website_monthly_data": [],
-            "social_monthly_data": [],
-            "team_labels": [],
-            "team_data": [],
-            "recent_activities": []
+            **empty_analytics_data()
         })
 
-def get_analytics_data(db: Session, time_filter: str = "all"):
-    """Get comprehensive analytics data with optional time filtering using unified Lead model"""
-    try:
-        print("DEBUG: Starting analytics data collection")
-        
-        # Simple lead counts
-        website_leads_count = db.query(Lead).filter(Lead.source == "website").count()
-        social_leads_count = db.query(Lead).filter(Lead.source == "social").count()
-        total_leads = db.query(Lead).count()
-        
-        print(f"DEBUG: Lead counts - Website: {website_leads_count}, Social: {social_leads_count}, Total: {total_leads}")
-        
-        # Simple assignment counts
-        active_leads_count = db.query(LeadAssignment).filter(LeadAssignment.status.in_(["assigned", "pd", "login", "login_query", "underwriter"])).count()
-        converted_leads_count = db.query(LeadAssignment).filter(LeadAssignment.status.in_(["approved", "disbursed"])).count()
-        lost_leads_count = db.query(LeadAssignment).filter(LeadAssignment.status.in_(["rejected", "closed"])).count()
-        pending_leads_count = db.query(LeadAssignment).filter(LeadAssignment.status == "assigned").count()
-        
-        print(f"DEBUG: Assignment counts - Active: {active_leads_count}, Converted: {converted_leads_count}, Lost: {lost_leads_count}, Pending: {pending_leads_count}")
-        
-        # Calculate conversion rate
-        total_assigned = active_leads_count + converted_leads_count + lost_leads_count
-        conversion_rate = (converted_leads_count / total_assigned * 100) if total_assigned > 0 else 0
-        
-        # Simple platform data
-        platform_counts = db.query(
-            Lead.platform_name,
-            func.count(Lead.lead_id)
-        ).filter(
-            Lead.source == "social",
-            Lead.platform_name.isnot(None)
-        ).group_by(Lead.platform_name).all()
-        
-        platform_labels = [platform for platform, _ in platform_counts]
-        platform_data = [count for _, count in platform_counts]
-        
-        print(f"DEBUG: Platform data - Labels: {platform_labels}, Data: {platform_data}")
-        
-        # Simple monthly data (last 6 months)
-        monthly_labels = []
-        website_monthly_data = []
-        social_monthly_data = []
-        
-        for i in range(6):
-            month_start = datetime.now() - timedelta(days=30 * (i + 1))
-            month_end = datetime.now() - timedelta(days=30 * i)
-            
-            month_label = month_start.strftime("%b %Y")
-            monthly_labels.insert(0, month_label)
-            
-            website_count = db.query(Lead).filter(
-                Lead.source == "website",
-                Lead.created_at >= month_start,
-                Lead.created_at <= month_end
-            ).count()
-            website_monthly_data.insert(0, website_count)
-            
-            social_count = db.query(Lead).filter(
-                Lead.source == "social",
-                Lead.created_at >= month_start,
-                Lead.created_at <= month_end
-            ).count()
-            social_monthly_data.insert(0, social_count)
-        
-        print(f"DEBUG: Monthly data collected")
-        
-        # Simple team data
-        teams = db.query(Team).all()
-        team_labels = [team.name for team in teams]
-        team_data = []
-        
-        for team in teams:
-            team_lead_count = db.query(LeadAssignment).join(
-                Employee, LeadAssignment.employee_id == Employee.employee_id
-            ).filter(Employee.team_id == team.team_id).count()
-            team_data.append(team_lead_count)
-        
-        print(f"DEBUG: Team data collected")
-        
-        # Simple conversion counts
-        website_converted_count = db.query(LeadAssignment).join(
-            Lead, LeadAssignment.lead_id == Lead.lead_id
-        ).filter(
-            Lead.source == "website",
-            LeadAssignment.status.in_(["approved", "disbursed"])
-        ).count()
-        
-        social_converted_count = db.query(LeadAssignment).join(
-            Lead, LeadAssignment.lead_id == Lead.lead_id
-        ).filter(
-            Lead.source == "social",
-            LeadAssignment.status.in_(["approved", "disbursed"])
-        ).count()
-        
-        print(f"DEBUG: Conversion counts - Website: {website_converted_count}, Social: {social_converted_count}")
-        
-        # Simple recent activities
-        recent_activities = []
-        
-        # Recent leads
-        recent_leads = db.query(Lead).order_by(Lead.created_at.desc()).limit(5).all()
-        for lead in recent_leads:
-            recent_activities.append({
-                "type": lead.source,
-                "title": f"New {lead.source.title()} Lead: {lead.name}",
-                "description": f"Contact: {lead.contact}",
-                "time": lead.created_at.strftime("%d %b %Y %H:%M")
-            })
-        
-        print(f"DEBUG: Recent activities collected")
-        
-        return {
-            "website_leads_count": website_leads_count,
-            "social_leads_count": social_leads_count,
-            "total_leads": total_leads,
-            "active_leads_count": active_leads_count,
-            "converted_leads_count": converted_leads_count,
-            "lost_leads_count": lost_leads_count,
-            "pending_leads_count": pending_leads_count,
-            "conversion_rate": round(conversion_rate, 1),
-            "website_converted_count": website_converted_count,
-            "social_converted_count": social_converted_count,
-            "platform_labels": platform_labels,
-            "platform_data": platform_data,
-            "monthly_labels": monthly_labels,
-            "website_monthly_data": website_monthly_data,
-            "social_monthly_data": social_monthly_data,
-            "team_labels": team_labels,
-            "team_data": team_data,
-            "recent_activities": recent_activities
-        }
-    except Exception as e:
-        print(f"Analytics error: {e}")
-        import traceback
-        traceback.print_exc()
-        # Return empty data as fallback
-        return {
-            "website_leads_count": 0,
-            "social_leads_count": 0,
-            "total_leads": 0,
-            "active_leads_count": 0,
-            "converted_leads_count": 0,
-            "lost_leads_count": 0,
-            "pending_leads_count": 0,
-            "conversion_rate": 0,
-            "website_converted_count": 0,
-            "social_converted_count": 0,
-            "platform_labels": [],
-            "platform_data": [],
-            "monthly_labels": [],
-            "website_monthly_data": [],
-            "social_monthly_data": [],
-            "team_labels": [],
-            "team_data": [],
-            "recent_activities": []
-        }
-
-def get_start_date_for_filter(time_filter: str):
-    """Get start date based on time filter"""
-    now = datetime.now()
-    
-    if time_filter == "this_month":
-        return datetime(now.year, now.month, 1)
-    elif time_filter == "last_month":
-        last_month = now.replace(day=1) - timedelta(days=1)
-        return datetime(last_month.year, last_month.month, 1)
-    elif time_filter == "last_3_months":
-        return now - timedelta(days=90)
-    elif time_filter == "last_6_months":
-        return now - timedelta(days=180)
-    elif time_filter == "this_year":
-        return datetime(now.year, 1, 1)
-    elif time_filter == "last_year":
-        return datetime(now.year - 1, 1, 1)
-    else:  # all
-        return None
-
-def get_monthly_trends(db: Session, start_date=None):
-    """Get monthly lead trends for the last 12 months"""
-    now = datetime.now()
-    labels = []
-    website_data = []
-    social_data = []
-    
-    for i in range(11, -1, -1):
-        month_start = datetime(now.year, now.month, 1) - timedelta(days=30*i)
-        month_end = (month_start.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        labels.append(month_start.strftime("%b %Y"))
-        
-        # Website leads for this month
-        website_count = db.query(Lead).filter(
-            Lead.source == "website",
-            Lead.created_at >= month_start,
-            Lead.created_at <= month_end
-        ).count()
-        website_data.append(website_count)
-        
-        # Social leads for this month
-        social_count = db.query(Lead).filter(
-            Lead.source == "social",
-            Lead.created_at >= month_start,
-            Lead.created_at <= month_end
-        ).count()
-        social_data.append(social_count)
-    
-    return {
-        "labels": labels,
-        "website": website_data,
-        "social": social_data
-    }
-
-def get_team_performance(db: Session, start_date=None):
-    """Get team performance data"""
-    teams = db.query(Team).all()
-    labels = []
-    data = []
-    
-    for team in teams:
-        # Count leads assigned to team members
-        team_leads = db.query(LeadAssignment).join(
-            Employee, LeadAssignment.employee_id == Employee.employee_id
-        ).filter(
-            Employee.team_id == team.team_id
-        )
-        
-        if start_date:
-            team_leads = team_leads.filter(LeadAssignment.assigned_at >= start_date)
-        
-        lead_count = team_leads.count()
-        
-        labels.append(team.name)
-        data.append(lead_count)
-    
-    return {
-        "labels": labels,
-        "data": data
-    }
-
-def get_recent_activities(db: Session, limit: int = 10):
-    """Get recent activities for timeline using unified Lead model"""
-    activities = []
-    
-    # Recent website leads
-    recent_website = db.query(Lead).filter(Lead.source == "website").order_by(Lead.created_at.desc()).limit(5).all()
-    for lead in recent_website:
-        activities.append({
-            "type": "website",
-            "title": f"New Website Lead: {lead.name}",
-            "description": f"Contact: {lead.contact}",
-            "time": lead.created_at.strftime("%d %b %Y %H:%M")
-        })
-    
-    # Recent social leads
-    recent_social = db.query(Lead).filter(Lead.source == "social").order_by(Lead.created_at.desc()).limit(5).all()
-    for lead in recent_social:
-        activities.append({
-            "type": "social",
-            "title": f"New Social Lead: {lead.name}",
-            "description": f"Platform: {lead.platform_name or 'Unknown'}",
-            "time": lead.created_at.strftime("%d %b %Y %H:%M")
-        })
-    
-    # Recent conversions
-    recent_conversions = db.query(LeadAssignment).join(Lead).filter(
-        LeadAssignment.status.in_(["approved", "disbursed"])
-    ).order_by(LeadAssignment.last_updated.desc()).limit(5).all()
-    
-    for conversion in recent_conversions:
-        try:
-            lead_source = conversion.lead.source if conversion.lead else "Unknown"
-            activities.append({
-                "type": "conversion",
-                "title": f"Lead Converted",
-                "description": f"Lead ID: {conversion.lead_id} ({lead_source})",
-                "time": conversion.last_updated.strftime("%d %b %Y %H:%M") if conversion.last_updated else "N/A"
-            })
-        except Exception as e:
-            print(f"Error processing conversion: {e}")
-            activities.append({
-                "type": "conversion",
-                "title": f"Lead Converted",
-                "description": f"Lead ID: {conversion.lead_id} (Unknown)",
-                "time": "N/A"
-            })
-    
-    # Sort by time and return top activities
-    activities.sort(key=lambda x: x["time"], reverse=True)
-    return activities[:limit]
-
 @router.get("/analytics/data", response_class=JSONResponse)
 def analytics_data_api(request: Request, filter: str = "all", db: Session = Depends(get_db)):
     """API endpoint for filtered analytics data"""
@@ -1397,7 +921,13 @@ def employee_edit_post(request: Request, employee_id: int, designation: str = Fo
     
     employee.designation = designation
     employee.department = department
-    employee.team_id = int(team_id) if team_id and team_id.strip() else None
+    new_team_id = int(team_id) if team_id and team_id.strip() else None
+    if new_team_id != employee.team_id:
+        # Move the employee's assignments to the new team's rollup buckets
+        record_employee_assignments(db, [employee_id], -1)
+        employee.team_id = new_team_id
+        db.flush()
+        record_employee_assignments(db, [employee_id])
     employee.salary = salary
     employee.commission_rate = commission_rate
     
@@ -1616,8 +1146,11 @@ def force_delete_team(request: Request, team_id: int, db: Session = Depends(get_
         raise HTTPException(status_code=404, detail="Team not found")
     
     try:
-        # Remove team assignments from all employees
+        # Remove team assignments from all employees, moving their assignments out of the team's rollup buckets
+        member_ids = [row.employee_id for row in db.query(Employee.employee_id).filter(Employee.team_id == team_id)]
+        record_employee_assignments(db, member_ids, -1)
         db.query(Employee).filter(Employee.team_id == team_id).update({"team_id": None})
+        record_employee_assignments(db, member_ids)
         
         # Delete the team
         db.delete(team)
@@ -1682,7 +1215,7 @@ def mark_billing_paid(request: Request, billing_id: int, db: Session = Depends(g
     return RedirectResponse("/crm/billing", status_code=status.HTTP_302_FOUND)
 
 @router.get("/billing/generate", response_class=HTMLResponse)
-def generate_billing_get(request: Request, db: Session = Depends(get_db)):
+def generate_billing_get(request: Request, job_id: Optional[int] = None, db: Session = Depends(get_db)):
     # Manual authentication check
     user_id = request.session.get("user_id")
     if not user_id:
@@ -1698,10 +1231,14 @@ def generate_billing_get(request: Request, db: Session = Depends(get_db)):
     from datetime import datetime
     current_year = datetime.now().year
     
+    # A generation job started by the POST below, shown with live progress
+    job = db.query(Job).filter(Job.job_id == job_id, Job.job_type == "generate_billing").first() if job_id else None
+    
     return templates.TemplateResponse("generate_billing.html", {
         "request": request,
         "employees": employees,
-        "current_year": current_year
+        "current_year": current_year,
+        "job": job
     })
 
 @router.post("/billing/generate", response_class=HTMLResponse)
@@ -1719,60 +1256,18 @@ def generate_billing_post(request: Request, month: int = Form(...), year: int =
     employees = db.query(Employee).filter(Employee.is_active == True).all()
     
     # Check if billing already exists for this month/year
-    existing_billing = db.query(Billing).filter(
-        Billing.month == month,
-        Billing.year == year
-    ).first()
-    
-    if existing_billing:
+    if billing_exists(db, month, year):
         return templates.TemplateResponse("generate_billing.html", {
             "request": request,
             "employees": employees,
             "error": f"Billing for {month}/{year} already exists"
         })
     
-    # Generate billing for each employee
-    total_basic_salary = 0
-    total_commission = 0
-    total_net_salary = 0
-    
-    for employee in employees:
-        # Calculate commission based on lead assignments
-        commission_earned = 0.0
-        lead_assignments = db.query(LeadAssignment).filter(
-            LeadAssignment.employee_id == employee.employee_id,
-            LeadAssignment.status == "converted"
-        ).all()
-        
-        for assignment in lead_assignments:
-            commission_earned += (employee.commission_rate / 100) * 10000  # Assuming 10k per conversion
-        
-        # Calculate net salary
-        net_salary = employee.salary + commission_earned
-        
-        # Create billing record
-        billing = Billing(
-            employee_id=employee.employee_id,
-            month=month,
-            year=year,
-            basic_salary=employee.salary,
-            commission_earned=commission_earned,
-            deductions=0.0,  # No deductions for now
-            net_salary=net_salary,
-            payment_status="pending"
-        )
-        
-        db.add(billing)
-        
-        # Add to totals
-        total_basic_salary += employee.salary
-        total_commission += commission_earned
-        total_net_salary += net_salary
-    
-    db.commit()
-    
-    # Redirect to invoice view
-    return RedirectResponse(f"/crm/billing/invoice/{month}/{year}", status_code=status.HTTP_302_FOUND)
+    # Generate in the background; the form page polls the job and opens the invoice when done
+    # One billing job per month: a second submit while it runs lands on the same job
+    job = enqueue_job(db, "generate_billing", params={"month": month, "year": year}, created_by=user_id,
+                      lock_key=f"{year}-{month:02d}")
+    return RedirectResponse(f"/crm/billing/generate?job_id={job.job_id}", status_code=status.HTTP_302_FOUND)
 
 @router.get("/billing/invoice/{month}/{year}", response_class=HTMLResponse)
 def billing_invoice(request: Request, month: int, year: int, db: Session = Depends(get_db)):
@@ -1932,6 +1427,7 @@ def update_lead_status(
     
     try:
         # Update status
+        record_status_change(db, assignment_id, assignment.status, new_status)
         assignment.status = new_status
         assignment.last_updated = datetime.now()
         
@@ -2040,6 +1536,7 @@ def toggle_doable_flag(
         
         # If marked as not doable, automatically set status to closed
         if not assignment.is_doable:
+            record_status_change(db, assignment.assignment_id, assignment.status, "closed")
             assignment.status = "closed"
         
         # Add a comment about the change
@@ -2140,16 +1637,16 @@ def assign_lead(
 # UNIFIED LEAD MANAGEMENT ROUTES
 # ============================================================================
 
-@router.get("/unified-leads", response_class=HTMLResponse)
-def unified_leads_list(request: Request, db: Session = Depends(get_db)):
-    """Display all unified leads with filtering options"""
-    if not request.session.get("user_id"):
-        return RedirectResponse("/crm/login", status_code=status.HTTP_302_FOUND)
-    
-    user_role = request.session.get("user_role")
-    current_employee = get_current_employee(request, db)
-    
-    # Get filter parameters
+# Keyset page size for the unified leads list (override per request with ?limit=)
+UNIFIED_LEADS_PAGE_SIZE = int(os.getenv("UNIFIED_LEADS_PAGE_SIZE", "50"))
+UNIFIED_LEADS_MAX_PAGE_SIZE = 200
+
+# Activities rendered with the lead detail page; older ones load from the timeline endpoint
+LEAD_TIMELINE_PAGE_SIZE = int(os.getenv("LEAD_TIMELINE_PAGE_SIZE", "100"))
+LEAD_TIMELINE_MAX_PAGE_SIZE = 500
+
+def get_unified_leads_page(request: Request, db: Session, user_role: str, current_employee: Optional[Employee]):
+    """Resolve list filters from the query string and load one keyset page of leads"""
     status_filter = request.query_params.get("status", "")
     source_filter = request.query_params.get("source", "")
     employee_filter = request.query_params.get("employee", "")
@@ -2165,24 +1662,35 @@ def unified_leads_list(request: Request, db: Session = Depends(get_db)):
     elif user_role == "employee" and current_employee:
         filters['employee_id'] = current_employee.employee_id
     
-    # Get leads with assignment information
-    leads = LeadService.get_all_leads(db, filters)
-    
-    # Get assignment information for each lead
-    for lead in leads:
-        assignment = db.query(LeadAssignment).filter(LeadAssignment.lead_id == lead.lead_id).first()
-        if assignment:
-            lead.assignment = assignment
-            # Get employee name for assignment
-            employee = db.query(Employee).filter(Employee.employee_id == assignment.employee_id).first()
-            if employee:
-                user = db.query(User).filter(User.user_id == employee.user_id).first()
-                lead.assignee_name = user.name if user else "Unknown"
-            else:
-                lead.assignee_name = "Unknown"
-        else:
-            lead.assignment = None
-            lead.assignee_name = None
+    try:
+        limit = int(request.query_params.get("limit", UNIFIED_LEADS_PAGE_SIZE))
+    except ValueError:
+        limit = UNIFIED_LEADS_PAGE_SIZE
+    limit = max(1, min(limit, UNIFIED_LEADS_MAX_PAGE_SIZE))
+    
+    try:
+        page = LeadService.get_leads_page(db, filters, limit=limit, cursor=request.query_params.get("cursor"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    page["current_filters"] = {
+        "status": status_filter,
+        "source": source_filter,
+        "employee": employee_filter
+    }
+    return page
+
+@router.get("/unified-leads", response_class=HTMLResponse)
+def unified_leads_list(request: Request, db: Session = Depends(get_db)):
+    """Display the first page of unified leads with filtering options"""
+    if not request.session.get("user_id"):
+        return RedirectResponse("/crm/login", status_code=status.HTTP_302_FOUND)
+    
+    user_role = request.session.get("user_role")
+    current_employee = get_current_employee(request, db)
+    
+    # Get leads with assignment information (one joined query per page)
+    page = get_unified_leads_page(request, db, user_role, current_employee)
     
     # Get employees for filter dropdown (admin/manager only)
     employees = []
@@ -2191,14 +1699,40 @@ def unified_leads_list(request: Request, db: Session = Depends(get_db)):
     
     return templates.TemplateResponse("unified_leads.html", {
         "request": request,
-        "leads": leads,
+        "leads": page["leads"],
+        "next_cursor": page["next_cursor"],
         "employees": employees,
         "statuses": LeadService.LEAD_STATUSES,
-        "current_filters": {
-            "status": status_filter,
-            "source": source_filter,
-            "employee": employee_filter
-        }
+        "current_filters": page["current_filters"]
+    })
+
+@router.get("/unified-leads/data", response_class=JSONResponse)
+def unified_leads_data(request: Request, db: Session = Depends(get_db)):
+    """JSON keyset page of unified leads for infinite scroll"""
+    if not request.session.get("user_id"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    user_role = request.session.get("user_role")
+    current_employee = get_current_employee(request, db)
+    page = get_unified_leads_page(request, db, user_role, current_employee)
+    
+    return JSONResponse({
+        "leads": [
+            {
+                "lead_id": lead.lead_id,
+                "name": lead.name,
+                "contact": lead.contact,
+                "email": lead.email,
+                "source": lead.source,
+                "status": lead.status,
+                "created_at": lead.created_at.isoformat() if lead.created_at else None,
+                "assignment_id": lead.assignment.assignment_id if lead.assignment else None,
+                "assignment_status": lead.assignment.status if lead.assignment else None,
+                "assignee_name": lead.assignee_name
+            }
+            for lead in page["leads"]
+        ],
+        "next_cursor": page["next_cursor"]
     })
 
 @router.get("/unified-leads/{lead_id}", response_class=HTMLResponse)
@@ -2216,8 +1750,9 @@ def unified_lead_detail(request: Request, lead_id: int, db: Session = Depends(ge
     # Get current assignment
     assignment = db.query(LeadAssignment).filter(LeadAssignment.lead_id == lead_id).first()
     
-    # Get timeline
-    timeline = LeadService.get_lead_timeline(db, lead_id)
+    # Get the newest page of the timeline
+    timeline_page = LeadService.get_lead_timeline_page(db, lead_id, limit=LEAD_TIMELINE_PAGE_SIZE)
+    timeline = timeline_page["timeline"]
     
     # Get comments for this lead
     comments = []
@@ -2264,6 +1799,7 @@ def unified_lead_detail(request: Request, lead_id: int, db: Session = Depends(ge
         "lead": lead,
         "assignment": assignment,
         "timeline": timeline,
+        "timeline_next_cursor": timeline_page["next_cursor"],
         "comments": comments,
         "next_statuses": next_statuses,
         "statuses": LeadService.LEAD_STATUSES,
@@ -2332,8 +1868,8 @@ def assign_unified_lead(request: Request, lead_id: int, employee_id: int = Form(
         # Update lead status
         lead.status = 'assigned'
         
-        db.commit()
-        db.refresh(assignment)
+        db.flush()
+        record_assignments(db, [assignment.assignment_id])
         
         # Log activity
         LeadService.log_activity(
@@ -2342,9 +1878,11 @@ def assign_unified_lead(request: Request, lead_id: int, employee_id: int = Form(
             employee_id=current_employee.employee_id,
             activity_type='assigned',
             description=f'Lead assigned to {employee.user.name}',
-            activity_data={'assigned_to': employee_id, 'notes': notes}
+            activity_data={'assigned_to': employee_id, 'notes': notes},
+            commit=False
         )
         
+        db.commit()
         print(f"DEBUG: Final commit successful")
         
         db.refresh(assignment)
@@ -2396,15 +1934,16 @@ def reassign_unified_lead(request: Request, lead_id: int, employee_id: int = For
         old_employee_id = existing_assignment.employee_id
         old_employee = db.query(Employee).filter(Employee.employee_id == old_employee_id).first()
         
-        # Update assignment
+        # Update assignment, moving it to the new employee's team in the rollup
+        record_assignments(db, [existing_assignment.assignment_id], -1)
         existing_assignment.employee_id = employee_id
+        db.flush()
+        record_assignments(db, [existing_assignment.assignment_id])
         existing_assignment.assigned_by = current_employee.employee_id
         existing_assignment.assigned_at = datetime.now()
         if notes:
             existing_assignment.notes = notes
         
-        db.commit()
-        
         # Log activity
         LeadService.log_activity(
             db=db,
@@ -2416,9 +1955,12 @@ def reassign_unified_lead(request: Request, lead_id: int, employee_id: int = For
                 'old_employee_id': old_employee_id,
                 'new_employee_id': employee_id,
                 'notes': notes
-            }
+            },
+            commit=False
         )
         
+        db.commit()
+        
         return JSONResponse({
             "success": True,
             "message": "Lead reassigned successfully"
@@ -2502,22 +2044,33 @@ def add_unified_lead_comment(request: Request, assignment_id: int, comment: str
         raise HTTPException(status_code=500, detail=f"Error adding comment: {str(e)}")
 
 @router.get("/unified-leads/{lead_id}/timeline", response_class=JSONResponse)
-def get_unified_lead_timeline(request: Request, lead_id: int, db: Session = Depends(get_db)):
-    """Get timeline for a unified lead"""
+def get_unified_lead_timeline(request: Request, lead_id: int, limit: Optional[int] = None,
+                              cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    """Get timeline for a unified lead; pass limit/cursor to page through older activity"""
     if not request.session.get("user_id"):
         raise HTTPException(status_code=401, detail="Unauthorized")
     
+    if limit is not None:
+        limit = max(1, min(limit, LEAD_TIMELINE_MAX_PAGE_SIZE))
+    
+    try:
+        page = LeadService.get_lead_timeline_page(db, lead_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        print(f"DEBUG: Getting timeline for lead {lead_id}")
-        timeline = LeadService.get_lead_timeline(db, lead_id)
-        print(f"DEBUG: Timeline data: {timeline}")
+        print(f"DEBUG: Getting timeline for lead {lead_id}: {len(page['timeline'])} activities")
+        timeline = [
+            {**activity, "created_at": activity["created_at"].isoformat() if activity["created_at"] else None}
+            for activity in page["timeline"]
+        ]
         
         # Additional JSON serialization check
         import json
         # Test if the timeline is JSON serializable
         json.dumps({"timeline": timeline})
         
-        return JSONResponse({"timeline": timeline})
+        return JSONResponse({"timeline": timeline, "next_cursor": page["next_cursor"]})
     except TypeError as e:
         # If there are still datetime objects, handle them
         print(f"JSON serialization error in timeline: {e}")
@@ -2584,12 +2137,13 @@ def migrate_existing_leads(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=403, detail="Only admin can migrate leads")
     
     try:
-        migrated_counts = LeadService.migrate_existing_leads(db)
+        job = enqueue_job(db, "migrate_leads", created_by=request.session.get("user_id"), lock_key="all")
         return JSONResponse({
             "success": True,
-            "message": "Migration completed successfully",
-            "migrated": migrated_counts
-        })
+            "message": "Migration started",
+            "job_id": job.job_id,
+            "status_url": f"/crm/jobs/{job.job_id}"
+        }, status_code=202)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -2611,22 +2165,21 @@ async def bulk_upload_unified_leads(request: Request, file: UploadFile = File(..
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
     try:
-        content = await file.read()
-        result = LeadService.bulk_import_leads(
-            db=db,
-            csv_content=content.decode('utf-8'),
-            created_by_employee_id=current_employee.employee_id,
-            skip_duplicates=skip_duplicates
-        )
+        # Park the upload on disk and let a background job import it
+        path, lines = await run_in_threadpool(save_upload, file.file)
+        job = enqueue_job(db, "bulk_import", params={
+            "path": path,
+            "total_rows": max(lines - 1, 0),  # Less the header; only used to show progress
+            "created_by_employee_id": current_employee.employee_id,
+            "skip_duplicates": skip_duplicates
+        }, created_by=request.session.get("user_id"))
         
         return JSONResponse({
             "success": True,
-            "message": "Bulk upload completed",
-            "success_count": result["success_count"],
-            "skipped_count": result["skipped_count"],
-            "error_count": result["error_count"],
-            "errors": result.get("errors", [])
-        })
+            "message": "Bulk upload started",
+            "job_id": job.job_id,
+            "status_url": f"/crm/jobs/{job.job_id}"
+        }, status_code=202)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
@@ -2644,6 +2197,21 @@ def download_unified_leads_template():
         headers={"Content-Disposition": "attachment; filename=unified_leads_template.csv"}
     )
 
+# Background Job Status
+@router.get("/jobs/{job_id}", response_class=JSONResponse)
+def job_status(request: Request, job_id: int, db: Session = Depends(get_db)):
+    """State, progress and result of a background job"""
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    job = db.query(Job).filter(Job.job_id == job_id).first()
+    # Only admins can see other users' jobs
+    if not job or (job.created_by != user_id and request.session.get("user_role") != "admin"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return JSONResponse(job_to_dict(job))
+
 # Loan Amount Tracking Routes
 @router.post("/assignments/{assignment_id}/update-pd-amount", response_class=JSONResponse)
 def update_pd_loan_amount(
@@ -3002,7 +2570,7 @@ def update_lead_details_form(
 
 
         
-        success = LeadService.update_lead_details(db, lead_id, **update_data)
+        success = LeadService.update_lead_details(db, lead_id, commit=False, **update_data)
         
         if success:
             # Log activity
@@ -3012,8 +2580,10 @@ def update_lead_details_form(
                 employee_id=current_employee.employee_id,
                 activity_type='lead_details_updated',
                 description=f'Lead details updated by {current_employee.user.name}',
-                activity_data=update_data
+                activity_data=update_data,
+                commit=False
             )
+            db.commit()
             
             return JSONResponse({
                 "success": True,
@@ -3087,7 +2657,7 @@ def update_lead_details(
         # Remove None values
         update_data = {k: v for k, v in update_data.items() if v is not None}
         
-        success = LeadService.update_lead_details(db, lead_id, **update_data)
+        success = LeadService.update_lead_details(db, lead_id, commit=False, **update_data)
         
         if success:
             # Log activity
@@ -3097,8 +2667,10 @@ def update_lead_details(
                 employee_id=current_employee.employee_id,
                 activity_type='lead_details_updated',
                 description=f'Lead details updated by {current_employee.user.name}',
-                activity_data=update_data
+                activity_data=update_data,
+                commit=False
             )
+            db.commit()
             
             return JSONResponse({
                 "success": True,
@@ -3134,7 +2706,6 @@ def update_other_details(
         # Update other details
         lead.other_details = other_details
         lead.updated_at = datetime.now()
-        db.commit()
         
         # Log activity
         LeadService.log_activity(
@@ -3143,8 +2714,10 @@ def update_other_details(
             employee_id=current_employee.employee_id,
             activity_type='other_details_updated',
             description=f'Other details updated by {current_employee.user.name}',
-            activity_data={'other_details': other_details}
+            activity_data={'other_details': other_details},
+            commit=False
         )
+        db.commit()
         
         return JSONResponse({
             "success": True,
@@ -3214,7 +2787,6 @@ def toggle_priority(request: Request, lead_id: int, db: Session = Depends(get_db
         print(f"DEBUG: Updating priority from {old_priority} to {new_priority}")
         lead.priority = new_priority
         lead.updated_at = datetime.now()
-        db.commit()
         
         # Log activity
         LeadService.log_activity(
@@ -3223,8 +2795,10 @@ def toggle_priority(request: Request, lead_id: int, db: Session = Depends(get_db
             employee_id=current_employee.employee_id,
             activity_type='priority_updated',
             description=f'Priority changed from {old_priority} to {new_priority} by {current_employee.user.name}',
-            activity_data={'old_priority': old_priority, 'new_priority': new_priority}
+            activity_data={'old_priority': old_priority, 'new_priority': new_priority},
+            commit=False
         )
+        db.commit()
         
         return JSONResponse({
             "success": True,
@@ -3272,6 +2846,10 @@ def delete_unified_lead(request: Request, lead_id: int, db: Session = Depends(ge
                 db.query(LeadComment).filter(LeadComment.assignment_id == assignment.assignment_id).delete()
                 db.query(Disbursement).filter(Disbursement.assignment_id == assignment.assignment_id).delete()
         
+        # Take the lead out of the analytics rollups
+        record_assignments(db, [assignment.assignment_id for assignment in lead.assignments], -1)
+        record_leads(db, [lead_id], -1)
+        
         # Delete assignments
         db.query(LeadAssignment).filter(LeadAssignment.lead_id == lead_id).delete()
         
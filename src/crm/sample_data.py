@@ -0,0 +1,80 @@
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from src.shared.crm_models import User, Employee, Team, Lead, LeadAssignment, LeadActivity
+from src.crm.rollups import rebuild_rollups
+
+# Synthetic CRM data for the query checks
+#
+# The index plan check (python -m src.shared.migrations check) and the
+# dashboard query budget check (python -m src.crm.dashboard check) run the real
+# query code against a scratch database filled by seed_sample_crm(). Nothing
+# in the app calls this; never point it at a live database.
+
+SAMPLE_SOURCES = ["website", "social", "manual"]
+SAMPLE_STATUSES = ["assigned", "pd", "login", "underwriter", "approved", "rejected", "disbursed", "closed"]
+
+
+def seed_sample_crm(db: Session, teams: int = 2, members_per_team: int = 3, leads: int = 200,
+                    seed: int = 0) -> Dict[str, Any]:
+    """Teams with a manager and members, leads over 90 days (2 in 3 assigned) and their activities"""
+    rng = random.Random(seed)
+    tag = f"{seed}-{teams}-{members_per_team}-{leads}"
+
+    employees = []
+    team_rows = []
+    for t in range(teams):
+        team = Team(name=f"Sample team {tag}-{t}")
+        db.add(team)
+        db.flush()
+        team_rows.append(team)
+        for m in range(members_per_team):
+            user = User(name=f"Sample {t}-{m}", email=f"sample-{tag}-{t}-{m}@example.com",
+                        phone=f"sample-{tag}-{t}-{m}", password_hash="!",
+                        role="manager" if m == 0 else "employee")
+            db.add(user)
+            db.flush()
+            employee = Employee(user_id=user.user_id, employee_code=f"SAMPLE-{tag}-{t}-{m}", team_id=team.team_id)
+            db.add(employee)
+            db.flush()
+            if m == 0:
+                team.manager_id = employee.employee_id
+            employees.append(employee)
+
+    now = datetime.utcnow()
+    lead_ids = db.execute(insert(Lead).returning(Lead.lead_id, sort_by_parameter_order=True), [
+        {
+            "source": rng.choice(SAMPLE_SOURCES),
+            "name": f"Sample lead {i}",
+            "contact": f"5{seed:02d}{i:07d}",
+            "status": "new",
+            "created_at": now - timedelta(minutes=rng.randrange(90 * 24 * 60))
+        }
+        for i in range(leads)
+    ]).scalars().all()
+
+    assignments = []
+    for i, lead_id in enumerate(lead_ids):
+        if employees and i % 3:
+            assignments.append({
+                "lead_id": lead_id,
+                "employee_id": employees[i % len(employees)].employee_id,
+                "status": rng.choice(SAMPLE_STATUSES)
+            })
+    if assignments:
+        db.execute(insert(LeadAssignment), assignments)
+    db.execute(insert(LeadActivity), [
+        {"lead_id": lead_id, "activity_type": "created", "description": "Sample lead created"}
+        for lead_id in lead_ids
+    ])
+    db.commit()
+    rebuild_rollups(db)
+
+    return {
+        "team_ids": [team.team_id for team in team_rows],
+        "manager": employees[0] if employees else None,
+        "employee": employees[1] if len(employees) > 1 else None,
+        "lead_ids": lead_ids
+    }
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import timezone
+from typing import Any, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from src.main_app.models import BankLoan
+from src.main_app.page_cache import etag_matches
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+# Bank loan payload cache
+#
+# /api/bank-loans is polled by rate widgets, but the table only changes when
+# bank data is refreshed. The serialized payload is built once per worker and
+# reused until the bank_loans fingerprint (row count, max id, max last_updated)
+# changes; the fingerprint is checked at most every BANK_LOANS_CHECK_SECONDS,
+# so between checks a request costs no database work at all. Every payload
+# carries a strong ETag (hash of the body) and a Last-Modified taken from
+# max(last_updated), so pollers revalidate with If-None-Match and get a 304.
+
+BANK_LOANS_CHECK_SECONDS = float(os.getenv("BANK_LOANS_CHECK_SECONDS", "5"))
+
+
+def json_bytes(obj: Any) -> bytes:
+    """Compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def bank_loans_fingerprint(db: Session) -> tuple:
+    """Changes whenever a bank_loans row is added, removed or has last_updated bumped"""
+    count, max_id, max_updated = db.query(
+        func.count(BankLoan.id), func.max(BankLoan.id), func.max(BankLoan.last_updated)
+    ).one()
+    return count, max_id, max_updated
+
+
+@dataclass(frozen=True)
+class BankLoansPayload:
+    body: bytes
+    etag: str
+    last_modified: Optional[str]
+    fingerprint: tuple
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Whether a conditional request can be answered with 304"""
+        if if_none_match:
+            return etag_matches(if_none_match, self.etag)
+        if if_modified_since and self.last_modified:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(self.last_modified)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+def _serialize(loan: BankLoan) -> dict:
+    return {
+        'bank_name': loan.bank_name,
+        'loan_type': loan.loan_type,
+        'interest_rate': loan.interest_rate,
+        'features': json.loads(loan.features) if loan.features else [],
+        'url': loan.url,
+        'last_updated': loan.last_updated.isoformat() if loan.last_updated else None
+    }
+
+
+class BankLoansCache:
+    """Per-worker serialized /api/bank-loans payload"""
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = BANK_LOANS_CHECK_SECONDS if check_interval is None else check_interval
+        self.builds = 0
+        self._payload: Optional[BankLoansPayload] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Recheck the table on the next request"""
+        self._next_check = 0.0
+
+    def get(self, db: Session) -> BankLoansPayload:
+        payload = self._payload
+        if payload is not None and time.monotonic() < self._next_check:
+            return payload
+        with self._lock:
+            if self._payload is not None and time.monotonic() < self._next_check:
+                return self._payload
+            fingerprint = bank_loans_fingerprint(db)
+            if self._payload is None or self._payload.fingerprint != fingerprint:
+                self._payload = self._build(db, fingerprint)
+            self._next_check = time.monotonic() + self.check_interval
+            return self._payload
+
+    def _build(self, db: Session, fingerprint: tuple) -> BankLoansPayload:
+        body = json_bytes([_serialize(loan) for loan in db.query(BankLoan).order_by(BankLoan.id)])
+        max_updated = fingerprint[2]
+        last_modified = None
+        if max_updated is not None:
+            if max_updated.tzinfo is None:
+                max_updated = max_updated.replace(tzinfo=timezone.utc)
+            last_modified = format_datetime(max_updated.astimezone(timezone.utc), usegmt=True)
+        self.builds += 1
+        return BankLoansPayload(
+            body=body,
+            etag='"' + hashlib.sha1(body).hexdigest() + '"',
+            last_modified=last_modified,
+            fingerprint=fingerprint
+        )
+
+
+_cache = BankLoansCache()
+
+
+def get_bank_loans_cache() -> BankLoansCache:
+    return _cache
@@ -0,0 +1,147 @@
+import math
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from src.main_app.emi import MAX_INTEREST_RATE, MAX_TENURE_MONTHS, monthly_emi
+
+# Debt consolidation simulator
+#
+# Compares keeping a set of existing loans (outstanding balance, rate,
+# remaining months) with paying them all off through one new loan at each
+# candidate product's rate. For every candidate it gives the consolidated EMI,
+# the interest saved over the life of both plans (net of any processing fee)
+# and the break-even month: the first month from which the cumulative amount
+# paid under the new loan, fee included, stays at or below what the existing
+# loans would have cost by then. All candidates are evaluated in one pass over
+# a (candidates x months) matrix of cumulative payments, so the simulation is
+# cheap enough to rerun on every slider movement.
+#
+# Benchmark:
+#   python -m src.main_app.consolidation benchmark [candidates] [loans]
+
+MAX_EXISTING_LOANS = 50
+
+
+def remaining_months(balance: float, annual_rate: float, emi: float) -> Optional[int]:
+    """Months left on a loan with this balance and EMI; None if the EMI never pays it off"""
+    r = annual_rate / (12 * 100)
+    if balance <= 0 or emi <= 0:
+        return None
+    if r == 0:
+        months = balance / emi
+    elif emi <= balance * r:
+        return None
+    else:
+        months = -math.log(1 - balance * r / emi) / math.log1p(r)
+    # An EMI computed for exactly n months should give back n, not n + 1 from round-off
+    return math.ceil(months - 1e-9)
+
+
+def parse_loans(loans: List[Dict[str, Any]]):
+    """(balances, rates, months) arrays from API loan objects; raises ValueError naming the bad one"""
+    if not isinstance(loans, list) or not loans:
+        raise ValueError("loans must be a non-empty list")
+    if len(loans) > MAX_EXISTING_LOANS:
+        raise ValueError(f"at most {MAX_EXISTING_LOANS} loans")
+    balances, rates, months = np.empty(len(loans)), np.empty(len(loans)), np.empty(len(loans))
+    for i, loan in enumerate(loans):
+        try:
+            balances[i] = float(loan["balance"])
+            rates[i] = float(loan["interest_rate"])
+            months[i] = int(loan["remaining_months"])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError(f"loan {i} needs numeric balance, interest_rate and remaining_months")
+    bad = np.flatnonzero((balances <= 0) | ~np.isfinite(balances) | (rates < 0) | (rates > MAX_INTEREST_RATE)
+                         | (months < 1) | (months > MAX_TENURE_MONTHS))
+    if bad.size:
+        raise ValueError(f"loan {int(bad[0])} is out of range (balance > 0, 0-{MAX_INTEREST_RATE}% "
+                         f"interest, 1-{MAX_TENURE_MONTHS} months)")
+    return balances, rates, months
+
+
+def simulate_consolidation(balances, rates, months, candidates: List[Dict[str, Any]], tenure_months: int,
+                           processing_fee_percent: float = 0) -> Dict[str, Any]:
+    """Current plan vs one consolidation loan per candidate (dicts with an interest_rate), best first"""
+    balances = np.asarray(balances, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    months = np.asarray(months, dtype=float)
+    principal = float(balances.sum())
+    fee = principal * processing_fee_percent / 100
+
+    # Existing loans: EMIs and cumulative amount paid by the end of each month
+    old_emis = monthly_emi(balances, rates, months)
+    old_interest = float((old_emis * months).sum() - principal)
+    horizon = int(max(tenure_months, months.max()))
+    t = np.arange(1, horizon + 1, dtype=float)
+    old_paid = np.minimum.outer(t, months) @ old_emis
+
+    current = {
+        "total_balance": round(principal, 2),
+        "total_emi": round(float(old_emis.sum()), 2),
+        "total_interest": round(old_interest, 2),
+        "months_left": int(months.max())
+    }
+    candidates = [c for c in candidates if c.get('interest_rate') is not None]
+    if not candidates:
+        return {"current": current, "tenure_months": tenure_months, "options": []}
+
+    # All candidates at once: one row per product
+    new_rates = np.fromiter((c['interest_rate'] for c in candidates), dtype=float, count=len(candidates))
+    new_emis = monthly_emi(principal, new_rates, tenure_months)
+    new_interest = new_emis * tenure_months - principal
+    new_paid = fee + np.outer(new_emis, np.minimum(t, tenure_months))
+    ahead = (old_paid[None, :] - new_paid) >= -1e-6
+
+    # Break-even: first month from which the new plan stays ahead for good
+    stays_ahead = np.flip(np.logical_and.accumulate(np.flip(ahead, axis=1), axis=1), axis=1)
+    break_even = np.where(stays_ahead[:, -1], stays_ahead.argmax(axis=1) + 1, 0)
+
+    total_saved = old_interest - new_interest - fee
+    monthly_savings = old_emis.sum() - new_emis
+    order = np.argsort(-total_saved, kind="stable")
+    options = []
+    for i in order.tolist():
+        candidate = candidates[i]
+        options.append({
+            "partner": candidate.get('partner'),
+            "name": candidate.get('name'),
+            "loan_type": candidate.get('loan_type'),
+            "interest_rate": float(new_rates[i]),
+            "url": candidate.get('url'),
+            "emi": round(float(new_emis[i]), 2),
+            "monthly_savings": round(float(monthly_savings[i]), 2) + 0.0,
+            "total_interest": round(float(new_interest[i]), 2) + 0.0,
+            "processing_fee": round(fee, 2),
+            "interest_saved": round(float(total_saved[i]), 2) + 0.0,
+            "break_even_month": int(break_even[i]) or None
+        })
+    return {"current": current, "tenure_months": tenure_months, "options": options}
+
+
+def benchmark(candidates: int = 500, loans: int = 8):
+    """Time one simulation over many candidate products"""
+    rng = np.random.default_rng(0)
+    balances = rng.uniform(20_000, 500_000, loans)
+    rates = rng.uniform(12, 36, loans)
+    months = rng.integers(6, 120, loans).astype(float)
+    offers = [{"partner": f"Partner {i}", "name": "Personal Loan", "interest_rate": float(rate)}
+              for i, rate in enumerate(rng.uniform(9, 20, candidates))]
+    simulate_consolidation(balances, rates, months, offers, 60, 1.5)
+    runs = 50
+    started = time.perf_counter()
+    for _ in range(runs):
+        result = simulate_consolidation(balances, rates, months, offers, 60, 1.5)
+    elapsed = (time.perf_counter() - started) / runs
+    best = result["options"][0]
+    print(f"{loans} loans x {candidates} candidates x {max(60, int(months.max()))} months: {elapsed * 1000:.2f} ms "
+          f"per simulation (best: {best['interest_rate']:.2f}%, saves {best['interest_saved']:,.0f}, "
+          f"break-even month {best['break_even_month']})")
+
+
+if __name__ == "__main__":
+    # python -m src.main_app.consolidation benchmark [candidates] [loans]
+    if not sys.argv[1:] or sys.argv[1] != "benchmark":
+        print("Usage: python -m src.main_app.consolidation benchmark [candidates] [loans]")
+        sys.exit(1)
+    benchmark(*(int(arg) for arg in sys.argv[2:4]))
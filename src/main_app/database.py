@@ -1,27 +1,17 @@
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
+from src.shared.database import get_database_url, get_engine, get_sessionmaker, get_main_db
 
 # Database configuration
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./site.db")
+DATABASE_URL = get_database_url("main")
 
-# Create engine
-if "sqlite" in DATABASE_URL:
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(DATABASE_URL, pool_size=20, max_overflow=0, pool_pre_ping=True)
+# Shared per-worker engine (see src/shared/database.py)
+engine = get_engine("main")
 
 # Create session maker
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = get_sessionmaker("main")
 
 # Create base class for models
 Base = declarative_base()
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+get_db = get_main_db
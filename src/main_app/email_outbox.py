@@ -0,0 +1,382 @@
+import os
+import smtplib
+import sys
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Any, Dict, List
+from sqlalchemy import func
+from src.main_app.database import SessionLocal
+from src.main_app.models import EmailOutbox
+
+# Email outbox
+#
+# Sending mail inside a request means a fresh SMTP connection, STARTTLS and a
+# login for every message, so form responses waited on the mail provider and a
+# provider hiccup lost the email. Messages are now written to the email_outbox
+# table and delivered by sender threads in every worker. Each sender claims a
+# batch with a lease, takes an authenticated connection from a small pool and
+# sends the whole batch over it; connections stay open between batches and are
+# checked with NOOP before reuse after sitting idle. Failures are retried with
+# exponential backoff until EMAIL_MAX_ATTEMPTS, permanent rejections (5xx) are
+# marked failed straight away, and every message keeps its status, attempt
+# count and last error.
+#
+# For local testing point SMTP_SERVER at a debugging server, which needs no
+# TLS or login and prints every message it receives:
+#   python -m smtpd -n -c DebuggingServer localhost:1025    (Python <= 3.11)
+#   python -m aiosmtpd -n -l localhost:1025
+#   SMTP_SERVER=localhost SMTP_PORT=1025 uvicorn src.main_app.main:app
+
+# Note: For Gmail, you need to use an App Password instead of your regular password
+# Generate an App Password at: https://myaccount.google.com/apppasswords
+EMAIL_CONFIG = {
+    'smtp_server': os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+    'smtp_port': int(os.getenv('SMTP_PORT', '587')),
+    'smtp_username': os.getenv('SMTP_USERNAME', 'support@advancecfa.com'),
+    'smtp_password': os.getenv('SMTP_PASSWORD', 'YOUR_APP_PASSWORD_HERE'),  # Replace with App Password
+    'from_email': os.getenv('FROM_EMAIL', 'support@advancecfa.com'),
+    'to_email': os.getenv('TO_EMAIL', 'support@advancecfa.com'),
+    'use_tls': os.getenv('USE_TLS', 'True').lower() == 'true'
+}
+
+# Sender threads per worker; each holds at most one SMTP connection
+EMAIL_SMTP_CONNECTIONS = int(os.getenv("EMAIL_SMTP_CONNECTIONS", "2"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "2"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+
+# A connection idle longer than this is checked with NOOP before it is reused
+SMTP_IDLE_CHECK_SECONDS = 30
+# Providers throttle long-lived sessions, so reconnect after this many messages
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+
+# A claimed message returns to the queue if its sender has not finished it by then
+LEASE_SECONDS = 120
+RETRY_BASE_SECONDS = 30
+MAX_RETRY_DELAY = 3600
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_senders: List[threading.Thread] = []
+
+
+class PooledSMTPConnection:
+    """An authenticated SMTP session and its usage counters"""
+
+    def __init__(self, config: Dict[str, Any]):
+        server, port = config['smtp_server'], config['smtp_port']
+        local = server in ('localhost', '127.0.0.1')
+        if local or config['use_tls']:
+            self.smtp = smtplib.SMTP(server, port, timeout=30)
+            # Local debugging servers speak plain SMTP and take no login
+            if not local:
+                self.smtp.starttls()
+        else:
+            self.smtp = smtplib.SMTP_SSL(server, port, timeout=30)
+        if config['smtp_username'] and config['smtp_password'] and not local:
+            self.smtp.login(config['smtp_username'], config['smtp_password'])
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    def is_usable(self) -> bool:
+        if self.messages_sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            return False
+        if time.monotonic() - self.last_used < SMTP_IDLE_CHECK_SECONDS:
+            return True
+        try:
+            return self.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, msg: EmailMessage):
+        self.smtp.send_message(msg)
+        self.messages_sent += 1
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+
+
+class SMTPConnectionPool:
+    """Keeps up to `size` authenticated SMTP connections open between batches"""
+
+    def __init__(self, size: int = None, config: Dict[str, Any] = None):
+        self.size = size or EMAIL_SMTP_CONNECTIONS
+        self.config = config or EMAIL_CONFIG
+        self.connections_opened = 0
+        self._idle: List[PooledSMTPConnection] = []
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> PooledSMTPConnection:
+        """An idle connection that still works, or a new one"""
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    break
+                if conn.is_usable():
+                    return conn
+                conn.close()
+            conn = PooledSMTPConnection(self.config)
+            with self._lock:
+                self.connections_opened += 1
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: PooledSMTPConnection, broken: bool = False):
+        if broken:
+            conn.close()
+        else:
+            with self._lock:
+                self._idle.append(conn)
+        self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pool = SMTPConnectionPool()
+
+
+def enqueue_email(subject: str, text_body: str, html_body: str = None, to_email: str = None) -> int:
+    """Add a message to the outbox and return its id; delivery happens in the background"""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        email = EmailOutbox(
+            to_email=to_email or EMAIL_CONFIG['to_email'], subject=subject,
+            text_body=text_body, html_body=html_body, status=PENDING,
+            attempts=0, next_attempt_at=now, created_at=now
+        )
+        db.add(email)
+        db.commit()
+        email_id = email.id
+    finally:
+        db.close()
+    _wakeup.set()
+    return email_id
+
+
+def _claim(db, batch_size: int) -> List[EmailOutbox]:
+    """Lease up to batch_size due messages to this sender"""
+    now = datetime.utcnow()
+    token = str(uuid.uuid4())
+    due = db.query(EmailOutbox.id).filter(
+        EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.id).limit(batch_size).scalar_subquery()
+    # Re-checking the conditions keeps two senders from claiming the same row
+    claimed = db.query(EmailOutbox).filter(
+        EmailOutbox.id.in_(due), EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= now
+    ).update({
+        EmailOutbox.next_attempt_at: now + timedelta(seconds=LEASE_SECONDS),
+        EmailOutbox.claim_token: token
+    }, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        return []
+    return db.query(EmailOutbox).filter(EmailOutbox.claim_token == token).order_by(EmailOutbox.id).all()
+
+
+def _build_message(email: EmailOutbox) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = email.subject
+    msg["From"] = EMAIL_CONFIG['from_email']
+    msg["To"] = email.to_email
+    msg.set_content(email.text_body)
+    if email.html_body:
+        msg.add_alternative(email.html_body, subtype='html')
+    return msg
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx rejections of the message itself will not succeed on retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+
+def _mark_sent(email: EmailOutbox):
+    email.status = SENT
+    email.attempts += 1
+    email.sent_at = datetime.utcnow()
+    email.claim_token = None
+    email.last_error = None
+
+
+def _mark_failed(email: EmailOutbox, error: Exception, permanent: bool = False):
+    email.attempts += 1
+    email.claim_token = None
+    email.last_error = str(error)[:1000]
+    if permanent or email.attempts >= EMAIL_MAX_ATTEMPTS:
+        email.status = FAILED
+        print(f"❌ Email #{email.id} to {email.to_email} failed for good after {email.attempts} attempts: {error}")
+    else:
+        delay = min(RETRY_BASE_SECONDS * 2 ** (email.attempts - 1), MAX_RETRY_DELAY)
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def send_batch(batch_size: int = None) -> int:
+    """Claim and deliver one batch over a pooled connection; returns the number claimed"""
+    db = SessionLocal()
+    try:
+        emails = _claim(db, batch_size or EMAIL_BATCH_SIZE)
+        if not emails:
+            return 0
+
+        try:
+            conn = _pool.acquire()
+        except Exception as e:
+            # Server unreachable or login rejected: the whole batch backs off
+            for email in emails:
+                _mark_failed(email, e)
+            db.commit()
+            print(f"⚠️ SMTP connection failed, {len(emails)} emails retrying with backoff: {e}")
+            return len(emails)
+
+        broken = False
+        sent = 0
+        try:
+            for i, email in enumerate(emails):
+                try:
+                    message = _build_message(email)
+                except Exception as e:
+                    # A malformed message (e.g. a newline in a header) fails the same way on every retry
+                    _mark_failed(email, e, permanent=True)
+                    continue
+                try:
+                    conn.send(message)
+                    _mark_sent(email)
+                    sent += 1
+                    continue
+                except smtplib.SMTPServerDisconnected as e:
+                    error = e
+                except smtplib.SMTPException as e:
+                    # The server rejected this message; reset the session for the next one
+                    _mark_failed(email, e, permanent=_is_permanent(e))
+                    try:
+                        conn.smtp.rset()
+                        continue
+                    except OSError as rset_error:
+                        error, i = rset_error, i + 1
+                except OSError as e:
+                    error = e
+                # The session is gone; the rest of the batch goes back with it
+                broken = True
+                for rest in emails[i:]:
+                    _mark_failed(rest, error)
+                print(f"⚠️ SMTP connection lost, {len(emails) - i} emails retrying with backoff: {error}")
+                break
+        finally:
+            _pool.release(conn, broken=broken)
+            db.commit()
+
+        if sent:
+            print(f"✅ Sent {sent} queued emails")
+        return len(emails)
+    finally:
+        db.close()
+
+
+def _send_forever():
+    while not _stop.is_set():
+        try:
+            claimed = send_batch()
+        except Exception as e:
+            print(f"❌ Email sender error: {e}")
+            traceback.print_exc()
+            claimed = 0
+        if claimed < EMAIL_BATCH_SIZE:
+            _wakeup.wait(EMAIL_POLL_SECONDS)
+            _wakeup.clear()
+
+
+def start_email_sender():
+    """Start this worker's sender threads"""
+    if any(sender.is_alive() for sender in _senders):
+        return
+    _stop.clear()
+    _senders.clear()
+    for n in range(EMAIL_SMTP_CONNECTIONS):
+        sender = threading.Thread(target=_send_forever, name=f"email-sender-{n}", daemon=True)
+        sender.start()
+        _senders.append(sender)
+
+
+def stop_email_sender(timeout: float = 5):
+    """Stop the senders and close pooled connections; unsent mail stays in the outbox"""
+    _stop.set()
+    _wakeup.set()
+    for sender in _senders:
+        sender.join(timeout)
+    _senders.clear()
+    _pool.close()
+
+
+def outbox_stats() -> Dict[str, Any]:
+    """Outbox depth and delivery counts for health checks"""
+    db = SessionLocal()
+    try:
+        counts = dict(db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+        oldest = db.query(func.min(EmailOutbox.created_at)).filter(EmailOutbox.status == PENDING).scalar()
+        retrying = db.query(func.count(EmailOutbox.id)).filter(
+            EmailOutbox.status == PENDING, EmailOutbox.attempts > 0
+        ).scalar()
+    finally:
+        db.close()
+    oldest_age = (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+    return {
+        "pending": counts.get(PENDING, 0),
+        "retrying": retrying,
+        "sent": counts.get(SENT, 0),
+        "failed": counts.get(FAILED, 0),
+        "oldest_pending_age_seconds": round(oldest_age, 1),
+        "smtp_connections_opened": _pool.connections_opened
+    }
+
+
+def retry_failed() -> int:
+    """Give every failed message a fresh set of attempts"""
+    db = SessionLocal()
+    try:
+        count = db.query(EmailOutbox).filter(EmailOutbox.status == FAILED).update({
+            EmailOutbox.status: PENDING,
+            EmailOutbox.attempts: 0,
+            EmailOutbox.next_attempt_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # python -m src.main_app.email_outbox stats|retry-failed
+    command = sys.argv[1] if sys.argv[1:] else None
+    if command == "stats":
+        print(outbox_stats())
+    elif command == "retry-failed":
+        print(f"🔁 Requeued {retry_failed()} failed emails")
+    else:
+        print("Usage: python -m src.main_app.email_outbox stats|retry-failed")
+        sys.exit(1)
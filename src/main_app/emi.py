@@ -0,0 +1,302 @@
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+# EMI engine
+#
+# The EMI formula used by the /emi calculator, vectorized with NumPy so one
+# call evaluates any number of (amount, annual rate, months) scenarios, plus
+# month-by-month amortization schedules built from closed-form balances rather
+# than a Python loop. emi_post() and the /api/emi endpoints all go through
+# here, so every figure the site shows comes from the same formula:
+#
+#   EMI = P * r * (1 + r)^n / ((1 + r)^n - 1),  r = annual rate / 1200
+#   EMI = P / n                                  when the rate is 0
+#
+# Benchmark, and randomized property checks of the engine against the scalar
+# formula and the schedule invariants (exits non-zero on a failure):
+#   python -m src.main_app.emi benchmark [scenarios]
+#   python -m src.main_app.emi check [cases]
+
+# Upper bounds for API input
+MAX_SCENARIOS = 10000
+MAX_TENURE_MONTHS = 600
+MAX_INTEREST_RATE = 100
+
+
+def tenure_in_months(tenure, tenure_unit: str = "years"):
+    """Tenure in months; anything but 'years' is already months"""
+    return tenure * 12 if str(tenure_unit).lower() == "years" else tenure
+
+
+def scalar_emi(principal: float, annual_rate: float, months: float) -> float:
+    """The EMI formula for one loan in plain Python; the reference for benchmark() and check()"""
+    r = annual_rate / (12 * 100)
+    if r == 0:
+        return principal / months
+    return principal * (r * (1 + r) ** months) / ((1 + r) ** months - 1)
+
+
+def monthly_emi(principal, annual_rate, months) -> np.ndarray:
+    """EMI for every scenario; arguments broadcast against each other"""
+    principal = np.asarray(principal, dtype=float)
+    months = np.asarray(months, dtype=float)
+    r = np.asarray(annual_rate, dtype=float) / (12 * 100)
+    growth = (1 + r) ** months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        emi = principal * (r * growth) / (growth - 1)
+    return np.where(r == 0, principal / months, emi)
+
+
+def evaluate_scenarios(principal, annual_rate, months) -> Dict[str, np.ndarray]:
+    """EMI, total payment and total interest for every scenario"""
+    months = np.asarray(months, dtype=float)
+    emi = monthly_emi(principal, annual_rate, months)
+    total_payment = emi * months
+    return {
+        "emi": emi,
+        "total_payment": total_payment,
+        "total_interest": total_payment - np.asarray(principal, dtype=float)
+    }
+
+
+def amortization_schedule(principal: float, annual_rate: float, months: int) -> Dict[str, np.ndarray]:
+    """Month-by-month split of each EMI into interest and principal, with the balance left"""
+    months = int(months)
+    r = annual_rate / (12 * 100)
+    emi = float(monthly_emi(principal, annual_rate, months))
+    k = np.arange(0, months + 1, dtype=float)
+    if r == 0:
+        balance = principal - emi * k
+    else:
+        # Balance after k payments, P(1 - v^(n-k)) / (1 - v^n) with v = 1/(1+r); unlike
+        # P(1+r)^k - EMI((1+r)^k - 1)/r it does not cancel out at high rates and long tenures
+        log_v = -np.log1p(r)
+        balance = principal * np.expm1((months - k) * log_v) / np.expm1(months * log_v)
+    balance = np.clip(balance, 0, None)
+    balance[-1] = 0.0
+    interest = balance[:-1] * r
+    principal_paid = balance[:-1] - balance[1:]
+    return {
+        "month": np.arange(1, months + 1),
+        "emi": interest + principal_paid,
+        "interest": interest,
+        "principal": principal_paid,
+        "balance": balance[1:]
+    }
+
+
+def emi_summary(loan_amount: float, interest_rate: float, total_months: int) -> Dict[str, float]:
+    """Scalar EMI figures for one loan, as shown by the /emi calculator"""
+    result = evaluate_scenarios(loan_amount, interest_rate, total_months)
+    return {key: float(value) for key, value in result.items()}
+
+
+def schedule_rows(schedule: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Schedule arrays as JSON-ready rows rounded to paise"""
+    columns = {key: (np.round(values, 2) + 0.0).tolist() if key != "month" else values.tolist()
+               for key, values in schedule.items()}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def compare_offers(offers: List[Dict[str, Any]], loan_amount: float, months: int,
+                   loan_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """EMI of one loan at every offer's interest rate, cheapest first; offers without a rate are skipped"""
+    wanted = (loan_type or "").strip().casefold()
+    offers = [offer for offer in offers if offer['interest_rate'] is not None
+              and (not wanted or (offer['loan_type'] or "").strip().casefold() == wanted)]
+    if not offers:
+        return []
+    rates = np.fromiter((offer['interest_rate'] for offer in offers), dtype=float, count=len(offers))
+    result = evaluate_scenarios(loan_amount, rates, months)
+    order = np.argsort(result["emi"], kind="stable")
+    emi = np.round(result["emi"], 2)
+    total_interest = np.round(result["total_interest"], 2) + 0.0  # + 0.0 turns -0.0 into 0.0
+    return [
+        {
+            "partner": offers[i]['partner'],
+            "loan_type": offers[i]['loan_type'],
+            "name": offers[i]['name'],
+            "interest_rate": offers[i]['interest_rate'],
+            "url": offers[i]['url'],
+            "source": offers[i]['source'],
+            "emi": float(emi[i]),
+            "total_interest": float(total_interest[i])
+        }
+        for i in order.tolist()
+    ]
+
+
+def parse_scenarios(scenarios: List[Dict[str, Any]]):
+    """(amounts, rates, months) arrays from API scenario objects; raises ValueError naming the bad one"""
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError("scenarios must be a non-empty list")
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"at most {MAX_SCENARIOS} scenarios per request")
+    amounts = np.empty(len(scenarios))
+    rates = np.empty(len(scenarios))
+    months = np.empty(len(scenarios))
+    for i, scenario in enumerate(scenarios):
+        try:
+            amounts[i] = float(scenario["loan_amount"])
+            rates[i] = float(scenario["interest_rate"])
+            months[i] = int(tenure_in_months(int(scenario["tenure"]), scenario.get("tenure_unit", "months")))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError(f"scenario {i} needs numeric loan_amount, interest_rate and tenure")
+    bad = np.flatnonzero((amounts <= 0) | (rates < 0) | (rates > MAX_INTEREST_RATE)
+                         | (months < 1) | (months > MAX_TENURE_MONTHS) | ~np.isfinite(amounts) | ~np.isfinite(rates))
+    if bad.size:
+        raise ValueError(f"scenario {int(bad[0])} is out of range (amount > 0, 0-{MAX_INTEREST_RATE}% "
+                         f"interest, 1-{MAX_TENURE_MONTHS} months)")
+    return amounts, rates, months
+
+
+def benchmark(scenarios: int = 10000):
+    """Scenarios per second: vectorized engine vs the scalar formula"""
+    rng = np.random.default_rng(0)
+    amounts = rng.uniform(50_000, 5_000_000, scenarios)
+    rates = rng.uniform(0, 24, scenarios)
+    months = rng.integers(6, 361, scenarios).astype(float)
+
+    started = time.perf_counter()
+    result = evaluate_scenarios(amounts, rates, months)
+    vectorized = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for p, rate, n in zip(amounts.tolist(), rates.tolist(), months.tolist()):
+        scalar_emi(p, rate, n)
+    scalar = time.perf_counter() - started
+
+    started = time.perf_counter()
+    schedule = amortization_schedule(5_000_000, 8.5, 360)
+    schedule_time = time.perf_counter() - started
+
+    print(f"{scenarios} scenarios: vectorized {vectorized * 1000:.2f} ms, scalar loop {scalar * 1000:.2f} ms "
+          f"({scalar / vectorized:.0f}x)")
+    print(f"360-month schedule: {schedule_time * 1000:.3f} ms (max |Σprincipal - P| = "
+          f"{abs(schedule['principal'].sum() - 5_000_000):.6f})")
+    return result
+
+
+def _close(actual, expected, scale) -> bool:
+    return abs(actual - expected) <= 1e-9 * max(abs(scale), 1.0)
+
+
+def check(cases: int = 2000, seed: int = 0) -> bool:
+    """Randomized properties of the engine; returns False and prints every failure"""
+    rng = np.random.default_rng(seed)
+    failures = []
+
+    def fail(message):
+        failures.append(message)
+        if len(failures) <= 20:
+            print(f"❌ {message}")
+
+    # Random loans plus the edges of the accepted input range
+    edges = [(100_000, 0, 1), (100_000, 0, 600), (100_000, MAX_INTEREST_RATE, 1), (1, MAX_INTEREST_RATE, 600),
+             (5_000_000, 8.5, 360), (10_000_000, 0.001, MAX_TENURE_MONTHS), (1, 0, 1)]
+    amounts = np.concatenate([[e[0] for e in edges], rng.uniform(1_000, 10_000_000, cases)])
+    rates = np.concatenate([[e[1] for e in edges], rng.uniform(0, MAX_INTEREST_RATE, cases)])
+    rates[len(edges)::10] = 0.0
+    months = np.concatenate([[e[2] for e in edges], rng.integers(1, MAX_TENURE_MONTHS + 1, cases)]).astype(float)
+
+    # Vectorized engine == scalar formula, and a batch == one call per scenario
+    batch = evaluate_scenarios(amounts, rates, months)
+    for i, (p, rate, n) in enumerate(zip(amounts.tolist(), rates.tolist(), months.tolist())):
+        expected = scalar_emi(p, rate, n)
+        if not np.isfinite(batch["emi"][i]) or not _close(batch["emi"][i], expected, expected):
+            fail(f"EMI of ({p}, {rate}%, {n:.0f}) is {batch['emi'][i]}, the formula gives {expected}")
+        single = emi_summary(p, rate, int(n))
+        if not all(_close(single[key], float(batch[key][i]), batch["total_payment"][i]) for key in single):
+            fail(f"({p}, {rate}%, {n:.0f}) differs between a batch and a single call")
+
+    # Monotonic in rate and tenure, linear in principal
+    higher_rate = monthly_emi(amounts, np.minimum(rates + 0.5, MAX_INTEREST_RATE), months)
+    if np.any(higher_rate < batch["emi"] * (1 - 1e-12)):
+        fail("EMI decreases as the interest rate goes up")
+    longer = months < MAX_TENURE_MONTHS
+    if np.any(monthly_emi(amounts[longer], rates[longer], months[longer] + 1) > batch["emi"][longer] * (1 + 1e-12)):
+        fail("EMI increases as the tenure gets longer")
+    if not np.allclose(monthly_emi(amounts * 3, rates, months), batch["emi"] * 3, rtol=1e-12, atol=0):
+        fail("EMI is not linear in the loan amount")
+
+    # Amortization schedule invariants
+    for i in range(min(len(amounts), len(edges) + max(cases // 10, 1))):
+        p, rate, n = float(amounts[i]), float(rates[i]), int(months[i])
+        label = f"schedule ({p}, {rate}%, {n})"
+        schedule = amortization_schedule(p, rate, n)
+        balance = np.concatenate([[p], schedule["balance"]])
+        if len(schedule["month"]) != n or schedule["month"][-1] != n:
+            fail(f"{label} has {len(schedule['month'])} rows")
+        if not _close(schedule["principal"].sum(), p, p):
+            fail(f"{label}: principal repaid {schedule['principal'].sum()} != {p}")
+        if schedule["balance"][-1] != 0:
+            fail(f"{label}: final balance {schedule['balance'][-1]}")
+        if np.any(np.diff(balance) > 1e-9 * p) or np.any(balance < 0):
+            fail(f"{label}: balance is not non-increasing and non-negative")
+        if not np.allclose(schedule["interest"], balance[:-1] * rate / 1200, rtol=1e-12, atol=1e-9):
+            fail(f"{label}: interest is not the previous balance times the monthly rate")
+        if not _close(schedule["interest"].sum(), float(batch["total_interest"][i]), batch["total_payment"][i]):
+            fail(f"{label}: interest paid {schedule['interest'].sum()} != total interest "
+                 f"{batch['total_interest'][i]}")
+        if not np.allclose(schedule["emi"], batch["emi"][i], rtol=1e-9, atol=1e-9):
+            fail(f"{label}: monthly payments drift from the EMI")
+
+    # Offer comparison: cheapest first, offers without a rate or of another type skipped
+    for case in range(max(cases // 100, 1)):
+        offers = [
+            {"partner": f"Partner {j}", "loan_type": rng.choice(["Home Loan", "home loan ", "Car Loan"]),
+             "name": f"Offer {j}", "url": None, "source": "check",
+             "interest_rate": None if rng.random() < 0.2 else float(np.round(rng.uniform(0, 30), 2))}
+            for j in range(int(rng.integers(0, 30)))
+        ]
+        p, n = float(rng.uniform(10_000, 5_000_000)), int(rng.integers(1, MAX_TENURE_MONTHS + 1))
+        result = compare_offers(offers, p, n, loan_type="HOME LOAN" if case % 2 else None)
+        expected = [o for o in offers if o["interest_rate"] is not None
+                    and (not case % 2 or o["loan_type"].strip().casefold() == "home loan")]
+        if len(result) != len(expected) or any(row["interest_rate"] is None for row in result):
+            fail(f"compare_offers kept {len(result)} of {len(expected)} rated offers")
+        if any(a["emi"] > b["emi"] for a, b in zip(result, result[1:])):
+            fail("compare_offers is not sorted by EMI")
+        if sorted(row["interest_rate"] for row in result) != [row["interest_rate"] for row in result]:
+            fail("compare_offers does not order a single loan by interest rate")
+
+    # Scenario parsing accepts the documented range and rejects everything outside it
+    valid = {"loan_amount": 500000, "interest_rate": 9.5, "tenure": 5, "tenure_unit": "years"}
+    parsed = parse_scenarios([valid, {"loan_amount": "1", "interest_rate": 0, "tenure": MAX_TENURE_MONTHS}])
+    if parsed[2].tolist() != [60, MAX_TENURE_MONTHS] or parsed[0].tolist() != [500000, 1]:
+        fail(f"parse_scenarios read valid input as {parsed}")
+    invalid = [
+        [], {"scenarios": []}, [valid] * (MAX_SCENARIOS + 1), [{}], [None],
+        [dict(valid, loan_amount=0)], [dict(valid, loan_amount=-1)], [dict(valid, loan_amount="nan")],
+        [dict(valid, loan_amount="inf")], [dict(valid, loan_amount="abc")],
+        [dict(valid, interest_rate=-0.01)], [dict(valid, interest_rate=MAX_INTEREST_RATE + 0.01)],
+        [dict(valid, interest_rate="nan")], [dict(valid, tenure=0)], [dict(valid, tenure=51)],
+        [dict(valid, tenure=MAX_TENURE_MONTHS + 1, tenure_unit="months")], [dict(valid, tenure="5.5")],
+    ]
+    for scenarios in invalid:
+        try:
+            parse_scenarios(scenarios)
+        except ValueError:
+            continue
+        fail(f"parse_scenarios accepted {str(scenarios)[:80]}")
+
+    total = len(amounts)
+    if failures:
+        print(f"❌ {len(failures)} EMI property checks failed over {total} loans")
+        return False
+    print(f"✅ EMI engine matches the formula and schedule invariants over {total} loans "
+          f"(rates 0-{MAX_INTEREST_RATE}%, 1-{MAX_TENURE_MONTHS} months)")
+    return True
+
+
+if __name__ == "__main__":
+    # python -m src.main_app.emi benchmark [scenarios]
+    # python -m src.main_app.emi check [cases]
+    if not sys.argv[1:] or sys.argv[1] not in ("benchmark", "check"):
+        print("Usage: python -m src.main_app.emi benchmark [scenarios] | check [cases]")
+        sys.exit(1)
+    if sys.argv[1] == "check":
+        sys.exit(0 if check(*(int(arg) for arg in sys.argv[2:3])) else 1)
+    benchmark(*(int(arg) for arg in sys.argv[2:3]))
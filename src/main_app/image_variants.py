@@ -0,0 +1,240 @@
+import hashlib
+import io
+import json
+import os
+import posixpath
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from markupsafe import Markup, escape
+from src.main_app.static_assets import ASSET_ROOTS, asset_url
+
+# Responsive image variants
+#
+# Build step (after the static asset build; needs Pillow):
+#   python -m src.main_app.image_variants build
+#
+# Every PNG/JPEG under the static roots (partner logos, banners, icons) is
+# resized to each width bucket in WIDTHS narrower than the original, plus the
+# original width, and written twice into the root's variants/ cache: as WebP
+# and as a fallback - PNG when the image has transparency or a palette (logos,
+# icons), JPEG otherwise (photographic banners). Variant names carry a hash of
+# the source bytes and the encoder settings, so an image is only decoded and
+# re-encoded when it or the settings change; variants/manifest.json lists the
+# widths and URLs per source. Templates use
+#   responsive_image(path, sizes, alt=..., **attrs)  -> <picture> with WebP and fallback srcsets
+#   image_srcset(path, fmt)                          -> the srcset string alone
+#   responsive_background(selector, path)            -> CSS rules picking a width per viewport
+# and fall back to the original asset when there is no manifest entry.
+# Variant files are served immutable by AssetStaticFiles like dist/.
+
+VARIANTS_DIR = "variants"
+MANIFEST_NAME = "manifest.json"
+WIDTHS = (160, 320, 640, 960, 1280, 1920)
+SOURCE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+SKIP_DIRS = {"dist", VARIANTS_DIR, "uploads", "__pycache__"}
+
+WEBP_QUALITY = 80
+# method 6 is ~2% smaller but over 40x slower on large images with alpha
+WEBP_METHOD = 4
+JPEG_QUALITY = 82
+# Part of every variant name: changing an encoder setting regenerates everything
+SETTINGS = f"webp{WEBP_QUALITY}m{WEBP_METHOD}/jpeg{JPEG_QUALITY}/{','.join(map(str, WIDTHS))}/v1"
+
+# Backgrounds are chosen by viewport width assuming up to 2x pixel density
+BACKGROUND_DENSITY = 2
+# <img src> for clients that ignore srcset: the largest fallback up to this width
+DEFAULT_SRC_WIDTH = 640
+
+
+def _source_files(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in SOURCE_EXTENSIONS:
+                yield Path(dirpath) / filename
+
+
+def _target_widths(width: int) -> List[int]:
+    """Every bucket narrower than the image, plus the image's own width unless it exceeds the largest bucket"""
+    widths = [w for w in WIDTHS if w < width]
+    if width <= WIDTHS[-1]:
+        widths.append(width)
+    return widths
+
+
+def _encode(image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=WEBP_METHOD)
+    elif fmt == "png":
+        image.save(buffer, "PNG", optimize=True)
+    else:
+        image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def build_variants(directory: str) -> Tuple[Dict[str, Any], int]:
+    """Generate missing variants for one static directory; returns its manifest and the number generated"""
+    from PIL import Image
+
+    root = Path(directory)
+    out = root / VARIANTS_DIR
+    manifest: Dict[str, Any] = {}
+    written = set()
+    generated = 0
+    for source in _source_files(root):
+        name = source.relative_to(root).as_posix()
+        data = source.read_bytes()
+        digest = hashlib.sha256(data + SETTINGS.encode()).hexdigest()[:12]
+        stem = posixpath.splitext(name)[0]
+
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            transparent = image.mode in ("RGBA", "LA", "P") or "transparency" in image.info
+            fallback = "png" if transparent else "jpeg"
+            entry = {"width": width, "height": height, "fallback": fallback, "webp": [], fallback: []}
+            pending = []
+            for target_width in _target_widths(width):
+                for fmt in ("webp", fallback):
+                    ext = "jpg" if fmt == "jpeg" else fmt
+                    variant = f"{stem}.{digest}.{target_width}w.{ext}"
+                    entry[fmt].append([target_width, variant])
+                    written.add(out / variant)
+                    if not (out / variant).exists():
+                        pending.append((target_width, fmt, out / variant))
+            if pending:
+                image = image.convert("RGBA" if transparent else "RGB")
+                for target_width, fmt, path in pending:
+                    target_height = max(1, round(height * target_width / width))
+                    resized = image if target_width == width else image.resize((target_width, target_height), Image.LANCZOS)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_name(path.name + ".tmp")
+                    tmp.write_bytes(_encode(resized, fmt))
+                    os.replace(tmp, path)
+                    generated += 1
+        manifest[name] = entry
+
+    out.mkdir(parents=True, exist_ok=True)
+    (out / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    written.add(out / MANIFEST_NAME)
+    for dirpath, _, filenames in os.walk(out, topdown=False):
+        for filename in filenames:
+            if Path(dirpath) / filename not in written:
+                os.remove(os.path.join(dirpath, filename))
+        if dirpath != str(out) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return manifest, generated
+
+
+# Manifests, loaded once per worker
+
+_manifests: Dict[str, Dict[str, Any]] = {}
+_manifest_lock = threading.Lock()
+
+
+def load_manifest(directory: str) -> Dict[str, Any]:
+    manifest = _manifests.get(directory)
+    if manifest is None:
+        with _manifest_lock:
+            try:
+                with open(os.path.join(directory, VARIANTS_DIR, MANIFEST_NAME)) as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {}
+            _manifests[directory] = manifest
+    return manifest
+
+
+def reload_manifests():
+    with _manifest_lock:
+        _manifests.clear()
+
+
+def _lookup(path: Optional[str]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """(url prefix, manifest entry) for an asset path like '/static/partners/Yes_Bank.png'"""
+    if not path:
+        return None, None
+    for prefix, directory in ASSET_ROOTS.items():
+        if path.startswith(prefix + "/"):
+            return prefix, load_manifest(directory).get(path[len(prefix) + 1:])
+    return None, None
+
+
+def image_srcset(path: str, fmt: str = "webp") -> str:
+    """'<url> 160w, <url> 320w, ...' for one format ('webp' or 'fallback'); empty if not built"""
+    prefix, entry = _lookup(path)
+    if entry is None:
+        return ""
+    variants = entry[entry["fallback"] if fmt == "fallback" else fmt]
+    return ", ".join(f"{prefix}/{VARIANTS_DIR}/{variant} {width}w" for width, variant in variants)
+
+
+def responsive_image(path: str, sizes: str, **attrs) -> Markup:
+    """<picture> with WebP and fallback srcsets; a plain <img> before the variants are built"""
+    prefix, entry = _lookup(path)
+    attributes = "".join(f' {key}="{escape(value)}"' for key, value in attrs.items() if value is not None)
+    if entry is None:
+        return Markup(f'<img src="{escape(asset_url(path))}"{attributes}>')
+    default = [variant for width, variant in entry[entry["fallback"]] if width <= DEFAULT_SRC_WIDTH][-1]
+    src = f"{prefix}/{VARIANTS_DIR}/{default}"
+    return Markup(
+        f'<picture><source type="image/webp" srcset="{escape(image_srcset(path))}" sizes="{escape(sizes)}">'
+        f'<img src="{escape(src)}" srcset="{escape(image_srcset(path, "fallback"))}" sizes="{escape(sizes)}"'
+        f'{attributes}></picture>'
+    )
+
+
+def responsive_background(selector: str, path: str) -> Markup:
+    """CSS background-image rules for selector: full size by default, smaller widths on narrow viewports"""
+    prefix, entry = _lookup(path)
+    if entry is None:
+        return Markup(f"{selector} {{ background-image: url('{asset_url(path)}'); }}")
+    mime = {"png": "image/png", "jpeg": "image/jpeg"}[entry["fallback"]]
+
+    def rule(webp: str, fallback: str) -> str:
+        webp_url = f"{prefix}/{VARIANTS_DIR}/{webp}"
+        fallback_url = f"{prefix}/{VARIANTS_DIR}/{fallback}"
+        # Browsers without image-set() type() keep the first declaration
+        return (f"{selector} {{ background-image: url('{fallback_url}'); "
+                f"background-image: image-set(url('{webp_url}') type('image/webp'), url('{fallback_url}') type('{mime}')); }}")
+
+    pairs = list(zip(entry["webp"], entry[entry["fallback"]]))
+    rules = [rule(pairs[-1][0][1], pairs[-1][1][1])]
+    # Largest breakpoints first so the narrowest matching one wins
+    for (width, webp), (_, fallback) in reversed(pairs[:-1]):
+        rules.append(f"@media (max-width: {width // BACKGROUND_DENSITY}px) {{ {rule(webp, fallback)} }}")
+    return Markup("\n        ".join(rules))
+
+
+def build():
+    """Build every static root and report the size of the variants against the originals"""
+    for prefix, directory in ASSET_ROOTS.items():
+        started = time.perf_counter()
+        manifest, generated = build_variants(directory)
+        root = Path(directory)
+        original = sum((root / name).stat().st_size for name in manifest)
+        mobile = 0
+        for entry in manifest.values():
+            # What a 390px-wide 2x phone downloads for a full-width image: the 960w WebP (or the largest below it)
+            width, variant = [v for v in entry["webp"] if v[0] <= 960][-1]
+            mobile += (root / VARIANTS_DIR / variant).stat().st_size
+        print(f"✅ {prefix}: {len(manifest)} images ({original / 1024:,.0f} KB), "
+              f"{generated} variants generated in {time.perf_counter() - started:.1f}s; "
+              f"960w WebP total {mobile / 1024:,.0f} KB")
+    reload_manifests()
+
+
+if __name__ == "__main__":
+    # python -m src.main_app.image_variants build
+    if not sys.argv[1:] or sys.argv[1] != "build":
+        print("Usage: python -m src.main_app.image_variants build")
+        sys.exit(1)
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("❌ Pillow is required to build image variants: pip install Pillow")
+        sys.exit(1)
+    build()
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from src.main_app.database import SessionLocal
+from src.main_app.models import BankLoan
+from src.main_app.partner_catalog import get_partner_catalog
+from src.main_app.bank_loans import bank_loans_fingerprint, json_bytes
+
+# Loan comparison index
+#
+# /api/loans answers filter and sort queries over every partner product (the
+# partner JSON files, via the partner catalog) and the bank_loans table from an
+# index built once per data version: all offers sorted by parsed interest rate,
+# plus the same rate-sorted arrays bucketed per loan type, per partner and per
+# (loan type, partner). A query picks the narrowest bucket and bisects it for
+# the rate range, so it never scans the whole catalog. The index is rebuilt
+# when the partner catalog reloads or the bank_loans fingerprint (row count,
+# max id, max last_updated) changes; the fingerprint is checked at most every
+# LOAN_INDEX_CHECK_SECONDS. Serialized responses are cached per query and carry
+# an ETag derived from the data version, so clients revalidate with 304s.
+#
+# Offers without a parsable rate are kept (sorted last) but never match a rate
+# bound. The bucket filtering is checked against a brute-force filter over
+# random offers and bounds:
+#   python -m src.main_app.loan_index check [cases]
+
+LOAN_INDEX_CHECK_SECONDS = float(os.getenv("LOAN_INDEX_CHECK_SECONDS", "5"))
+LOAN_QUERY_CACHE_SIZE = 512
+
+SORTS = ("rate", "-rate", "partner", "name")
+
+_RATE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+
+
+def parse_rate(value) -> Optional[float]:
+    """10.5, '10.5', '10.5% p.a.', 'From 10.49% p.a.' -> 10.5 / 10.49; None if there is no rate"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _RATE_PATTERN.search(str(value))
+    if match:
+        return float(match.group(1))
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _key(value: Optional[str]) -> str:
+    return (value or "").strip().casefold()
+
+
+def _partner_offers(catalog) -> List[Dict[str, Any]]:
+    offers = []
+    for partner in catalog.partners:
+        for loan in partner['loans']:
+            raw_rate = loan.get('interest_rate', loan.get('interest', loan.get('rate')))
+            offers.append({
+                'partner': partner['name'],
+                'partner_type': partner['type'],
+                'loan_type': loan.get('type') or loan['name'],
+                'name': loan['name'],
+                'interest_rate': parse_rate(raw_rate),
+                'interest': raw_rate if isinstance(raw_rate, str) else None,
+                'features': loan.get('features') or [],
+                'url': loan.get('url') or partner['url'],
+                'source': 'partner'
+            })
+    return offers
+
+
+def _bank_loan_offers(bank_loans: List[BankLoan]) -> List[Dict[str, Any]]:
+    offers = []
+    for loan in bank_loans:
+        try:
+            features = json.loads(loan.features) if loan.features else []
+        except ValueError:
+            features = []
+        offers.append({
+            'partner': loan.bank_name,
+            'partner_type': 'Bank',
+            'loan_type': loan.loan_type,
+            'name': loan.loan_type,
+            'interest_rate': loan.interest_rate,
+            'interest': f"{loan.interest_rate}% p.a." if loan.interest_rate is not None else None,
+            'features': features,
+            'url': loan.url,
+            'source': 'bank_loans'
+        })
+    return offers
+
+
+class _Bucket:
+    """Offers sorted by rate (unknown rates last) with a parallel array of rates for bisecting"""
+
+    __slots__ = ("offers", "rates")
+
+    def __init__(self, offers: List[Dict[str, Any]]):
+        self.offers = offers
+        self.rates = [math.inf if offer['interest_rate'] is None else offer['interest_rate'] for offer in offers]
+
+    def rate_range(self, min_rate: Optional[float], max_rate: Optional[float]) -> List[Dict[str, Any]]:
+        """Offers with min_rate <= rate <= max_rate; unknown rates only match when neither bound is set"""
+        if min_rate is None and max_rate is None:
+            return self.offers
+        start = bisect_left(self.rates, min_rate) if min_rate is not None else 0
+        end = bisect_right(self.rates, max_rate) if max_rate is not None else bisect_left(self.rates, math.inf)
+        return self.offers[start:end]
+
+
+@dataclass(frozen=True)
+class LoanIndexSnapshot:
+    version: str
+    all: _Bucket
+    by_type: Dict[str, _Bucket]
+    by_partner: Dict[str, _Bucket]
+    by_type_partner: Dict[Tuple[str, str], _Bucket]
+    loan_types: List[str]
+    partners: List[str]
+
+
+def build_index(offers: List[Dict[str, Any]], version: str) -> LoanIndexSnapshot:
+    offers = sorted(offers, key=lambda o: (o['interest_rate'] is None, o['interest_rate'] or 0, o['partner'], o['name']))
+    groups: Dict[Any, Dict[Any, List]] = {"type": {}, "partner": {}, "type_partner": {}}
+    for offer in offers:
+        type_key, partner_key = _key(offer['loan_type']), _key(offer['partner'])
+        groups["type"].setdefault(type_key, []).append(offer)
+        groups["partner"].setdefault(partner_key, []).append(offer)
+        groups["type_partner"].setdefault((type_key, partner_key), []).append(offer)
+    return LoanIndexSnapshot(
+        version=version,
+        all=_Bucket(offers),
+        by_type={key: _Bucket(group) for key, group in groups["type"].items()},
+        by_partner={key: _Bucket(group) for key, group in groups["partner"].items()},
+        by_type_partner={key: _Bucket(group) for key, group in groups["type_partner"].items()},
+        loan_types=sorted({offer['loan_type'] for offer in offers if offer['loan_type']}),
+        partners=sorted({offer['partner'] for offer in offers if offer['partner']})
+    )
+
+
+class LoanIndex:
+    """Per-worker loan comparison index with a per-query response cache"""
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = LOAN_INDEX_CHECK_SECONDS if check_interval is None else check_interval
+        self.builds = 0
+        self._snapshot: Optional[LoanIndexSnapshot] = None
+        self._sources = None
+        self._bank_fingerprint = None
+        self._next_check = 0.0
+        self._responses: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> LoanIndexSnapshot:
+        """The current index, rebuilding first if the partner files or bank_loans changed"""
+        catalog = get_partner_catalog().snapshot()
+        snapshot = self._snapshot
+        if snapshot is not None and self._sources[0] is catalog and time.monotonic() < self._next_check:
+            return snapshot
+        with self._lock:
+            db = SessionLocal()
+            try:
+                if self._snapshot is None or time.monotonic() >= self._next_check:
+                    self._bank_fingerprint = bank_loans_fingerprint(db)
+                    self._next_check = time.monotonic() + self.check_interval
+                sources = (catalog, self._bank_fingerprint)
+                if self._snapshot is not None and self._sources[0] is catalog and self._sources[1] == sources[1]:
+                    return self._snapshot
+                offers = _partner_offers(catalog) + _bank_loan_offers(db.query(BankLoan).all())
+            finally:
+                db.close()
+            version = hashlib.sha1(repr((catalog.source_mtimes, self._bank_fingerprint)).encode()).hexdigest()[:16]
+            self._snapshot = build_index(offers, version)
+            self._sources = sources
+            self._responses.clear()
+            self.builds += 1
+            return self._snapshot
+
+    def query(self, loan_type: str = None, partner: str = None, min_rate: float = None,
+              max_rate: float = None, sort: str = "rate", limit: int = 100, offset: int = 0) -> Tuple[str, bytes]:
+        """(etag, JSON body) for a filtered, sorted page of offers"""
+        snapshot = self.snapshot()
+        params = (_key(loan_type), _key(partner), min_rate, max_rate, sort, limit, offset)
+        etag = '"' + hashlib.sha1(repr((snapshot.version,) + params).encode()).hexdigest()[:24] + '"'
+        cache_key = (snapshot.version,) + params
+        body = self._responses.get(cache_key)
+        if body is not None:
+            return etag, body
+
+        type_key, partner_key = params[0], params[1]
+        if type_key and partner_key:
+            bucket = snapshot.by_type_partner.get((type_key, partner_key))
+        elif type_key:
+            bucket = snapshot.by_type.get(type_key)
+        elif partner_key:
+            bucket = snapshot.by_partner.get(partner_key)
+        else:
+            bucket = snapshot.all
+        matches = bucket.rate_range(min_rate, max_rate) if bucket else []
+
+        if sort == "-rate":
+            # Highest known rate first, unknown rates still last
+            known = [offer for offer in matches if offer['interest_rate'] is not None]
+            matches = known[::-1] + matches[len(known):]
+        elif sort == "partner":
+            matches = sorted(matches, key=lambda o: (_key(o['partner']), _key(o['name'])))
+        elif sort == "name":
+            matches = sorted(matches, key=lambda o: (_key(o['name']), _key(o['partner'])))
+
+        body = json_bytes({
+            "version": snapshot.version,
+            "total": len(matches),
+            "offset": offset,
+            "limit": limit,
+            "loans": matches[offset:offset + limit],
+            "loan_types": snapshot.loan_types,
+            "partners": snapshot.partners
+        })
+
+        with self._lock:
+            self._responses[cache_key] = body
+            if len(self._responses) > LOAN_QUERY_CACHE_SIZE:
+                self._responses.popitem(last=False)
+        return etag, body
+
+
+_index = LoanIndex()
+
+
+def get_loan_index() -> LoanIndex:
+    return _index
+
+
+def check(cases: int = 2000, seed: int = 0) -> bool:
+    """Random offers and rate bounds: every bucket's rate_range() against a brute-force filter"""
+    rng = random.Random(seed)
+    failures = 0
+    offers = [
+        {
+            'partner': rng.choice(["Alpha", "Beta", "Gamma"]),
+            'loan_type': rng.choice(["Home Loan", "Car Loan", "Personal Loan"]),
+            'name': f"Offer {i}",
+            'interest_rate': None if rng.random() < 0.2 else rng.choice([8.5, 10.0, 10.5, 12.0, rng.uniform(0, 30)])
+        }
+        for i in range(300)
+    ]
+    snapshot = build_index(offers, "check")
+    buckets = [snapshot.all, *snapshot.by_type.values(), *snapshot.by_partner.values(),
+               *snapshot.by_type_partner.values()]
+    bounds = [None, 0, 8.5, 10, 10.5, 12, 30, 100]
+
+    for case in range(cases):
+        bucket = rng.choice(buckets)
+        min_rate = rng.choice(bounds + [rng.uniform(0, 30)])
+        max_rate = rng.choice(bounds + [rng.uniform(0, 30)])
+        if min_rate is None and max_rate is None:
+            expected = bucket.offers
+        else:
+            expected = [offer for offer in bucket.offers if offer['interest_rate'] is not None
+                        and (min_rate is None or offer['interest_rate'] >= min_rate)
+                        and (max_rate is None or offer['interest_rate'] <= max_rate)]
+        actual = bucket.rate_range(min_rate, max_rate)
+        if actual != expected:
+            failures += 1
+            if failures <= 10:
+                print(f"❌ rate_range({min_rate}, {max_rate}) returned {len(actual)} offers, expected {len(expected)}")
+
+    if failures:
+        print(f"❌ {failures} of {cases} rate range queries differ from the brute-force filter")
+        return False
+    print(f"✅ {cases} rate range queries match the brute-force filter (unknown rates excluded by any bound)")
+    return True
+
+
+if __name__ == "__main__":
+    # python -m src.main_app.loan_index check [cases]
+    if not sys.argv[1:] or sys.argv[1] != "check":
+        print("Usage: python -m src.main_app.loan_index check [cases]")
+        sys.exit(1)
+    sys.exit(0 if check(*(int(arg) for arg in sys.argv[2:3])) else 1)
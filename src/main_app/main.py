@@ -1,24 +1,23 @@
 from fastapi import FastAPI, Request, Form, Query, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi import status
 import uvicorn
 import json
+import anyio
+import numpy as np
 from pathlib import Path
 import smtplib
-from email.message import EmailMessage
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 # Scraper imports removed - using static data instead
-import time
 from starlette.middleware.sessions import SessionMiddleware
 # Admin router removed - no admin functionality needed
 from src.main_app.database import get_db, SessionLocal
-from src.main_app.models import FAQ, Partner, Product, BankLoan
+from src.main_app.models import FAQ, Partner
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 
@@ -26,8 +25,22 @@ from sqlalchemy import desc
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.shared.crm_models import WebsiteLead
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from src.shared.database import get_database_url, get_engine, get_sessionmaker, get_crm_db, pool_stats, dispose_engines
+from src.crm.lead_spool import spool_lead, spool_stats, start_spool_drainer, stop_spool_drainer
+from src.main_app.email_outbox import EMAIL_CONFIG, enqueue_email, outbox_stats, start_email_sender, stop_email_sender
+from src.main_app.email_templates import render_lead_notification
+from src.main_app.partner_catalog import get_partner_catalog
+from src.main_app.loan_index import SORTS as LOAN_SORTS, get_loan_index
+from src.main_app.bank_loans import get_bank_loans_cache, json_bytes
+from src.main_app.consolidation import parse_loans, remaining_months, simulate_consolidation
+from src.main_app.page_cache import PageCacheMiddleware, etag_matches, page_cache_stats
+from src.main_app.products_catalog import get_products_catalog
+from src.main_app.static_assets import AssetStaticFiles, asset_url
+from src.main_app.image_variants import image_srcset, responsive_background, responsive_image
+from src.main_app.emi import (
+    MAX_INTEREST_RATE, MAX_TENURE_MONTHS, amortization_schedule, compare_offers, emi_summary,
+    evaluate_scenarios, parse_scenarios, schedule_rows, tenure_in_months
+)
 
 # Include CRM routes with /crm prefix
 from src.crm.routes import router as crm_router
@@ -63,23 +76,50 @@ async def startup_event():
             print("✅ Initial data populated successfully")
         else:
             print("⚠️ Warning: Failed to populate initial data")
+        
+        # Pick up background jobs left queued or orphaned by a previous worker
+        from src.crm.jobs import resume_jobs
+        resumed = resume_jobs()
+        if resumed:
+            print(f"✅ Resumed {resumed} background jobs")
+        
+        # Move spooled form submissions into the CRM
+        start_spool_drainer()
+        
+        # Deliver queued emails
+        start_email_sender()
+        
+        # Load the partner loan catalog before the first /partners request
+        get_partner_catalog().snapshot()
     else:
         print("❌ Failed to initialize database tables")
     
     print("🎉 Application startup completed!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background job workers, the lead spool drainer and the email senders, then close the pools"""
+    from src.crm.jobs import shutdown_jobs
+    shutdown_jobs()
+    stop_spool_drainer()
+    stop_email_sender()
+    dispose_engines()
+
 # Add session middleware
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "super-secret-key-change-this"))
 
+# Serve anonymous marketing pages from the full-page cache (outside the session middleware)
+app.add_middleware(PageCacheMiddleware)
+
 # Include routers
 app.include_router(crm_router, prefix="/crm")
 app.include_router(manual_leads_router, prefix="/crm")
 app.include_router(blog_router, prefix="/blog")
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="src/main_app/static"), name="static")
-app.mount("/crm/static", StaticFiles(directory="src/crm/static"), name="crm_static")
-app.mount("/blog/static", StaticFiles(directory="src/blog/static"), name="blog_static")
+# Mount static files (fingerprinted copies under dist/ are served immutable and precompressed)
+app.mount("/static", AssetStaticFiles(directory="src/main_app/static"), name="static")
+app.mount("/crm/static", AssetStaticFiles(directory="src/crm/static"), name="crm_static")
+app.mount("/blog/static", AssetStaticFiles(directory="src/blog/static"), name="blog_static")
 
 # SEO Routes
 @app.get("/sitemap.xml", response_class=FileResponse)
@@ -92,6 +132,8 @@ async def robots():
 
 # Templates
 templates = Jinja2Templates(directory="src/main_app/templates")
+templates.env.globals.update(asset_url=asset_url, responsive_image=responsive_image,
+                             image_srcset=image_srcset, responsive_background=responsive_background)
 
 # Blog templates will be added here
 
@@ -119,35 +161,15 @@ if ENVIRONMENT == "production":
     #         allowed_hosts=allowed_hosts
     #     )
 
-# Database setup for production
-if ENVIRONMENT == "production":
-    # Use PostgreSQL for production
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    CRM_DATABASE_URL = os.getenv("CRM_DATABASE_URL")
-    
-    if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    
-    if CRM_DATABASE_URL and CRM_DATABASE_URL.startswith("postgres://"):
-        CRM_DATABASE_URL = CRM_DATABASE_URL.replace("postgres://", "postgresql://", 1)
-else:
-    # Use SQLite for development
-    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./site.db")
-    CRM_DATABASE_URL = os.getenv("CRM_DATABASE_URL", "sqlite:///./crm.db")
-
-# Create database engines
-if "sqlite" in DATABASE_URL:
-    main_engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    main_engine = create_engine(DATABASE_URL, pool_size=20, max_overflow=0, pool_pre_ping=True)
-
-if "sqlite" in CRM_DATABASE_URL:
-    crm_engine = create_engine(CRM_DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    crm_engine = create_engine(CRM_DATABASE_URL, pool_size=20, max_overflow=0, pool_pre_ping=True)
+# Database engines come from the shared per-worker registry so the main site,
+# CRM and blog routers all reuse the same two connection pools
+DATABASE_URL = get_database_url("main")
+CRM_DATABASE_URL = get_database_url("crm")
+main_engine = get_engine("main")
+crm_engine = get_engine("crm")
 
 # Create session makers
-CRMSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=crm_engine)
+CRMSessionLocal = get_sessionmaker("crm")
 
 # Database initialization functions
 def create_tables():
@@ -168,6 +190,18 @@ def create_tables():
         CRMBase.metadata.create_all(bind=crm_engine)
         print("✅ CRM database tables created")
         
+        # Add indexes introduced after the tables were first created
+        from src.shared.migrations import migrate_crm_indexes
+        migrate_crm_indexes(crm_engine)
+        
+        # Build the analytics rollups for databases that predate them
+        from src.crm.rollups import backfill_rollups_if_empty
+        db = CRMSessionLocal()
+        try:
+            backfill_rollups_if_empty(db)
+        finally:
+            db.close()
+        
         print("🔧 Creating Blog database tables...")
         # Create Blog tables
         BlogBase.metadata.create_all(bind=main_engine)
@@ -294,13 +328,6 @@ def populate_initial_data():
         traceback.print_exc()
         return False
 
-def get_crm_db():
-    db = CRMSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def save_lead_to_crm(name, contact, email, message, source="website"):
     """Save lead to CRM database using unified lead service"""
     db = None
@@ -321,18 +348,40 @@ def save_lead_to_crm(name, contact, email, message, source="website"):
         if db:
             db.close()
 
+# Lead intake
+#
+# The public forms are async endpoints but saving a lead is a blocking
+# SQLAlchemy transaction, so it runs on a worker thread and the event loop keeps
+# serving other requests meanwhile. Intake has its own capacity limiter: a burst
+# of submissions queues for at most LEAD_INTAKE_CONCURRENCY threads and leaves
+# the default threadpool, which every sync route runs on, to the rest of the site.
+LEAD_INTAKE_CONCURRENCY = int(os.getenv("LEAD_INTAKE_CONCURRENCY", "8"))
+_intake_limiter = None
+
+def _get_intake_limiter():
+    global _intake_limiter
+    if _intake_limiter is None:
+        # anyio limiters must be created inside the running event loop
+        _intake_limiter = anyio.CapacityLimiter(LEAD_INTAKE_CONCURRENCY)
+    return _intake_limiter
+
+async def save_lead_to_crm_async(name, contact, email, message, source="website"):
+    """save_lead_to_crm() on the bounded intake threadpool"""
+    return await anyio.to_thread.run_sync(
+        save_lead_to_crm, name, contact, email, message, source, limiter=_get_intake_limiter()
+    )
+
+async def intake_lead(name, contact, email, message, source="website"):
+    """Accept a form lead through the durable spool, saving it directly if the spool is unavailable"""
+    try:
+        spool_lead(name, contact, email, message, source)
+    except Exception as e:
+        print(f"⚠️ Lead spool unavailable, saving to CRM directly: {e}")
+        await save_lead_to_crm_async(name, contact, email, message, source)
+
 # Email Configuration
-# Note: For Gmail, you need to use an App Password instead of your regular password
-# Generate an App Password at: https://myaccount.google.com/apppasswords
-EMAIL_CONFIG = {
-    'smtp_server': os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
-    'smtp_port': int(os.getenv('SMTP_PORT', '587')),
-    'smtp_username': os.getenv('SMTP_USERNAME', 'support@advancecfa.com'),
-    'smtp_password': os.getenv('SMTP_PASSWORD', 'YOUR_APP_PASSWORD_HERE'),  # Replace with App Password
-    'from_email': os.getenv('FROM_EMAIL', 'support@advancecfa.com'),
-    'to_email': os.getenv('TO_EMAIL', 'support@advancecfa.com'),
-    'use_tls': os.getenv('USE_TLS', 'True').lower() == 'true'
-}
+# SMTP settings (EMAIL_CONFIG) live in src/main_app/email_outbox.py. The send_*
+# helpers below only queue the message; the outbox senders deliver it.
 
 # Alternative email configuration for testing
 # You can use your personal Gmail account for testing
@@ -347,83 +396,17 @@ TEST_EMAIL_CONFIG = {
 }
 
 def send_simple_email(subject, data, form_type):
-    """Send a simple email without HTML formatting for testing"""
+    """Queue a simple email without HTML formatting for testing"""
     try:
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = EMAIL_CONFIG['from_email']
-        msg['To'] = EMAIL_CONFIG['to_email']
-        
-        # Create plain text content
-        text_content = f"""
-{subject}
-
-New Lead Information:
-"""
-        for key, value in data.items():
-            if value and key not in ['source', 'form_type']:
-                label = key.replace('_', ' ').title()
-                text_content += f"{label}: {value}\n"
+        # Plain text part of the lead notification
+        text_content = render_lead_notification(subject, data, form_type)[0]
         
-        text_content += f"""
-Source: {data.get('source', 'Unknown')}
-Form Type: {form_type}
-
-⚠️ ACTION REQUIRED: This is a new lead that requires immediate attention. 
-Please contact the customer within 30 minutes as promised on the website.
-
----
-Advance Credit Financial Advisory
-support@advancecfa.com
-Transform your financial future with expert debt consolidation
-"""
-        
-        # Attach text content
-        text_part = MIMEText(text_content, 'plain')
-        msg.attach(text_part)
-        
-        # Try to send email with detailed error handling
-        try:
-            print(f"🔧 Attempting to send email to {EMAIL_CONFIG['to_email']}")
-            print(f"🔧 Using SMTP: {EMAIL_CONFIG['smtp_server']}:{EMAIL_CONFIG['smtp_port']}")
-            print(f"🔧 Username: {EMAIL_CONFIG['smtp_username']}")
-            
-            if EMAIL_CONFIG['use_tls']:
-                server = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-                print("🔧 Starting TLS...")
-                server.starttls()
-            else:
-                server = smtplib.SMTP_SSL(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-            
-            print("🔧 Attempting login...")
-            server.login(EMAIL_CONFIG['smtp_username'], EMAIL_CONFIG['smtp_password'])
-            print("🔧 Login successful!")
-            
-            # Send email
-            server.send_message(msg)
-            server.quit()
-            
-            print(f"✅ Email sent successfully: {subject}")
-            return True, None
-            
-        except smtplib.SMTPAuthenticationError as e:
-            print(f"❌ SMTP Authentication failed: {e}")
-            print("💡 Solution: Check username/password or enable App Passwords in Gmail")
-            return False, "SMTP Authentication failed - check username/password"
-        except smtplib.SMTPException as e:
-            print(f"❌ SMTP Error: {e}")
-            return False, f"SMTP Error: {e}"
-        except Exception as e:
-            print(f"❌ Email sending failed: {e}")
-            return False, str(e)
+        email_id = enqueue_email(subject, text_content)
+        print(f"📧 Email #{email_id} queued for {EMAIL_CONFIG['to_email']}: {subject}")
+        return True, None
             
     except Exception as e:
-        print(f"❌ Email configuration error: {e}")
+        print(f"❌ Failed to queue email: {e}")
         return False, str(e)
 
 def send_test_email(subject, data, form_type):
@@ -481,277 +464,43 @@ Advance Credit Financial Advisory
 
 def create_html_email_template(subject, data, form_type):
     """Create a nicely formatted HTML email template"""
-    html_template = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{subject}</title>
-        <style>
-            body {{
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 20px;
-                background-color: #f4f4f4;
-            }}
-            .email-container {{
-                background-color: #ffffff;
-                border-radius: 10px;
-                padding: 30px;
-                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            }}
-            .header {{
-                background: linear-gradient(135deg, #1e3a8a 0%, #1e40af 100%);
-                color: white;
-                padding: 20px;
-                border-radius: 8px 8px 0 0;
-                margin: -30px -30px 30px -30px;
-                text-align: center;
-            }}
-            .header h1 {{
-                margin: 0;
-                font-size: 24px;
-                font-weight: 600;
-            }}
-            .form-type-badge {{
-                background-color: #10b981;
-                color: white;
-                padding: 4px 12px;
-                border-radius: 20px;
-                font-size: 12px;
-                font-weight: 600;
-                text-transform: uppercase;
-                display: inline-block;
-                margin-top: 10px;
-            }}
-            .data-section {{
-                background-color: #f8fafc;
-                border-radius: 8px;
-                padding: 20px;
-                margin: 20px 0;
-            }}
-            .data-row {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                padding: 10px 0;
-                border-bottom: 1px solid #e2e8f0;
-            }}
-            .data-row:last-child {{
-                border-bottom: none;
-            }}
-            .data-label {{
-                font-weight: 600;
-                color: #374151;
-                min-width: 120px;
-            }}
-            .data-value {{
-                color: #1f2937;
-                text-align: right;
-                flex: 1;
-                margin-left: 20px;
-            }}
-            .footer {{
-                background-color: #f1f5f9;
-                padding: 20px;
-                border-radius: 8px;
-                margin-top: 30px;
-                text-align: center;
-                color: #64748b;
-                font-size: 14px;
-            }}
-            .company-info {{
-                margin-top: 15px;
-                padding-top: 15px;
-                border-top: 1px solid #e2e8f0;
-            }}
-            .urgent-notice {{
-                background-color: #fef3c7;
-                border: 1px solid #f59e0b;
-                border-radius: 6px;
-                padding: 15px;
-                margin: 20px 0;
-                color: #92400e;
-            }}
-            .urgent-notice strong {{
-                color: #d97706;
-            }}
-            @media (max-width: 600px) {{
-                body {{
-                    padding: 10px;
-                }}
-                .email-container {{
-                    padding: 20px;
-                }}
-                .data-row {{
-                    flex-direction: column;
-                    align-items: flex-start;
-                }}
-                .data-value {{
-                    text-align: left;
-                    margin-left: 0;
-                    margin-top: 5px;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="email-container">
-            <div class="header">
-                <h1>Advance Credit - New Lead</h1>
-                <div class="form-type-badge">{form_type.replace('-', ' ').title()}</div>
-            </div>
-            
-            <div class="data-section">
-                <h3 style="margin-top: 0; color: #1e3a8a;">Lead Information</h3>
-    """
-    
-    # Add data rows
-    for key, value in data.items():
-        if value and key not in ['source', 'form_type']:
-            label = key.replace('_', ' ').title()
-            html_template += f"""
-                <div class="data-row">
-                    <div class="data-label">{label}:</div>
-                    <div class="data-value">{value}</div>
-                </div>
-            """
-    
-    # Add source information
-    if 'source' in data:
-        html_template += f"""
-                <div class="data-row">
-                    <div class="data-label">Source:</div>
-                    <div class="data-value">{data['source'].title()}</div>
-                </div>
-        """
-    
-    html_template += """
-            </div>
-            
-            <div class="urgent-notice">
-                <strong>⚠️ Action Required:</strong> This is a new lead that requires immediate attention. Please contact the customer within 30 minutes as promised on the website.
-            </div>
-            
-            <div class="footer">
-                <p><strong>Advance Credit Financial Advisory</strong></p>
-                <div class="company-info">
-                    <p>📧 support@advancecfa.com | 📞 24/7 Support</p>
-                    <p>Transform your financial future with expert debt consolidation</p>
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return html_template
+    return render_lead_notification(subject, data, form_type)[1]
 
 def send_html_email(subject, data, form_type):
-    """Send nicely formatted HTML email"""
+    """Queue a nicely formatted HTML email"""
     try:
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = EMAIL_CONFIG['from_email']
-        msg["To"] = EMAIL_CONFIG['to_email']
-        
-        # Create HTML content
-        html_content = create_html_email_template(subject, data, form_type)
+        # Plain text and HTML versions from one render
+        plain_text, html_content = render_lead_notification(subject, data, form_type)
         
-        # Create plain text version
-        plain_text = f"""
-{subject}
-
-Lead Information:
-"""
-        for key, value in data.items():
-            if value and key not in ['source', 'form_type']:
-                label = key.replace('_', ' ').title()
-                plain_text += f"{label}: {value}\n"
-        
-        plain_text += f"""
-Source: {data.get('source', 'Unknown')}
-Form Type: {form_type}
-
-⚠️ Action Required: This is a new lead that requires immediate attention. Please contact the customer within 30 minutes as promised on the website.
-
----
-Advance Credit Financial Advisory
-support@advancecfa.com
-Transform your financial future with expert debt consolidation
-"""
-        
-        # Set the plain text as the main content
-        msg.set_content(plain_text)
-        
-        # Add HTML as alternative
-        msg.add_alternative(html_content, subtype='html')
-        
-        # Send email
-        if EMAIL_CONFIG['use_tls']:
-            smtp = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-            smtp.starttls()
-        else:
-            smtp = smtplib.SMTP_SSL(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-        
-        # Login
-        smtp.login(EMAIL_CONFIG['smtp_username'], EMAIL_CONFIG['smtp_password'])
-        
-        smtp.send_message(msg)
-        smtp.quit()
-        print(f"✅ HTML Email sent: {subject}")
+        # Plain text is the main content, HTML the alternative
+        email_id = enqueue_email(subject, plain_text, html_content)
+        print(f"📧 HTML email #{email_id} queued: {subject}")
         return True, None
     except Exception as e:
-        print(f"Email send failed: {e}")
+        print(f"Failed to queue email: {e}")
         return False, str(e)
 
 def send_email(subject, body, to_email=None):
-    """Send email using configured SMTP settings"""
+    """Queue an email for delivery with the configured SMTP settings"""
     try:
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = EMAIL_CONFIG['from_email']
-        msg["To"] = to_email or EMAIL_CONFIG['to_email']
-        msg.set_content(body)
-        
-        # For localhost testing, if no SMTP server is available, simulate email sending
-        if EMAIL_CONFIG['smtp_server'] == 'localhost':
-            try:
-                # Try to connect to local SMTP server
-                smtp = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-                smtp.send_message(msg)
-                smtp.quit()
-                print(f"✅ Email sent via localhost SMTP: {subject}")
-                return True, None
-            except ConnectionRefusedError:
-                # If no local SMTP server, simulate email sending for testing
-                print(f"📧 [MOCK] Email would be sent: {subject}")
-                print(f"📧 [MOCK] From: {EMAIL_CONFIG['from_email']}")
-                print(f"📧 [MOCK] To: {to_email or EMAIL_CONFIG['to_email']}")
-                print(f"📧 [MOCK] Body: {body[:200]}...")
-                print("📧 [MOCK] Note: No local SMTP server found. This is a simulation for testing.")
-                return True, None
-        elif EMAIL_CONFIG['use_tls']:
-            smtp = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-            smtp.starttls()
-        else:
-            smtp = smtplib.SMTP_SSL(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-        
-        # Login if credentials are provided (skip for localhost)
-        if EMAIL_CONFIG['smtp_username'] and EMAIL_CONFIG['smtp_password'] and EMAIL_CONFIG['smtp_server'] != 'localhost':
-            smtp.login(EMAIL_CONFIG['smtp_username'], EMAIL_CONFIG['smtp_password'])
-        
-        smtp.send_message(msg)
-        smtp.quit()
+        email_id = enqueue_email(subject, body, to_email=to_email)
+        print(f"📧 Email #{email_id} queued: {subject}")
         return True, None
     except Exception as e:
-        print(f"Email send failed: {e}")
+        print(f"Failed to queue email: {e}")
         return False, str(e)
 
+# Lead notification emails
+#
+# Off unless LEAD_EMAIL_NOTIFICATIONS=true: the default SMTP settings are
+# placeholders, and with them every lead would only add a failing outbox row.
+LEAD_EMAIL_NOTIFICATIONS = os.getenv("LEAD_EMAIL_NOTIFICATIONS", "false").lower() == "true"
+
+async def notify_new_lead(subject, data, form_type):
+    """Queue the support team's new-lead email; the outbox sends it in the background"""
+    if LEAD_EMAIL_NOTIFICATIONS:
+        await anyio.to_thread.run_sync(send_html_email, subject, data, form_type, limiter=_get_intake_limiter())
+
 # Dummy loan products
 dummy_products = [
     {"name": "Personal Loan", "type": "Personal Loan", "description": "Quick personal loans with minimal documentation.", "interest": "10.5% p.a.", "features": ["Minimal documentation", "Quick approval", "Flexible tenure"]},
@@ -763,116 +512,6 @@ dummy_products = [
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")  # Use environment variable
 FAQS_PATH = Path("app/faqs.json")
 
-STATIC_DATA_PATH = Path(__file__).parent / "static_data"
-
-# Custom fallback features for each partner and loan type
-PARTNER_LOAN_FEATURES = {
-    ("Axis Bank", "Personal Loan"): [
-        "Quick personal loans with minimal Axis Bank paperwork",
-        "Attractive rates and fast disbursal from Axis Bank"
-    ],
-    ("Axis Bank", "Home Loan"): [
-        "Axis Bank home loans for your dream house",
-        "Flexible tenure and doorstep service"
-    ],
-    ("Axis Bank", "Car Loan"): [
-        "Finance your new car with Axis Bank",
-        "Up to 100% on-road funding, quick approval"
-    ],
-    ("Axis Bank", "Business Loan"): [
-        "Grow your business with Axis Bank's collateral-free loans",
-        "Flexible repayment and high loan amounts"
-    ],
-    ("Axis Bank", "Loan Against Property"): [
-        "Unlock property value with Axis Bank",
-        "Competitive rates and easy processing"
-    ],
-    ("ICICI Bank", "Personal Loan"): [
-        "ICICI Bank personal loans for all your needs",
-        "Minimal documentation, fast approval"
-    ],
-    ("ICICI Bank", "Home Loan"): [
-        "ICICI Bank home loans at attractive rates",
-        "Flexible tenure and balance transfer facility"
-    ],
-    ("ICICI Bank", "Car Loan"): [
-        "Drive home your dream car with ICICI Bank",
-        "Quick disbursal and up to 100% funding"
-    ],
-    ("ICICI Bank", "Business Loan"): [
-        "Expand your business with ICICI Bank loans",
-        "Collateral-free, flexible repayment options"
-    ],
-    ("ICICI Bank", "Loan Against Property"): [
-        "Leverage your property with ICICI Bank",
-        "Attractive rates and fast processing"
-    ],
-    ("Tata Capital", "Personal Loan"): [
-        "Tata Capital personal loans for every occasion",
-        "Quick approval and flexible tenure"
-    ],
-    ("Tata Capital", "Home Loan"): [
-        "Affordable Tata Capital home loans",
-        "Easy balance transfer and top-up options"
-    ],
-    ("Tata Capital", "Business Loan"): [
-        "Empower your business with Tata Capital",
-        "Simple process, competitive rates"
-    ],
-    ("Tata Capital", "Vehicle Loan"): [
-        "Finance your vehicle with Tata Capital",
-        "Attractive rates and fast approval"
-    ],
-    ("Tata Capital", "Loan Against Property"): [
-        "Unlock funds with Tata Capital property loans",
-        "Flexible tenure and quick disbursal"
-    ],
-    ("Tata Capital", "Education Loan"): [
-        "Tata Capital education loans for your future",
-        "Flexible repayment after course completion"
-    ],
-    ("Tata Capital", "Credit Cards"): [
-        "Tata Capital credit cards for every lifestyle",
-        "Exciting rewards and offers"
-    ],
-    ("Tata Capital", "Microfinance"): [
-        "Microfinance solutions by Tata Capital",
-        "Empowering small businesses and individuals"
-    ],
-    ("Tata Capital", "Rural Individual Loan"): [
-        "Loans for rural individuals by Tata Capital",
-        "Simple process and quick approval"
-    ],
-    ("Tata Capital", "Loan Against Securities"): [
-        "Leverage your investments with Tata Capital",
-        "Instant funds and flexible tenure"
-    ],
-    ("HDFC Bank", "Personal Loan"): [
-        "HDFC Bank personal loans with quick approval",
-        "Minimal documentation and flexible tenure"
-    ],
-    ("HDFC Bank", "Home Loan"): [
-        "HDFC Bank home loans at attractive rates",
-        "Long tenure and easy balance transfer"
-    ],
-    ("Yes Bank", "Personal Loan"): [
-        "Yes Bank personal loans for your needs",
-        "Quick disbursal and flexible repayment"
-    ],
-    ("Yes Bank", "Home Loan"): [
-        "Yes Bank home loans with attractive rates",
-        "Easy documentation and fast approval"
-    ],
-    ("Bajaj Finserv", "Personal Loan"): [
-        "Bajaj Finserv instant personal loans",
-        "Minimal paperwork and fast approval"
-    ],
-    ("Bajaj Finserv", "Home Loan"): [
-        "Bajaj Finserv home loans at low rates",
-        "Flexible repayment and quick processing"
-    ],
-}
-
 def load_faqs():
     if FAQS_PATH.exists():
         with open(FAQS_PATH, "r", encoding="utf-8") as f:
@@ -883,69 +522,6 @@ def save_faqs(faqs):
     with open(FAQS_PATH, "w", encoding="utf-8") as f:
         json.dump(faqs, f, indent=2, ensure_ascii=False)
 
-# Partner loan caching removed - using static data instead
-
-def ensure_loan_features(loans, partner_name=None):
-    for loan in loans:
-        # Use partner-specific fallback if features are missing or too short
-        if not loan.get("features") or len(loan["features"]) < 2:
-            key = (partner_name, loan["name"])
-            default = PARTNER_LOAN_FEATURES.get(key)
-            if default:
-                loan["features"] = default
-            else:
-                loan["features"] = ["Flexible terms and fast approval", "Trusted by thousands of customers"]
-    return loans
-
-# Helper functions to load partner loan data from static files
-def load_axis_loans():
-    try:
-        with open(STATIC_DATA_PATH / "axis_loans.json", "r", encoding="utf-8") as f:
-            loans = json.load(f)
-            return ensure_loan_features(loans, partner_name="Axis Bank")
-    except Exception:
-        return []
-
-def load_icici_loans():
-    try:
-        with open(STATIC_DATA_PATH / "icici_loans.json", "r", encoding="utf-8") as f:
-            loans = json.load(f)
-            return ensure_loan_features(loans, partner_name="ICICI Bank")
-    except Exception:
-        return []
-
-def load_tata_loans():
-    try:
-        with open(STATIC_DATA_PATH / "tata_loans.json", "r", encoding="utf-8") as f:
-            loans = json.load(f)
-            return ensure_loan_features(loans, partner_name="Tata Capital")
-    except Exception:
-        return []
-
-def load_hdfc_loans():
-    try:
-        with open(STATIC_DATA_PATH / "hdfc_loans.json", "r", encoding="utf-8") as f:
-            loans = json.load(f)
-            return ensure_loan_features(loans, partner_name="HDFC Bank")
-    except Exception:
-        return []
-
-def load_yesbank_loans():
-    try:
-        with open(STATIC_DATA_PATH / "yesbank_loans.json", "r", encoding="utf-8") as f:
-            loans = json.load(f)
-            return ensure_loan_features(loans, partner_name="Yes Bank")
-    except Exception:
-        return []
-
-def load_bajajfinserv_loans():
-    try:
-        with open(STATIC_DATA_PATH / "bajajfinserv_loans.json", "r", encoding="utf-8") as f:
-            loans = json.load(f)
-            return ensure_loan_features(loans, partner_name="Bajaj Finserv")
-    except Exception:
-        return []
-
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Render monitoring"""
@@ -957,6 +533,26 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/health/db-pool")
+async def db_pool_health():
+    """Connection pool statistics for this worker, used to size the Postgres budget"""
+    return pool_stats()
+
+@app.get("/health/lead-spool")
+async def lead_spool_health():
+    """Form submissions waiting in this host's spool for the CRM database"""
+    return spool_stats()
+
+@app.get("/health/email-outbox")
+def email_outbox_health():
+    """Queued, sent and failed emails in the outbox"""
+    return outbox_stats()
+
+@app.get("/health/page-cache")
+def page_cache_health():
+    """Entries, hit rate and invalidations of the full-page cache"""
+    return page_cache_stats()
+
 @app.get("/")
 async def home(request: Request, db: Session = Depends(get_db)):
     # Fetch recent blog posts
@@ -978,23 +574,18 @@ async def crm_redirect():
 
 @app.get("/products", response_class=HTMLResponse)
 def products(request: Request, db: Session = Depends(get_db)):
-    partners = db.query(Partner).all()
-    partners_data = []
-    for partner in partners:
-        loans = db.query(Product).filter_by(partner_id=partner.id).all()
-        partners_data.append({
-            'name': partner.name,
-            'logo': partner.logo_url,
-            'url': partner.url,
-            'loans': [
-                {
-                    'name': loan.name,
-                    'interest': loan.interest,
-                    'features': loan.features,
-                } for loan in loans
-            ]
-        })
-    return templates.TemplateResponse("products.html", {"request": request, "partners": partners_data})
+    # One joined query per rebuild of the per-worker view-model, none in between
+    view = get_products_catalog().get(db)
+    return templates.TemplateResponse("products.html", {"request": request, "partners": view.partners})
+
+@app.get("/api/products")
+def products_api(request: Request, db: Session = Depends(get_db)):
+    """Partners and their products, as on /products"""
+    view = get_products_catalog().get(db)
+    headers = {"ETag": view.etag, "Cache-Control": "public, max-age=60"}
+    if etag_matches(request.headers.get("if-none-match"), view.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=view.body, media_type="application/json", headers=headers)
 
 @app.get("/emi", response_class=HTMLResponse)
 def emi_get(request: Request):
@@ -1006,22 +597,10 @@ async def emi_post(request: Request,
              tenure: int = Form(...), 
              interest_rate: float = Form(...),
              tenure_unit: str = Form("years")):
-    # EMI calculation
-    monthly_rate = interest_rate / (12 * 100)
-    
-    # Convert tenure to months based on unit
-    if tenure_unit.lower() == "years":
-        total_months = tenure * 12
-    else:
-        total_months = tenure
-    
-    if monthly_rate == 0:
-        emi = loan_amount / total_months
-    else:
-        emi = loan_amount * (monthly_rate * (1 + monthly_rate)**total_months) / ((1 + monthly_rate)**total_months - 1)
-    
-    total_payment = emi * total_months
-    total_interest = total_payment - loan_amount
+    # EMI calculation (shared with the /api/emi endpoints)
+    total_months = tenure_in_months(tenure, tenure_unit)
+    figures = emi_summary(loan_amount, interest_rate, total_months)
+    emi, total_payment, total_interest = figures["emi"], figures["total_payment"], figures["total_interest"]
     
     # No database interaction for EMI calculator
     result = {
@@ -1035,74 +614,87 @@ async def emi_post(request: Request,
     
     return templates.TemplateResponse("emi.html", {"request": request, "result": result})
 
+# EMI API
+
+def _emi_months(tenure: int, tenure_unit: str) -> int:
+    total_months = tenure_in_months(tenure, tenure_unit)
+    if not 1 <= total_months <= MAX_TENURE_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Tenure must be between 1 and {MAX_TENURE_MONTHS} months")
+    return total_months
+
+@app.get("/api/emi/schedule")
+def emi_schedule(
+    loan_amount: float = Query(..., gt=0),
+    interest_rate: float = Query(..., ge=0, le=MAX_INTEREST_RATE),
+    tenure: int = Query(...),
+    tenure_unit: str = Query("years")
+):
+    """Month-by-month amortization schedule for one loan"""
+    total_months = _emi_months(tenure, tenure_unit)
+    figures = emi_summary(loan_amount, interest_rate, total_months)
+    schedule = amortization_schedule(loan_amount, interest_rate, total_months)
+    return Response(content=json_bytes({
+        "loan_amount": loan_amount,
+        "interest_rate": interest_rate,
+        "tenure_months": total_months,
+        **{key: round(value, 2) for key, value in figures.items()},
+        "schedule": schedule_rows(schedule)
+    }), media_type="application/json")
+
+def _emi_batch_body(scenarios) -> bytes:
+    """Parse, evaluate and serialize a batch; CPU-bound, so it runs off the event loop"""
+    amounts, rates, months = parse_scenarios(scenarios)
+    result = evaluate_scenarios(amounts, rates, months)
+    columns = [amounts.tolist(), rates.tolist(), months.astype(int).tolist()] + \
+              [(np.round(result[key], 2) + 0.0).tolist() for key in ("emi", "total_payment", "total_interest")]
+    keys = ("loan_amount", "interest_rate", "tenure_months", "emi", "total_payment", "total_interest")
+    return json_bytes({
+        "count": len(amounts),
+        "results": [dict(zip(keys, row)) for row in zip(*columns)]
+    })
+
+@app.post("/api/emi/batch")
+async def emi_batch(request: Request):
+    """EMI, total payment and total interest for many scenarios in one call
+
+    Body: {"scenarios": [{"loan_amount": 500000, "interest_rate": 10.5, "tenure": 36,
+                          "tenure_unit": "months"}, ...]}  (tenure_unit defaults to months)
+    """
+    try:
+        body = await request.json()
+        content = await anyio.to_thread.run_sync(
+            _emi_batch_body, body.get("scenarios") if isinstance(body, dict) else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e) if str(e) else "Invalid JSON body")
+    return Response(content=content, media_type="application/json")
+
+@app.get("/api/emi/compare")
+def emi_compare(
+    loan_amount: float = Query(..., gt=0),
+    tenure: int = Query(...),
+    tenure_unit: str = Query("years"),
+    loan_type: str = Query(None)
+):
+    """EMI of one loan across every partner and bank product with a known rate, cheapest first"""
+    total_months = _emi_months(tenure, tenure_unit)
+    offers = compare_offers(get_loan_index().snapshot().all.offers, loan_amount, total_months, loan_type)
+    return Response(content=json_bytes({
+        "loan_amount": loan_amount,
+        "tenure_months": total_months,
+        "loan_type": loan_type,
+        "count": len(offers),
+        "offers": offers
+    }), media_type="application/json")
+
 @app.get("/partners", response_class=HTMLResponse)
 def partners(request: Request, db: Session = Depends(get_db)):
-    partners = [
-        {
-            'name': 'Axis Bank',
-            'logo': '/static/partners/Axis_Bank_logo.png',
-            'url': 'https://www.axisbank.com/',
-            'type': 'Bank',
-            'tagline': "India's Leading Private Bank",
-            'description': "Axis Bank is one of India's largest private sector banks, offering a wide range of financial products and services to individuals and businesses.",
-            'loans': load_axis_loans()
-        },
-        {
-            'name': 'ICICI Bank',
-            'logo': '/static/partners/ICICI_Bank_Logo.png',
-            'url': 'https://www.icicibank.com/',
-            'type': 'Bank',
-            'tagline': "Trusted Financial Partner",
-            'description': "ICICI Bank is a leading private sector bank in India, known for its innovative products and customer-centric approach.",
-            'loans': load_icici_loans()
-        },
-        {
-            'name': 'Tata Capital',
-            'logo': '/static/partners/tata_capital_logo.png',
-            'url': 'https://www.tatacapital.com/',
-            'type': 'NBFC',
-            'tagline': "Empowering Your Dreams",
-            'description': "Tata Capital is a leading non-banking financial company (NBFC) in India, providing a variety of loan and investment solutions.",
-            'loans': load_tata_loans()
-        },
-        {
-            'name': 'HDFC Bank',
-            'logo': '/static/partners/HDFC-Bank-logo.png',
-            'url': 'https://www.hdfcbank.com/personal/borrow/popular-loans',
-            'type': 'Bank',
-            'tagline': "India's Most Valuable Bank",
-            'description': "HDFC Bank is India's largest private sector lender by assets, offering a full suite of financial products and services.",
-            'loans': load_hdfc_loans()
-        },
-        {
-            'name': 'Yes Bank',
-            'logo': '/static/partners/Yes_Bank.png',
-            'url': 'https://www.yesbank.in/yes-bank-loans',
-            'type': 'Bank',
-            'tagline': "Progressive Banking",
-            'description': "Yes Bank is a high-quality, customer-centric, and service-driven bank in India, offering a wide range of banking and financial products.",
-            'loans': load_yesbank_loans()
-        },
-        {
-            'name': 'Bajaj Finserv',
-            'logo': '/static/partners/Bajaj-Finance-logo.png',
-            'url': 'https://www.bajajfinserv.in/loans',
-            'type': 'NBFC',
-            'tagline': "Innovative Lending Solutions",
-            'description': "Bajaj Finserv is a leading NBFC in India, providing a wide range of financial products including loans, insurance, and investments.",
-            'loans': load_bajajfinserv_loans()
-        }
-    ]
-    # Compute unique product names for filters
-    all_products = set()
-    for partner in partners:
-        for loan in partner['loans']:
-            all_products.add(loan['name'])
-    all_products = sorted(all_products)
+    # Partner loans come from the per-worker catalog, not the JSON files
+    catalog = get_partner_catalog().snapshot()
     faqs = db.query(FAQ).filter_by(location="partners").order_by(FAQ.id).all()
     return templates.TemplateResponse(
         "partners.html",
-        {"request": request, "partners": partners, "faqs": faqs, "all_products": all_products}
+        {"request": request, "partners": catalog.partners, "faqs": faqs, "all_products": catalog.all_products}
     )
 
 @app.get("/services", response_class=HTMLResponse)
@@ -1163,9 +755,14 @@ async def contact(
     if len(query.strip()) < 10:
         raise HTTPException(status_code=400, detail="Message must be at least 10 characters")
     
-    # Save directly to CRM database (no file logging)
+    # Hand the lead to the CRM through the intake spool (no file logging)
     message = f"Query: {query}\nSource: {source}\nTerms Accepted: Yes"
-    save_lead_to_crm(name, contact, email, message, source)
+    await intake_lead(name, contact, email, message, source)
+    await notify_new_lead(
+        f"New Contact Form Submission - {name}",
+        {'name': name, 'contact': contact, 'email': email, 'query': query, 'source': source},
+        "contact"
+    )
     
     # Return success message with nice styling
     success_html = """
@@ -1265,9 +862,15 @@ async def apply_loan(
     loan_type: str = Form(None),
     source: str = Form('apply')
 ):
-    # Save directly to CRM database (no file logging)
+    # Hand the lead to the CRM through the intake spool (no file logging)
     message = f"Occupation: {occupation}\nLoan Amount: ₹{amount}\nLoan Type: {loan_type or 'Personal Loan'}\nPartner: {partner or 'Not specified'}\nSource: {source}"
-    save_lead_to_crm(name, contact, email, message, source)
+    await intake_lead(name, contact, email, message, source)
+    await notify_new_lead(
+        f"New Loan Application - {name}",
+        {'name': name, 'email': email, 'contact': contact, 'occupation': occupation, 'amount': amount,
+         'loan_type': loan_type, 'partner': partner, 'source': source},
+        "apply-loan"
+    )
     
     # Return success message with nice styling
     success_html = """
@@ -1363,9 +966,14 @@ async def debt_consultation(
     email: str = Form(None),
     total_emi: str = Form(None)
 ):
-    # Save directly to CRM database (no file logging)
+    # Hand the lead to the CRM through the intake spool (no file logging)
     message = f"Total EMI: ₹{total_emi or 'Not specified'}\nSource: debt-consultation"
-    save_lead_to_crm(name, phone, email, message, "debt-consultation")
+    await intake_lead(name, phone, email, message, "debt-consultation")
+    await notify_new_lead(
+        f"New Debt Consultation Request - {name}",
+        {'name': name, 'phone': phone, 'email': email, 'total_emi': total_emi, 'source': 'debt-consultation'},
+        "debt-consultation"
+    )
     
     # Return success message with nice styling
     success_html = """
@@ -1454,8 +1062,54 @@ async def debt_consultation(
     """
     return HTMLResponse(content=success_html)
 
+# Consolidation loan tenure the /debt-calculator quick estimate assumes
+DEBT_CALCULATOR_TENURE_MONTHS = 60
+
+def _consolidation_body(body) -> bytes:
+    """Validate a simulate request, read the loan index and run the simulation; runs off the event loop"""
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object")
+    balances, rates, months = parse_loans(body.get("loans"))
+    tenure_months = int(body.get("tenure_months", 60))
+    fee_percent = float(body.get("processing_fee_percent") or 0)
+    custom_rate = body.get("interest_rate")
+    limit = int(body.get("limit", 20))
+    if not 1 <= tenure_months <= MAX_TENURE_MONTHS:
+        raise ValueError(f"tenure_months must be between 1 and {MAX_TENURE_MONTHS}")
+    if not 0 <= fee_percent <= 10:
+        raise ValueError("processing_fee_percent must be between 0 and 10")
+    # A cold or expired index reads bank_loans and stats the partner files
+    candidates = get_loan_index().snapshot().all.offers
+    loan_type = (body.get("loan_type") or "").strip().casefold()
+    if loan_type:
+        candidates = [offer for offer in candidates if (offer['loan_type'] or "").strip().casefold() == loan_type]
+    if custom_rate is not None:
+        custom_rate = float(custom_rate)
+        if not 0 <= custom_rate <= MAX_INTEREST_RATE:
+            raise ValueError(f"interest_rate must be between 0 and {MAX_INTEREST_RATE}")
+        candidates = candidates + [{"name": "Custom rate", "interest_rate": custom_rate}]
+    result = simulate_consolidation(balances, rates, months, candidates, tenure_months, fee_percent)
+    result["options"] = result["options"][:max(limit, 1)]
+    return json_bytes(result)
+
+@app.post("/api/consolidation/simulate")
+async def consolidation_simulate(request: Request):
+    """Consolidated EMI, interest saved and break-even month for every candidate product
+
+    Body: {"loans": [{"balance": 250000, "interest_rate": 18, "remaining_months": 30}, ...],
+           "tenure_months": 60, "loan_type": "Personal Loan", "processing_fee_percent": 1.5,
+           "interest_rate": 11.5, "limit": 10}
+    loan_type filters the partner products; interest_rate adds a custom-rate option.
+    """
+    try:
+        body = await request.json()
+        content = await anyio.to_thread.run_sync(_consolidation_body, body)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e) or "Invalid JSON body")
+    return Response(content=content, media_type="application/json")
+
 @app.post("/debt-calculator")
-async def debt_calculator(
+def debt_calculator(
     name: str = Form(None),
     contact: str = Form(None),
     email: str = Form(None),
@@ -1463,6 +1117,7 @@ async def debt_calculator(
     loan_count: str = Form(None),
     interest_rate: str = Form(None),
     credit_score: str = Form(None),
+    total_loan_amount: str = Form(None),
     source: str = Form("debt-calculator")
 ):
     # Only log to file if name and contact are provided (no CRM integration for calculators)
@@ -1488,34 +1143,31 @@ async def debt_calculator(
         print(f"📧 [MOCK] Body: {email_data}")
         print("📧 [MOCK] Note: No local SMTP server found. This is a simulation for testing.")
     
-    # Calculate approximate savings
-    if current_emi and loan_count and interest_rate:
+    # Savings from consolidating the outstanding debt into the best partner offer
+    if total_loan_amount and current_emi and interest_rate:
         try:
-            current_emi_val = float(current_emi)
-            loan_count_val = int(loan_count)
-            interest_rate_val = float(interest_rate)
-            
-            # Simple calculation for demonstration
-            # In reality, this would be more complex based on credit score and other factors
-            if credit_score == "excellent":
-                new_rate = interest_rate_val * 0.7  # 30% reduction
-            elif credit_score == "good":
-                new_rate = interest_rate_val * 0.8  # 20% reduction
-            elif credit_score == "fair":
-                new_rate = interest_rate_val * 0.9  # 10% reduction
-            else:
-                new_rate = interest_rate_val * 0.95  # 5% reduction
-            
-            monthly_savings = current_emi_val * (interest_rate_val - new_rate) / 100
-            annual_savings = monthly_savings * 12
-            
-            return JSONResponse({
-                "success": True,
-                "monthly_savings": round(monthly_savings, 2),
-                "annual_savings": round(annual_savings, 2),
-                "new_emi": round(current_emi_val - monthly_savings, 2)
-            })
-        except:
+            balance = float(total_loan_amount)
+            rate = float(interest_rate)
+            months_left = None
+            if 0 < balance < float("inf") and 0 <= rate <= MAX_INTEREST_RATE:
+                months_left = remaining_months(balance, rate, float(current_emi))
+            if months_left and months_left <= MAX_TENURE_MONTHS:
+                result = simulate_consolidation(
+                    [balance], [rate], [months_left], get_loan_index().snapshot().all.offers,
+                    DEBT_CALCULATOR_TENURE_MONTHS
+                )
+                if result["options"]:
+                    best = result["options"][0]
+                    return JSONResponse({
+                        "success": True,
+                        "monthly_savings": best["monthly_savings"],
+                        "annual_savings": round(best["monthly_savings"] * 12, 2),
+                        "new_emi": best["emi"],
+                        "interest_saved": best["interest_saved"],
+                        "break_even_month": best["break_even_month"],
+                        "best_offer": {key: best[key] for key in ("partner", "name", "interest_rate")}
+                    })
+        except ValueError:
             pass
     
     return JSONResponse({"success": True, "message": "Assessment submitted successfully"})
@@ -1551,22 +1203,36 @@ def robots():
 
 
 
+@app.get('/api/loans')
+def get_loans(
+    request: Request,
+    loan_type: str = Query(None),
+    partner: str = Query(None),
+    min_rate: float = Query(None, ge=0),
+    max_rate: float = Query(None, ge=0),
+    sort: str = Query("rate"),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    """Partner and bank loan offers filtered by type, partner and interest rate"""
+    if sort not in LOAN_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(LOAN_SORTS)}")
+    etag, body = get_loan_index().query(loan_type, partner, min_rate, max_rate, sort, limit, offset)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get('/api/bank-loans')
-def get_bank_loans():
-    db = SessionLocal()
-    loans = db.query(BankLoan).all()
-    result = []
-    for loan in loans:
-        result.append({
-            'bank_name': loan.bank_name,
-            'loan_type': loan.loan_type,
-            'interest_rate': loan.interest_rate,
-            'features': json.loads(loan.features) if loan.features else [],
-            'url': loan.url,
-            'last_updated': loan.last_updated.isoformat() if loan.last_updated else None
-        })
-    db.close()
-    return JSONResponse(result)
+def get_bank_loans(request: Request, db: Session = Depends(get_db)):
+    """All bank loans; served from the per-worker payload cache with ETag / Last-Modified"""
+    payload = get_bank_loans_cache().get(db)
+    headers = {"ETag": payload.etag, "Cache-Control": "public, max-age=60"}
+    if payload.last_modified:
+        headers["Last-Modified"] = payload.last_modified
+    if payload.not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
 
 
 
@@ -47,5 +47,21 @@ class BankLoan(Base):
     interest_rate = Column(Float)
     features = Column(Text)  # JSON string
     url = Column(String(500))
-    last_updated = Column(DateTime(timezone=True), server_default=func.now())
+    last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String(500), nullable=False)
+    subject = Column(String(500), nullable=False)
+    text_body = Column(Text, nullable=False)
+    html_body = Column(Text)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, index=True)  # Also the lease of a claimed message
+    claim_token = Column(String(36))
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime)
@@ -0,0 +1,301 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Full-page cache for anonymous marketing pages
+#
+# The public pages render the same HTML for every visitor without a session,
+# so PageCacheMiddleware keeps one rendered copy per (path, allowlisted query
+# parameters) and answers repeat hits without running the route, the template
+# or any query. Each entry holds the body and a gzip copy compressed once at
+# store time, with strong ETags for both, so a hit is a dict lookup plus a
+# send and a revalidation (If-None-Match) is a 304 with no body at all.
+#
+# Entries expire after PAGE_CACHE_TTL_SECONDS and are dropped as soon as a
+# session in this worker commits a change to a table the page is built from
+# (PAGE_DEPENDENCIES) - e.g. publishing a BlogPost drops "/", editing a
+# Partner drops "/products". Other workers pick the change up within the TTL.
+# Code that changes those tables without the ORM (bulk UPDATEs, raw SQL)
+# calls invalidate_pages() itself. Other per-worker caches built from these
+# tables subscribe to the same commit hook with on_table_commit(). Requests carrying a session cookie or an
+# Authorization header, and responses that are not a plain 200 or that set a
+# cookie, always bypass the cache.
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+PAGE_CACHE_TTL_SECONDS = float(os.getenv("PAGE_CACHE_TTL_SECONDS", "60"))
+PAGE_CACHE_MAX_ENTRIES = 256
+# Browsers and CDNs may store the page but must revalidate; the ETag makes that a 304
+PAGE_CACHE_CONTROL = os.getenv("PAGE_CACHE_CONTROL", "public, no-cache")
+
+# Cached paths and the query parameters that select a different page; any
+# other parameter (utm_*, fbclid, ...) is ignored and shares the entry
+CACHED_PAGES: Dict[str, Tuple[str, ...]] = {
+    "/": (),
+    "/services": (),
+    "/about": (),
+    "/debt-consolidation": (),
+    "/personal-loan": (),
+    "/multiple-emi-consolidation": (),
+    "/products": (),
+    "/partners": (),
+}
+
+# Table -> cached paths rendered from it
+PAGE_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "blog_posts": ("/",),
+    "partners": ("/products",),
+    "products": ("/products",),
+    "faqs": ("/partners",),
+}
+
+SESSION_COOKIE = "session"
+GZIP_MIN_BYTES = 512
+
+
+def etag_matches(if_none_match: Optional[str], *etags: str) -> bool:
+    """If-None-Match against our ETags: a comma-separated list of tags or '*', compared weakly (W/ ignored)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") in etags for tag in tags)
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    status: int
+    headers: Tuple[Tuple[bytes, bytes], ...]
+    body: bytes
+    gzip_body: Optional[bytes]
+    etag: str
+    expires_at: float
+
+    def matches(self, if_none_match: str) -> bool:
+        # Either representation's tag validates the page
+        return etag_matches(if_none_match, self.etag, self.gzip_etag)
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.etag[:-1] + '-gz"'
+
+
+class PageCache:
+    """Per-worker store of rendered pages"""
+
+    def __init__(self, ttl: float = None, max_entries: int = PAGE_CACHE_MAX_ENTRIES):
+        self.ttl = PAGE_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self._pages: "OrderedDict[tuple, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[CachedPage]:
+        page = self._pages.get(key)
+        if page is None or time.monotonic() >= page.expires_at:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return page
+
+    def store(self, key: tuple, status: int, headers, body: bytes, generation: int) -> Optional[CachedPage]:
+        """Cache a rendered page unless an invalidation happened while it was rendering"""
+        etag = '"' + hashlib.sha1(body).hexdigest()[:32] + '"'
+        gzip_body = gzip.compress(body, compresslevel=9, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+        page = CachedPage(status, tuple(headers), body, gzip_body, etag, time.monotonic() + self.ttl)
+        with self._lock:
+            if generation != self.generation:
+                return page
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            if len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+            self.stores += 1
+        return page
+
+    def invalidate(self, paths: Iterable[str] = None):
+        """Drop the cached copies of these paths, or of every page"""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            if paths is None:
+                self._pages.clear()
+                return
+            paths = set(paths)
+            for key in [key for key in self._pages if key[0] in paths]:
+                del self._pages[key]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": PAGE_CACHE_ENABLED,
+            "ttl_seconds": self.ttl,
+            "entries": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "bytes": sum(len(page.body) + len(page.gzip_body or b"") for page in list(self._pages.values()))
+        }
+
+
+_cache = PageCache()
+
+
+def get_page_cache() -> PageCache:
+    return _cache
+
+
+def invalidate_pages(*paths: str):
+    """Drop cached pages; no arguments drops them all"""
+    _cache.invalidate(paths or None)
+
+
+def page_cache_stats() -> dict:
+    return _cache.stats()
+
+
+# ORM hook: remember which watched tables a session flushed, invalidate on commit
+
+_table_listeners: Dict[str, List[Callable[[], None]]] = {}
+
+
+def on_table_commit(tables: Iterable[str], callback: Callable[[], None]):
+    """Call callback after any session in this worker commits a change to one of these tables"""
+    for table in tables:
+        _table_listeners.setdefault(table, []).append(callback)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_tables(session, flush_context):
+    tables = session.info.get("page_cache_tables")
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table in PAGE_DEPENDENCIES or table in _table_listeners:
+            if tables is None:
+                tables = session.info["page_cache_tables"] = set()
+            tables.add(table)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_pages(session):
+    tables = session.info.pop("page_cache_tables", None)
+    if not tables:
+        return
+    paths = {path for table in tables for path in PAGE_DEPENDENCIES.get(table, ())}
+    if paths:
+        _cache.invalidate(paths)
+    for callback in {callback for table in tables for callback in _table_listeners.get(table, ())}:
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tables(session):
+    session.info.pop("page_cache_tables", None)
+
+
+def _cache_key(scope) -> Optional[tuple]:
+    """(path, allowed query) for a cacheable anonymous GET/HEAD, else None"""
+    if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+        return None
+    allowed = CACHED_PAGES.get(scope["path"])
+    if allowed is None:
+        return None
+    for name, value in scope["headers"]:
+        if name == b"authorization" or (name == b"cookie" and SESSION_COOKIE.encode() + b"=" in value):
+            return None
+    query = ""
+    if allowed and scope.get("query_string"):
+        query = urlencode(sorted((k, v) for k, v in parse_qsl(scope["query_string"].decode("latin-1"))
+                                 if k in allowed))
+    return scope["path"], query
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class PageCacheMiddleware:
+    """ASGI middleware serving CACHED_PAGES from the per-worker PageCache"""
+
+    def __init__(self, app, cache: PageCache = None):
+        self.app = app
+        self.cache = cache or _cache
+
+    async def __call__(self, scope, receive, send):
+        key = _cache_key(scope) if PAGE_CACHE_ENABLED else None
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        page = self.cache.get(key)
+        if page is None:
+            page = await self._render(key, scope, receive, send)
+            if page is None:
+                return
+            state = b"MISS"
+        else:
+            state = b"HIT"
+        await self._send_page(page, scope, send, state)
+
+    async def _render(self, key, scope, receive, send) -> Optional[CachedPage]:
+        """Run the route with a buffering send; pass anything uncacheable straight through"""
+        generation = self.cache.generation
+        start = None
+        chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        headers = [(name, value) for name, value in start["headers"]
+                   if name.lower() not in (b"content-length", b"etag", b"cache-control", b"vary")]
+        body = b"".join(chunks)
+        # Starlette sends the full body for HEAD too, so a HEAD render is cacheable as well
+        cacheable = start["status"] == 200 and body and not any(name.lower() == b"set-cookie" for name, _ in headers)
+        if not cacheable:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return None
+        return self.cache.store(key, start["status"], headers, body, generation)
+
+    async def _send_page(self, page: CachedPage, scope, send, state: bytes):
+        request_headers = dict(scope["headers"])
+        use_gzip = page.gzip_body is not None and _accepts_gzip(
+            request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        etag = page.gzip_etag if use_gzip else page.etag
+        headers = [
+            (b"etag", etag.encode()),
+            (b"cache-control", PAGE_CACHE_CONTROL.encode()),
+            (b"vary", b"Accept-Encoding, Cookie"),
+            (b"x-page-cache", state),
+        ]
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match and page.matches(if_none_match.decode("latin-1")):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        body = page.gzip_body if use_gzip else page.body
+        headers += page.headers
+        headers.append((b"content-length", str(len(body)).encode()))
+        if use_gzip:
+            headers.append((b"content-encoding", b"gzip"))
+        await send({"type": "http.response.start", "status": page.status, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
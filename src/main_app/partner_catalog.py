@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Partner loan catalog
+#
+# The partner pages used to re-open and re-parse one JSON file per partner on
+# every request. The catalog loads them once per worker, applies the feature
+# fallbacks and precomputes the product list, and keeps the result as an
+# immutable snapshot that requests share. Source files are stat()ed at most
+# every PARTNER_CATALOG_CHECK_SECONDS and the catalog is rebuilt only when one
+# of their mtimes changed (or a file appeared or disappeared), so in steady
+# state a request does no disk I/O at all.
+
+STATIC_DATA_PATH = Path(__file__).parent / "static_data"
+PARTNER_CATALOG_CHECK_SECONDS = float(os.getenv("PARTNER_CATALOG_CHECK_SECONDS", "5"))
+
+# Partner details shown on /partners, in display order, with their loan data file
+PARTNERS = [
+    {
+        'name': 'Axis Bank',
+        'logo': '/static/partners/Axis_Bank_logo.png',
+        'url': 'https://www.axisbank.com/',
+        'type': 'Bank',
+        'tagline': "India's Leading Private Bank",
+        'description': "Axis Bank is one of India's largest private sector banks, offering a wide range of financial products and services to individuals and businesses.",
+        'loans_file': 'axis_loans.json'
+    },
+    {
+        'name': 'ICICI Bank',
+        'logo': '/static/partners/ICICI_Bank_Logo.png',
+        'url': 'https://www.icicibank.com/',
+        'type': 'Bank',
+        'tagline': "Trusted Financial Partner",
+        'description': "ICICI Bank is a leading private sector bank in India, known for its innovative products and customer-centric approach.",
+        'loans_file': 'icici_loans.json'
+    },
+    {
+        'name': 'Tata Capital',
+        'logo': '/static/partners/tata_capital_logo.png',
+        'url': 'https://www.tatacapital.com/',
+        'type': 'NBFC',
+        'tagline': "Empowering Your Dreams",
+        'description': "Tata Capital is a leading non-banking financial company (NBFC) in India, providing a variety of loan and investment solutions.",
+        'loans_file': 'tata_loans.json'
+    },
+    {
+        'name': 'HDFC Bank',
+        'logo': '/static/partners/HDFC-Bank-logo.png',
+        'url': 'https://www.hdfcbank.com/personal/borrow/popular-loans',
+        'type': 'Bank',
+        'tagline': "India's Most Valuable Bank",
+        'description': "HDFC Bank is India's largest private sector lender by assets, offering a full suite of financial products and services.",
+        'loans_file': 'hdfc_loans.json'
+    },
+    {
+        'name': 'Yes Bank',
+        'logo': '/static/partners/Yes_Bank.png',
+        'url': 'https://www.yesbank.in/yes-bank-loans',
+        'type': 'Bank',
+        'tagline': "Progressive Banking",
+        'description': "Yes Bank is a high-quality, customer-centric, and service-driven bank in India, offering a wide range of banking and financial products.",
+        'loans_file': 'yesbank_loans.json'
+    },
+    {
+        'name': 'Bajaj Finserv',
+        'logo': '/static/partners/Bajaj-Finance-logo.png',
+        'url': 'https://www.bajajfinserv.in/loans',
+        'type': 'NBFC',
+        'tagline': "Innovative Lending Solutions",
+        'description': "Bajaj Finserv is a leading NBFC in India, providing a wide range of financial products including loans, insurance, and investments.",
+        'loans_file': 'bajajfinserv_loans.json'
+    }
+]
+
+# Custom fallback features for each partner and loan type
+PARTNER_LOAN_FEATURES = {
+    ("Axis Bank", "Personal Loan"): [
+        "Quick personal loans with minimal Axis Bank paperwork",
+        "Attractive rates and fast disbursal from Axis Bank"
+    ],
+    ("Axis Bank", "Home Loan"): [
+        "Axis Bank home loans for your dream house",
+        "Flexible tenure and doorstep service"
+    ],
+    ("Axis Bank", "Car Loan"): [
+        "Finance your new car with Axis Bank",
+        "Up to 100% on-road funding, quick approval"
+    ],
+    ("Axis Bank", "Business Loan"): [
+        "Grow your business with Axis Bank's collateral-free loans",
+        "Flexible repayment and high loan amounts"
+    ],
+    ("Axis Bank", "Loan Against Property"): [
+        "Unlock property value with Axis Bank",
+        "Competitive rates and easy processing"
+    ],
+    ("ICICI Bank", "Personal Loan"): [
+        "ICICI Bank personal loans for all your needs",
+        "Minimal documentation, fast approval"
+    ],
+    ("ICICI Bank", "Home Loan"): [
+        "ICICI Bank home loans at attractive rates",
+        "Flexible tenure and balance transfer facility"
+    ],
+    ("ICICI Bank", "Car Loan"): [
+        "Drive home your dream car with ICICI Bank",
+        "Quick disbursal and up to 100% funding"
+    ],
+    ("ICICI Bank", "Business Loan"): [
+        "Expand your business with ICICI Bank loans",
+        "Collateral-free, flexible repayment options"
+    ],
+    ("ICICI Bank", "Loan Against Property"): [
+        "Leverage your property with ICICI Bank",
+        "Attractive rates and fast processing"
+    ],
+    ("Tata Capital", "Personal Loan"): [
+        "Tata Capital personal loans for every occasion",
+        "Quick approval and flexible tenure"
+    ],
+    ("Tata Capital", "Home Loan"): [
+        "Affordable Tata Capital home loans",
+        "Easy balance transfer and top-up options"
+    ],
+    ("Tata Capital", "Business Loan"): [
+        "Empower your business with Tata Capital",
+        "Simple process, competitive rates"
+    ],
+    ("Tata Capital", "Vehicle Loan"): [
+        "Finance your vehicle with Tata Capital",
+        "Attractive rates and fast approval"
+    ],
+    ("Tata Capital", "Loan Against Property"): [
+        "Unlock funds with Tata Capital property loans",
+        "Flexible tenure and quick disbursal"
+    ],
+    ("Tata Capital", "Education Loan"): [
+        "Tata Capital education loans for your future",
+        "Flexible repayment after course completion"
+    ],
+    ("Tata Capital", "Credit Cards"): [
+        "Tata Capital credit cards for every lifestyle",
+        "Exciting rewards and offers"
+    ],
+    ("Tata Capital", "Microfinance"): [
+        "Microfinance solutions by Tata Capital",
+        "Empowering small businesses and individuals"
+    ],
+    ("Tata Capital", "Rural Individual Loan"): [
+        "Loans for rural individuals by Tata Capital",
+        "Simple process and quick approval"
+    ],
+    ("Tata Capital", "Loan Against Securities"): [
+        "Leverage your investments with Tata Capital",
+        "Instant funds and flexible tenure"
+    ],
+    ("HDFC Bank", "Personal Loan"): [
+        "HDFC Bank personal loans with quick approval",
+        "Minimal documentation and flexible tenure"
+    ],
+    ("HDFC Bank", "Home Loan"): [
+        "HDFC Bank home loans at attractive rates",
+        "Long tenure and easy balance transfer"
+    ],
+    ("Yes Bank", "Personal Loan"): [
+        "Yes Bank personal loans for your needs",
+        "Quick disbursal and flexible repayment"
+    ],
+    ("Yes Bank", "Home Loan"): [
+        "Yes Bank home loans with attractive rates",
+        "Easy documentation and fast approval"
+    ],
+    ("Bajaj Finserv", "Personal Loan"): [
+        "Bajaj Finserv instant personal loans",
+        "Minimal paperwork and fast approval"
+    ],
+    ("Bajaj Finserv", "Home Loan"): [
+        "Bajaj Finserv home loans at low rates",
+        "Flexible repayment and quick processing"
+    ],
+}
+
+
+def ensure_loan_features(loans, partner_name=None):
+    for loan in loans:
+        # Use partner-specific fallback if features are missing or too short
+        if not loan.get("features") or len(loan["features"]) < 2:
+            key = (partner_name, loan["name"])
+            default = PARTNER_LOAN_FEATURES.get(key)
+            if default:
+                loan["features"] = default
+            else:
+                loan["features"] = ["Flexible terms and fast approval", "Trusted by thousands of customers"]
+    return loans
+
+
+def load_partner_loans(path: Path, partner_name: str) -> List[Dict[str, Any]]:
+    """One partner's loans with feature fallbacks; [] if the file is missing or invalid"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return ensure_loan_features(json.load(f), partner_name=partner_name)
+    except Exception:
+        return []
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Partners with their loans and the product filter list; shared by requests, never mutated"""
+    partners: List[Dict[str, Any]]
+    all_products: List[str]
+    source_mtimes: Tuple[Optional[int], ...] = field(repr=False)
+    loaded_at: float
+
+
+class PartnerCatalog:
+    """Per-worker partner loan catalog, rebuilt when a source file changes"""
+
+    def __init__(self, data_path: Path = None, check_interval: float = None):
+        self.data_path = Path(data_path or STATIC_DATA_PATH)
+        self.check_interval = PARTNER_CATALOG_CHECK_SECONDS if check_interval is None else check_interval
+        self.loads = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _source_mtimes(self) -> Tuple[Optional[int], ...]:
+        mtimes = []
+        for partner in PARTNERS:
+            try:
+                mtimes.append(os.stat(self.data_path / partner['loans_file']).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _build(self, mtimes) -> CatalogSnapshot:
+        partners = []
+        for partner in PARTNERS:
+            info = {key: value for key, value in partner.items() if key != 'loans_file'}
+            info['loans'] = load_partner_loans(self.data_path / partner['loans_file'], partner['name'])
+            partners.append(info)
+        all_products = sorted({loan['name'] for partner in partners for loan in partner['loans']})
+        self.loads += 1
+        return CatalogSnapshot(partners=partners, all_products=all_products,
+                               source_mtimes=mtimes, loaded_at=time.time())
+
+    def snapshot(self) -> CatalogSnapshot:
+        """The current catalog, reloading first if a source file changed"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() < self._next_check:
+                return self._snapshot
+            mtimes = self._source_mtimes()
+            if self._snapshot is None or self._snapshot.source_mtimes != mtimes:
+                if self._snapshot is not None:
+                    print("🔄 Partner loan data changed, reloading catalog")
+                self._snapshot = self._build(mtimes)
+            self._next_check = time.monotonic() + self.check_interval
+            return self._snapshot
+
+
+_catalog = PartnerCatalog()
+
+
+def get_partner_catalog() -> PartnerCatalog:
+    return _catalog
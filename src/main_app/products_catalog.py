@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from src.main_app.models import Partner, Product
+from src.main_app.bank_loans import json_bytes
+from src.main_app.page_cache import on_table_commit
+
+# Partner products view-model
+#
+# /products and /api/products show every partner with its products. The
+# view-model is built from one outer join of partners and products, ordered
+# by partner and grouped in Python, so building it is a single query however
+# many partners there are. It is kept per worker with its serialized JSON and
+# ETag, rebuilt at most every PRODUCTS_CACHE_TTL_SECONDS, and dropped as soon
+# as a session in this worker commits a change to partners or products.
+
+PRODUCTS_CACHE_TTL_SECONDS = float(os.getenv("PRODUCTS_CACHE_TTL_SECONDS", "60"))
+
+
+def parse_features(raw: Optional[str]) -> List[str]:
+    """Product.features is a JSON list; older rows may hold plain text"""
+    if not raw:
+        return []
+    try:
+        features = json.loads(raw)
+    except ValueError:
+        return [raw]
+    if isinstance(features, list):
+        return [str(feature) for feature in features]
+    return [str(features)]
+
+
+@dataclass(frozen=True)
+class ProductsView:
+    partners: List[Dict[str, Any]]
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+def build_partners(db: Session) -> List[Dict[str, Any]]:
+    """Partners with their products from one joined query"""
+    rows = (
+        db.query(Partner, Product)
+        .outerjoin(Product, Product.partner_id == Partner.id)
+        .order_by(Partner.id, Product.id)
+        .all()
+    )
+    partners = []
+    current_id = None
+    for partner, product in rows:
+        if partner.id != current_id:
+            current_id = partner.id
+            partners.append({
+                'name': partner.name,
+                'logo': partner.logo_url,
+                'url': partner.url,
+                'loans': []
+            })
+        if product is not None:
+            partners[-1]['loans'].append({
+                'name': product.name,
+                'interest': product.interest,
+                'features': parse_features(product.features),
+            })
+    return partners
+
+
+class ProductsCatalog:
+    """Per-worker partner products view-model"""
+
+    def __init__(self, ttl: float = None):
+        self.ttl = PRODUCTS_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.builds = 0
+        self._view: Optional[ProductsView] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Rebuild on the next request"""
+        with self._lock:
+            self._generation += 1
+            self._view = None
+
+    def get(self, db: Session) -> ProductsView:
+        view = self._view
+        if view is not None and time.monotonic() < view.expires_at:
+            return view
+        generation = self._generation
+        partners = build_partners(db)
+        body = json_bytes({"partners": partners})
+        view = ProductsView(
+            partners=partners,
+            body=body,
+            etag='"' + hashlib.sha1(body).hexdigest() + '"',
+            expires_at=time.monotonic() + self.ttl
+        )
+        with self._lock:
+            # A commit during the build may not be in these rows; serve them but don't keep them
+            if generation == self._generation:
+                self._view = view
+            self.builds += 1
+        return view
+
+
+_catalog = ProductsCatalog()
+on_table_commit(("partners", "products"), _catalog.invalidate)
+
+
+def get_products_catalog() -> ProductsCatalog:
+    return _catalog
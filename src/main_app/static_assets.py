@@ -0,0 +1,247 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped without it
+    brotli = None
+
+# Static asset pipeline
+#
+# Build step (run once per deploy, after pip install):
+#   python -m src.main_app.static_assets build
+#
+# For every file under the /static, /crm/static and /blog/static directories
+# it writes a copy named after its content hash (partners/Yes_Bank.png ->
+# dist/partners/Yes_Bank.<sha256[:12]>.png), plus .gz and .br siblings for
+# text-like types (SVG, icons, CSS, JS, ...) when they are at least 10%
+# smaller, and a dist/manifest.json mapping source names to hashed names.
+# Templates link assets through asset_url('/static/...'), which returns the
+# hashed URL once a manifest exists and the plain URL otherwise, so nothing
+# breaks before the first build. AssetStaticFiles serves the dist/ copies with
+# a one-year immutable Cache-Control and picks the precompressed sibling from
+# Accept-Encoding; anything else is served as before with a short max-age.
+# Blog uploads are user content and are never fingerprinted.
+
+ASSET_ROOTS = {
+    "/static": "src/main_app/static",
+    "/crm/static": "src/crm/static",
+    "/blog/static": "src/blog/static",
+}
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+# Content-hashed output directories: dist/ from this build, variants/ from the image variant build
+IMMUTABLE_DIRS = (DIST_DIR, "variants")
+SKIP_DIRS = {*IMMUTABLE_DIRS, "uploads", "__pycache__"}
+SKIP_SUFFIXES = {".py", ".pyc"}
+
+# (Content-Encoding, file suffix), preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = ("text/", "image/svg+xml", "image/x-icon", "image/vnd.microsoft.icon",
+                      "application/javascript", "application/json", "application/xml",
+                      "application/manifest+json")
+MIN_COMPRESSION_SAVING = 0.10
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_CACHE_CONTROL = os.getenv("STATIC_CACHE_CONTROL", "public, max-age=3600")
+
+
+def _compressible(name: str) -> bool:
+    media_type = mimetypes.guess_type(name)[0] or ""
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _compress(encoding: str, data: bytes) -> Optional[bytes]:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def _write(path: Path, data: bytes):
+    # Hashed names are content-addressed, so an existing file is already right
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _source_files(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for filename in sorted(filenames):
+            if not filename.startswith(".") and os.path.splitext(filename)[1] not in SKIP_SUFFIXES:
+                yield Path(dirpath) / filename
+
+
+def build_assets(directory: str) -> Dict[str, Any]:
+    """Fingerprint and precompress one static directory; returns its manifest"""
+    root = Path(directory)
+    dist = root / DIST_DIR
+    assets: Dict[str, str] = {}
+    encodings: Dict[str, list] = {}
+    written = set()
+    for source in _source_files(root):
+        name = source.relative_to(root).as_posix()
+        data = source.read_bytes()
+        stem, ext = posixpath.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+        _write(dist / hashed, data)
+        written.add(dist / hashed)
+        assets[name] = hashed
+        if not _compressible(name):
+            continue
+        for encoding, suffix in ENCODINGS:
+            compressed = _compress(encoding, data)
+            if compressed is not None and len(compressed) <= len(data) * (1 - MIN_COMPRESSION_SAVING):
+                _write(dist / (hashed + suffix), compressed)
+                written.add(dist / (hashed + suffix))
+                encodings.setdefault(hashed, []).append(encoding)
+
+    manifest = {"assets": assets, "encodings": encodings}
+    dist.mkdir(parents=True, exist_ok=True)
+    (dist / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    written.add(dist / MANIFEST_NAME)
+
+    # Drop copies of assets that changed or were removed since the last build
+    for dirpath, _, filenames in os.walk(dist, topdown=False):
+        for filename in filenames:
+            if Path(dirpath) / filename not in written:
+                os.remove(os.path.join(dirpath, filename))
+        if dirpath != str(dist) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return manifest
+
+
+# Manifests, loaded once per worker
+
+_manifests: Dict[str, Dict[str, Any]] = {}
+_manifest_lock = threading.Lock()
+
+
+def load_manifest(directory: str) -> Dict[str, Any]:
+    manifest = _manifests.get(directory)
+    if manifest is None:
+        with _manifest_lock:
+            try:
+                with open(os.path.join(directory, DIST_DIR, MANIFEST_NAME)) as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {"assets": {}, "encodings": {}}
+            _manifests[directory] = manifest
+    return manifest
+
+
+def reload_manifests():
+    """Pick up a new build without restarting the worker"""
+    with _manifest_lock:
+        _manifests.clear()
+
+
+def asset_url(path: Optional[str]) -> Optional[str]:
+    """'/static/partners/Yes_Bank.png' -> '/static/dist/partners/Yes_Bank.<hash>.png' once built"""
+    if not path:
+        return path
+    for prefix, directory in ASSET_ROOTS.items():
+        if path.startswith(prefix + "/"):
+            hashed = load_manifest(directory)["assets"].get(path[len(prefix) + 1:])
+            return f"{prefix}/{DIST_DIR}/{hashed}" if hashed else path
+    return path
+
+
+def accepted_encodings(accept_encoding: str) -> Set[str]:
+    """Content codings the client accepts (q > 0)"""
+    accepted = set()
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        q = params.strip().removeprefix("q=")
+        try:
+            if params and float(q) <= 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles serving fingerprinted assets immutable and precompressed"""
+
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.dist_path = os.path.realpath(os.path.join(directory, DIST_DIR)) + os.sep
+        self.immutable_paths = tuple(os.path.realpath(os.path.join(directory, name)) + os.sep
+                                     for name in IMMUTABLE_DIRS)
+        # Fingerprinted files never change, so their stat results can be kept
+        self._variant_stats: Dict[str, os.stat_result] = {}
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = None
+        if full_path.startswith(self.immutable_paths):
+            headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+            variants = None
+            if full_path.startswith(self.dist_path):
+                hashed = full_path[len(self.dist_path):].replace(os.sep, "/")
+                variants = load_manifest(self.directory)["encodings"].get(hashed)
+            if variants:
+                headers["Vary"] = "Accept-Encoding"
+                accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+                for encoding, suffix in ENCODINGS:
+                    if encoding in variants and (encoding in accepted or "*" in accepted):
+                        media_type = mimetypes.guess_type(full_path)[0]
+                        full_path += suffix
+                        stat_result = self._variant_stats.get(full_path) or os.stat(full_path)
+                        self._variant_stats[full_path] = stat_result
+                        headers["Content-Encoding"] = encoding
+                        break
+        else:
+            headers = {"Cache-Control": STATIC_CACHE_CONTROL}
+        response = FileResponse(full_path, status_code=status_code, headers=headers, media_type=media_type,
+                                stat_result=stat_result, method=scope["method"])
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def build():
+    """Build every static root and report the savings"""
+    for prefix, directory in ASSET_ROOTS.items():
+        started = time.perf_counter()
+        manifest = build_assets(directory)
+        dist = Path(directory) / DIST_DIR
+        original = sum((dist / hashed).stat().st_size for hashed in manifest["assets"].values())
+        compressed = sum((dist / hashed).stat().st_size for hashed in manifest["encodings"])
+        smallest = sum(min((dist / (hashed + suffix)).stat().st_size
+                           for encoding, suffix in ENCODINGS if encoding in encodings)
+                       for hashed, encodings in manifest["encodings"].items())
+        print(f"✅ {prefix}: {len(manifest['assets'])} assets ({original / 1024:,.0f} KB), "
+              f"{len(manifest['encodings'])} precompressed {compressed / 1024:,.1f} -> {smallest / 1024:,.1f} KB "
+              f"in {time.perf_counter() - started:.2f}s")
+    if brotli is None:
+        print("⚠️ brotli is not installed; only .gz variants were written")
+    reload_manifests()
+
+
+if __name__ == "__main__":
+    # python -m src.main_app.static_assets build
+    if not sys.argv[1:] or sys.argv[1] != "build":
+        print("Usage: python -m src.main_app.static_assets build")
+        sys.exit(1)
+    build()
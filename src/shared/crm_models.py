@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func, Float, Boolean, Date, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func, Float, Boolean, Date, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -11,7 +11,7 @@ class Lead(CRMBase):
     lead_id = Column(Integer, primary_key=True, index=True)
     source = Column(String(32), nullable=False)  # 'website', 'social', 'manual', 'referral', 'walk_in'
     name = Column(String(128), nullable=False)
-    contact = Column(String(64), nullable=False)
+    contact = Column(String(64), nullable=False, index=True)  # Duplicate check on import
     email = Column(String(128))
     city = Column(String(64))
     loan_amount = Column(Float)
@@ -26,9 +26,16 @@ class Lead(CRMBase):
     other_details = Column(Text)  # For detailed information about leads
     is_doable = Column(Boolean, default=True)
     priority = Column(String(16), default="not_doable")  # 'doable', 'not_doable', 'low', 'medium', 'high', 'urgent'
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now(), index=True)
     updated_at = Column(DateTime, onupdate=func.now())
     
+    # Dashboard/analytics counts filter on source or status, usually over a date range
+    __table_args__ = (
+        Index("ix_leads_source_created_at", "source", "created_at"),
+        Index("ix_leads_status_created_at", "status", "created_at"),
+        Index("ix_leads_source_platform_name", "source", "platform_name"),
+    )
+    
     # Relationships
     assignments = relationship("LeadAssignment", back_populates="lead", cascade="all, delete-orphan")
     activities = relationship("LeadActivity", back_populates="lead", cascade="all, delete-orphan")
@@ -44,6 +51,11 @@ class LeadActivity(CRMBase):
     description = Column(Text, nullable=False)  # Human-readable description
     created_at = Column(DateTime, server_default=func.now())
     
+    # Timeline reads a lead's activities newest first
+    __table_args__ = (
+        Index("ix_lead_activities_lead_id_created_at", "lead_id", "created_at"),
+    )
+    
     # Relationships
     lead = relationship("Lead", back_populates="activities")
     employee = relationship("Employee")
@@ -89,7 +101,7 @@ class Employee(CRMBase):
     employee_code = Column(String(64), unique=True, nullable=False)
     designation = Column(String(64))
     department = Column(String(64))
-    team_id = Column(Integer, ForeignKey("teams.team_id"), nullable=True)
+    team_id = Column(Integer, ForeignKey("teams.team_id"), nullable=True, index=True)
     salary = Column(Float, default=0.0)
     commission_rate = Column(Float, default=0.0)
     is_active = Column(Boolean, default=True)
@@ -118,11 +130,11 @@ class Team(CRMBase):
 class LeadAssignment(CRMBase):
     __tablename__ = "lead_assignments"
     assignment_id = Column(Integer, primary_key=True, index=True)
-    lead_id = Column(Integer, ForeignKey("leads.lead_id"), nullable=False)  # Updated to reference unified Lead
+    lead_id = Column(Integer, ForeignKey("leads.lead_id"), nullable=False, index=True)  # Updated to reference unified Lead
     employee_id = Column(Integer, ForeignKey("employees.employee_id"), nullable=False)
     assigned_at = Column(DateTime, server_default=func.now())
     notes = Column(Text)
-    status = Column(String(32), default="assigned")  # 'assigned', 'pd', 'login', 'login_query', 'underwriter', 'approved', 'rejected', 'closed', 'disbursed'
+    status = Column(String(32), default="assigned", index=True)  # 'assigned', 'pd', 'login', 'login_query', 'underwriter', 'approved', 'rejected', 'closed', 'disbursed'
     is_doable = Column(Boolean, default=True)  # Flag to mark if lead is doable or not
     last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
     assigned_by = Column(Integer, ForeignKey("employees.employee_id"), nullable=True)  # Who assigned this lead
@@ -130,6 +142,11 @@ class LeadAssignment(CRMBase):
     approved_loan_amount = Column(Float, nullable=True)  # Loan amount when approved
     close_type = Column(String(32), nullable=True)  # 'approved', 'rejected', 'not_doable' - reason for closure
     
+    # Per-employee and per-team lead counts grouped by status
+    __table_args__ = (
+        Index("ix_lead_assignments_employee_id_status", "employee_id", "status"),
+    )
+    
     # Relationships
     lead = relationship("Lead", back_populates="assignments")
     employee = relationship("Employee", back_populates="assigned_leads", foreign_keys=[employee_id])
@@ -140,7 +157,7 @@ class LeadAssignment(CRMBase):
 class LeadComment(CRMBase):
     __tablename__ = "lead_comments"
     comment_id = Column(Integer, primary_key=True, index=True)
-    assignment_id = Column(Integer, ForeignKey("lead_assignments.assignment_id"), nullable=False)
+    assignment_id = Column(Integer, ForeignKey("lead_assignments.assignment_id"), nullable=False, index=True)
     employee_id = Column(Integer, ForeignKey("employees.employee_id"), nullable=False)
     comment = Column(Text, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
@@ -205,4 +222,51 @@ class CloseLead(CRMBase):
     closed_at = Column(DateTime, server_default=func.now())
     
     # Relationships
-    employee = relationship("Employee") 
\ No newline at end of file
+    employee = relationship("Employee") 
+
+# Daily rollups - Pre-aggregated counters for analytics, maintained by src/crm/rollups.py
+class LeadDailyRollup(CRMBase):
+    __tablename__ = "lead_daily_rollups"
+    day = Column(Date, primary_key=True)  # Day the lead was created
+    source = Column(String(32), primary_key=True)
+    platform_name = Column(String(64), primary_key=True, default="")  # '' when the lead has no platform
+    lead_count = Column(Integer, nullable=False, default=0)
+
+class AssignmentDailyRollup(CRMBase):
+    __tablename__ = "assignment_daily_rollups"
+    day = Column(Date, primary_key=True)  # Day the assigned lead was created
+    team_id = Column(Integer, primary_key=True, default=0)  # 0 when the assignee has no team
+    status = Column(String(32), primary_key=True)
+    source = Column(String(32), primary_key=True)
+    assignment_count = Column(Integer, nullable=False, default=0)
+
+# Background jobs - Long CRM operations run by the worker pool in src/crm/jobs.py
+class Job(CRMBase):
+    __tablename__ = "jobs"
+    job_id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(32), nullable=False)  # 'bulk_import', 'migrate_leads', 'generate_billing'
+    status = Column(String(16), nullable=False, default="queued", index=True)  # 'queued', 'running', 'succeeded', 'failed'
+    params = Column(JSON)  # Handler arguments
+    progress = Column(JSON)  # Last checkpoint written by the handler
+    result = Column(JSON)
+    error = Column(Text)
+    created_by = Column(Integer, ForeignKey("users.user_id"), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # Bumped on every checkpoint; stale running jobs are requeued
+
+# Job locks - One row per queued or running job that must not be queued twice (e.g. billing for one month)
+class JobLock(CRMBase):
+    __tablename__ = "job_locks"
+    lock_key = Column(String(64), primary_key=True)  # '<job_type>:<key>', e.g. 'generate_billing:2026-10'
+    job_id = Column(Integer, ForeignKey("jobs.job_id"), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+# Intake keys - One row per spooled form submission written to leads, so replays are skipped
+class LeadIntake(CRMBase):
+    __tablename__ = "lead_intakes"
+    intake_key = Column(String(36), primary_key=True)  # Assigned when the form was spooled
+    lead_id = Column(Integer, nullable=False)  # Reference to the created lead
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,235 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Shared engine/session registry
+#
+# Every router pulls its engine and sessions from here so that each gunicorn
+# worker holds exactly one connection pool per database. Pool sizing is per
+# worker, so the Postgres connection budget is roughly:
+#   WEB_CONCURRENCY * (pool_size + max_overflow) * number of databases
+#
+# Lead inserts with the SQLite pragma profile off and on, each on a fresh
+# temporary file (never the configured databases):
+#   python -m src.shared.database benchmark [leads]
+
+# Known databases: name -> (env var holding the URL, development default)
+DATABASES = {
+    "main": ("DATABASE_URL", "sqlite:///./site.db"),
+    "crm": ("CRM_DATABASE_URL", "sqlite:///./crm.db"),
+}
+
+# Pool defaults, overridable globally (DB_POOL_SIZE) or per database (CRM_DB_POOL_SIZE)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_OVERFLOW = 5
+DEFAULT_POOL_TIMEOUT = 30
+DEFAULT_POOL_RECYCLE = 1800
+
+# SQLite tuning profile applied to every new SQLite connection. Each pragma can
+# be overridden with SQLITE_<NAME> (e.g. SQLITE_SYNCHRONOUS=FULL), or the whole
+# profile disabled with SQLITE_PRAGMAS=off.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",        # readers no longer block the single writer
+    "synchronous": "NORMAL",      # fsync at checkpoints instead of every commit
+    "busy_timeout": 5000,         # ms to wait on a locked database across workers
+    "cache_size": -64000,         # negative = KiB, i.e. 64 MB page cache
+    "mmap_size": 268435456,       # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+}
+
+_engines = {}
+_sessionmakers = {}
+_pool_settings = {}
+_lock = threading.Lock()
+
+
+def get_database_url(name: str) -> str:
+    """Resolve the connection URL for a registered database"""
+    env_var, default = DATABASES[name]
+    url = os.getenv(env_var) or default
+    # Render/Heroku hand out postgres:// URLs which SQLAlchemy no longer accepts
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+def use_scratch_database(name: str) -> str:
+    """Point a registered database at a new temporary SQLite file, for checks that seed sample data"""
+    if name in _engines:
+        raise RuntimeError(f"the {name} engine already exists; pick the scratch database before using it")
+    env_var, _ = DATABASES[name]
+    url = f"sqlite:///{tempfile.mkdtemp()}/{name}_scratch.db"
+    os.environ[env_var] = url
+    return url
+
+
+def _pool_setting(name: str, setting: str, default: int) -> int:
+    """Read a pool setting, preferring the per-database override"""
+    value = os.getenv(f"{name.upper()}_DB_{setting}") or os.getenv(f"DB_{setting}")
+    return int(value) if value else default
+
+
+def get_sqlite_pragmas():
+    """Resolve the SQLite pragma profile, applying environment overrides"""
+    if os.getenv("SQLITE_PRAGMAS", "").lower() in ("off", "false", "0"):
+        return {}
+    return {
+        pragma: os.getenv(f"SQLITE_{pragma.upper()}", default)
+        for pragma, default in SQLITE_PRAGMAS.items()
+    }
+
+
+def apply_sqlite_pragmas(engine, pragmas=None):
+    """Register a connect hook that applies the pragma profile to every connection"""
+    pragmas = get_sqlite_pragmas() if pragmas is None else pragmas
+    if not pragmas:
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # busy_timeout first so the journal_mode switch itself waits on locks
+            if "busy_timeout" in pragmas:
+                cursor.execute(f"PRAGMA busy_timeout = {int(pragmas['busy_timeout'])}")
+            for pragma, value in pragmas.items():
+                if pragma != "busy_timeout":
+                    cursor.execute(f"PRAGMA {pragma} = {value}")
+        finally:
+            cursor.close()
+
+    return engine
+
+
+def create_engine_for(name: str):
+    """Create a new engine for a registered database with tuned pool settings"""
+    url = get_database_url(name)
+    if "sqlite" in url:
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+            # WAL and mmap are meaningless for in-memory databases
+            return engine
+        return apply_sqlite_pragmas(engine)
+    settings = {
+        "pool_size": _pool_setting(name, "POOL_SIZE", DEFAULT_POOL_SIZE),
+        "max_overflow": _pool_setting(name, "MAX_OVERFLOW", DEFAULT_MAX_OVERFLOW),
+        "pool_timeout": _pool_setting(name, "POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT),
+        "pool_recycle": _pool_setting(name, "POOL_RECYCLE", DEFAULT_POOL_RECYCLE),
+    }
+    # Kept for pool_stats(); QueuePool has no public accessor for max_overflow
+    _pool_settings[name] = settings
+    return create_engine(url, poolclass=QueuePool, pool_pre_ping=True, **settings)
+
+
+def get_engine(name: str):
+    """Get the per-worker engine for a database, creating it on first use"""
+    engine = _engines.get(name)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(name)
+            if engine is None:
+                engine = create_engine_for(name)
+                _engines[name] = engine
+    return engine
+
+
+def get_sessionmaker(name: str):
+    """Get the session factory bound to a database's shared engine"""
+    factory = _sessionmakers.get(name)
+    if factory is None:
+        with _lock:
+            factory = _sessionmakers.get(name)
+            if factory is None:
+                factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine(name))
+                _sessionmakers[name] = factory
+    return factory
+
+
+def get_main_db():
+    """FastAPI dependency yielding a main-site session"""
+    db = get_sessionmaker("main")()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_crm_db():
+    """FastAPI dependency yielding a CRM session"""
+    db = get_sessionmaker("crm")()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def pool_stats():
+    """Connection pool statistics for every engine created in this worker"""
+    stats = {}
+    for name, engine in _engines.items():
+        pool = engine.pool
+        entry = {
+            "dialect": engine.dialect.name,
+            "pool_class": type(pool).__name__,
+            "status": pool.status(),
+        }
+        if isinstance(pool, QueuePool):
+            entry.update({
+                "pool_size": pool.size(),
+                "max_overflow": _pool_settings.get(name, {}).get("max_overflow"),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+        stats[name] = entry
+    return {"pid": os.getpid(), "engines": stats}
+
+
+def dispose_engines():
+    """Close every pooled connection; called from the app's shutdown handler"""
+    for engine in _engines.values():
+        engine.dispose()
+
+
+def benchmark(leads: int = 1000):
+    """Website leads/s, one session and commit each, with the SQLite pragma profile off and on"""
+    from src.shared.crm_models import CRMBase
+    from src.crm.lead_service import LeadService
+
+    rates = {}
+    for label, pragmas in (("profile off", {}), ("profile on", get_sqlite_pragmas() or SQLITE_PRAGMAS)):
+        scratch_dir = tempfile.mkdtemp()
+        engine = create_engine(f"sqlite:///{scratch_dir}/pragma_bench.db", connect_args={"check_same_thread": False})
+        apply_sqlite_pragmas(engine, pragmas)
+        CRMBase.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        started = time.perf_counter()
+        for i in range(leads):
+            db = SessionLocal()
+            try:
+                LeadService.create_lead_from_website(db, f"bench-{i}", f"9{i:09d}", None, "benchmark")
+            finally:
+                db.close()
+        elapsed = time.perf_counter() - started
+        rates[label] = leads / elapsed
+        print(f"  {label:>11}: {leads} leads in {elapsed:.2f}s = {rates[label]:,.0f} leads/s")
+        engine.dispose()
+        shutil.rmtree(scratch_dir)
+
+    print(f"✅ Pragma profile: {rates['profile on'] / rates['profile off']:.1f}x lead inserts")
+    return rates
+
+
+if __name__ == "__main__":
+    # python -m src.shared.database benchmark [leads]
+    if not sys.argv[1:] or sys.argv[1] != "benchmark":
+        print("Usage: python -m src.shared.database benchmark [leads]")
+        sys.exit(1)
+    benchmark(*(int(arg) for arg in sys.argv[2:3]))
@@ -0,0 +1,158 @@
+import sys
+from sqlalchemy import event, inspect
+
+# Lightweight schema migrations
+#
+# metadata.create_all() only creates indexes together with brand-new tables, so
+# databases created before an index was added to the models never get it. These
+# helpers add whatever the models declare but the live database is missing.
+#
+# The hot lead queries (lead list pages, timeline, dashboards, analytics) are
+# checked against the indexes with EXPLAIN QUERY PLAN on a scratch SQLite
+# database; any full scan of leads, lead_assignments or lead_activities fails,
+# except walking an index in order for an ORDER BY ... LIMIT page. The check
+# seeds sample leads, so it always builds a temporary SQLite database unless
+# --use-configured-db is passed:
+#   python -m src.shared.migrations check
+
+# Tables whose full scans grow with the lead count
+HOT_TABLES = ("leads", "lead_assignments", "lead_activities")
+
+
+def create_missing_indexes(engine, metadata):
+    """Create every index declared in metadata that the database does not have yet"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+
+    for table in metadata.tables.values():
+        if table.name not in existing_tables:
+            # create_all() builds the table and its indexes together
+            continue
+
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing_indexes:
+                continue
+            print(f"🔧 Creating index {index.name} on {table.name}...")
+            index.create(bind=engine)
+            created.append(index.name)
+
+    return created
+
+
+def migrate_crm_indexes(engine=None):
+    """Build the CRM hot-column indexes on an existing CRM database"""
+    from src.shared.crm_models import CRMBase
+    from src.shared.database import get_engine
+
+    engine = engine or get_engine("crm")
+    created = create_missing_indexes(engine, CRMBase.metadata)
+    if created:
+        print(f"✅ Created {len(created)} CRM indexes")
+    return created
+
+
+def _plan_cases(db, sample):
+    """Named callables running the hot lead queries against the sample data"""
+    from src.crm.lead_service import LeadService
+    from src.crm.dashboard import get_dashboard_stats
+    from src.crm.analytics import get_analytics_data
+
+    manager, employee = sample["manager"], sample["employee"]
+    cursor = LeadService.get_leads_page(db, limit=20)["next_cursor"]
+    return {
+        "lead list": lambda: LeadService.get_leads_page(db, limit=50),
+        "lead list, next page": lambda: LeadService.get_leads_page(db, limit=50, cursor=cursor),
+        "lead list by status": lambda: LeadService.get_leads_page(db, {"status": "new"}, limit=50),
+        "lead list by source": lambda: LeadService.get_leads_page(db, {"source": "website"}, limit=50),
+        "lead list by employee": lambda: LeadService.get_leads_page(db, {"employee_id": employee.employee_id}, limit=50),
+        "lead timeline": lambda: LeadService.get_lead_timeline_page(db, sample["lead_ids"][0], limit=20),
+        "admin dashboard": lambda: get_dashboard_stats(db, "admin"),
+        "manager dashboard": lambda: get_dashboard_stats(db, "manager", manager.employee_id, manager),
+        "employee dashboard": lambda: get_dashboard_stats(db, "employee", employee.employee_id, employee),
+        "analytics": lambda: get_analytics_data(db),
+    }
+
+
+def _full_scans(statement: str, plan_rows) -> list:
+    """Plan lines that scan a hot table without an index range"""
+    limited = " LIMIT " in f" {statement.upper()} "
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        words = detail.split()
+        if len(words) < 2 or words[0] != "SCAN" or words[1] not in HOT_TABLES:
+            continue
+        # Walking an index in ORDER BY order stops after LIMIT rows
+        if limited and "USING INDEX" in detail and "COVERING" not in detail:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def check():
+    """EXPLAIN QUERY PLAN every hot lead query and fail on full scans of the lead tables"""
+    from src.shared.crm_models import CRMBase
+    from src.shared.database import get_engine, get_sessionmaker
+    from src.crm.sample_data import seed_sample_crm
+
+    engine = get_engine("crm")
+    if engine.dialect.name != "sqlite":
+        # Other planners pick plans from table statistics, so a small sample proves nothing
+        print(f"⚠️ Index plan check only runs on SQLite, skipping {engine.dialect.name}")
+        return True
+
+    CRMBase.metadata.create_all(bind=engine)
+    create_missing_indexes(engine, CRMBase.metadata)
+    db = get_sessionmaker("crm")()
+    sample = seed_sample_crm(db)
+    failures = 0
+
+    for name, run in _plan_cases(db, sample).items():
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        db.expire_all()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            run()
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        scans = []
+        for statement, parameters in statements:
+            plan = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            scans.extend(_full_scans(statement, plan))
+        if scans:
+            failures += 1
+            print(f"❌ {name}: full scan in {len(statements)} queries")
+            for detail in scans:
+                print(f"      {detail}")
+        else:
+            print(f"✅ {name}: {len(statements)} queries, no full scans of {', '.join(HOT_TABLES)}")
+
+    db.close()
+    if failures:
+        print(f"❌ {failures} query plans scan a lead table")
+        return False
+    print("✅ Every hot lead query uses an index")
+    return True
+
+
+if __name__ == "__main__":
+    # python -m src.shared.migrations          build missing indexes on the configured CRM database
+    # python -m src.shared.migrations check    index plan check on a scratch SQLite database
+    #   add --use-configured-db to seed the sample leads into CRM_DATABASE_URL instead
+    args = sys.argv[1:]
+    if args and args[0] == "check" and set(args[1:]) <= {"--use-configured-db"}:
+        if "--use-configured-db" not in args:
+            from src.shared.database import use_scratch_database
+            use_scratch_database("crm")
+        sys.exit(0 if check() else 1)
+    elif args:
+        print("Usage: python -m src.shared.migrations [check [--use-configured-db]]")
+        sys.exit(1)
+    migrate_crm_indexes()